@@ -0,0 +1,124 @@
+"""
+gunicorn-Konfiguration für den Produktivbetrieb.
+
+Aufruf: gunicorn -c python:app.gunicorn_config app.wsgi:application
+
+Worker-Anzahl und -Typ werden aus CPU-Kernen und verfügbarem Speicher des
+Containers (cgroup-Limits) abgeleitet und können über Umgebungsvariablen
+überschrieben werden:
+
+- GUNICORN_WORKERS          feste Anzahl Worker-Prozesse
+- GUNICORN_WORKER_CLASS     'gthread' (Standard) oder 'sync'
+- GUNICORN_THREADS          Threads pro Worker bei gthread (Standard: 4)
+- GUNICORN_MB_PRO_WORKER    geschätzter Speicherbedarf pro Worker (Standard: 150)
+- GUNICORN_MAX_REQUESTS     Worker nach n Requests neu starten (Standard: 1000)
+- GUNICORN_TIMEOUT          Timeout in Sekunden (Standard: 120)
+"""
+import os
+
+
+def cpu_anzahl():
+    """Nutzbare CPU-Kerne unter Berücksichtigung von Affinität und cgroup-Quota"""
+    try:
+        kerne = len(os.sched_getaffinity(0))
+    except AttributeError:
+        kerne = os.cpu_count() or 1
+
+    # cgroup v2: "max 100000" oder "<quota> <periode>"
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, periode = f.read().split()
+        if quota != 'max':
+            kerne = min(kerne, max(1, int(int(quota) / int(periode))))
+    except (OSError, ValueError):
+        pass
+
+    return kerne
+
+
+def speicher_mb():
+    """Verfügbarer Speicher in MB: cgroup-Limit, sonst MemTotal des Hosts"""
+    for pfad in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(pfad) as f:
+                wert = f.read().strip()
+            if wert != 'max' and int(wert) < 1 << 60:
+                return int(wert) // (1024 * 1024)
+        except (OSError, ValueError):
+            pass
+
+    try:
+        with open('/proc/meminfo') as f:
+            for zeile in f:
+                if zeile.startswith('MemTotal:'):
+                    return int(zeile.split()[1]) // 1024
+    except (OSError, ValueError):
+        pass
+
+    return None
+
+
+def worker_anzahl(kerne, speicher, mb_pro_worker=150):
+    """
+    (2 × Kerne) + 1 Worker, begrenzt durch den Speicher. Dank preload_app teilen
+    sich die Worker den importierten Code per Copy-on-Write, mb_pro_worker ist
+    daher der zusätzliche Bedarf pro Prozess.
+    """
+    anzahl = 2 * kerne + 1
+    if speicher:
+        anzahl = min(anzahl, speicher // mb_pro_worker)
+    return max(1, anzahl)
+
+
+def _env_int(name, standard):
+    return int(os.environ.get(name, standard))
+
+
+# Bindung und Logging
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+# Anwendungs-Logs schreibt Django selbst nach stderr (siehe settings.LOGGING)
+capture_output = False
+
+# Worker-Modell: gthread für I/O-lastige Downloads, Worker-Anzahl nach CPU und Speicher
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = _env_int('GUNICORN_THREADS', 4) if worker_class == 'gthread' else 1
+workers = _env_int('GUNICORN_WORKERS', 0) or worker_anzahl(
+    cpu_anzahl(), speicher_mb(), _env_int('GUNICORN_MB_PRO_WORKER', 150))
+
+# App einmal im Master laden, Worker teilen den Speicher per Copy-on-Write
+preload_app = True
+
+# Worker regelmäßig erneuern (Speicherlecks), gestreut damit nicht alle gleichzeitig neu starten
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = max_requests // 10
+
+timeout = _env_int('GUNICORN_TIMEOUT', 120)
+graceful_timeout = 30
+keepalive = 5
+
+# Heartbeat-Dateien im RAM statt auf dem Overlay-Dateisystem des Containers
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+
+def when_ready(server):
+    server.log.info('Worker: %s × %s (%s Threads), preload_app=%s, max_requests=%s',
+                    workers, worker_class, threads, preload_app, max_requests)
+
+
+def pre_fork(server, worker):
+    """
+    Datenbankverbindungen (und ein evtl. Pool), die beim Preload im Master
+    entstanden sind, vor dem Fork schließen. Sonst würden sich Master und
+    Worker denselben Socket teilen.
+    """
+    from django.db import connections
+
+    for connection in connections.all(initialized_only=True):
+        connection.close()
+        close_pool = getattr(connection, 'close_pool', None)
+        if close_pool:
+            close_pool()
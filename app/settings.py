@@ -12,6 +12,9 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
+import warnings
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -49,6 +52,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'arbeitsanweisungen.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -102,6 +106,66 @@ else:
         }
     }
 
+# Verbindungsverwaltung (DB_CONN_MODUS):
+# - 'neu':        jede Anfrage öffnet eine neue Verbindung (bisheriges Verhalten)
+# - 'persistent': Verbindungen bleiben DB_CONN_MAX_AGE Sekunden offen, mit Health-Check
+# - 'pool':       Connection-Pool von psycopg 3 pro gunicorn-Worker (nur PostgreSQL)
+DB_CONN_MODUS = os.environ.get('DB_CONN_MODUS', 'persistent')
+if DB_CONN_MODUS not in ('neu', 'persistent', 'pool'):
+    raise ImproperlyConfigured(
+        f"DB_CONN_MODUS={DB_CONN_MODUS!r} ist ungültig (erlaubt: 'neu', 'persistent', 'pool')")
+
+if DB_CONN_MODUS == 'pool' and DATABASES['default']['ENGINE'] != 'django.db.backends.postgresql':
+    # z.B. SQLite in der Entwicklung: persistente Verbindungen statt Pool
+    warnings.warn(
+        f"DB_CONN_MODUS='pool' braucht PostgreSQL, mit {DATABASES['default']['ENGINE']} "
+        "werden persistente Verbindungen verwendet", RuntimeWarning)
+
+if DB_CONN_MODUS == 'pool' and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['default']['CONN_MAX_AGE'] = 0  # Pool und persistente Verbindungen schließen sich aus
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+            'timeout': int(os.environ.get('DB_POOL_TIMEOUT', '10')),
+            'max_idle': int(os.environ.get('DB_POOL_MAX_IDLE', '300')),
+        },
+    }
+elif DB_CONN_MODUS in ('persistent', 'pool'):
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', '60'))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = os.environ.get('DB_CONN_HEALTH_CHECKS', 'True') == 'True'
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+
+# Sitzungen (SESSION_MODUS):
+# - 'db':        jede Anfrage liest django_session (bisheriges Verhalten)
+# - 'cached_db': Datei-Cache vor der Datenbank, übersteht das Leeren des Caches
+# - 'cache':     nur im Datei-Cache (Abmeldung aller Benutzer, wenn er verloren geht)
+# Der Datei-Cache liegt lokal und wird von allen gunicorn-Workern geteilt.
+SESSION_MODUS = os.environ.get('SESSION_MODUS', 'db')
+if SESSION_MODUS not in ('db', 'cached_db', 'cache'):
+    raise ImproperlyConfigured(
+        f"SESSION_MODUS={SESSION_MODUS!r} ist ungültig (erlaubt: 'db', 'cached_db', 'cache')")
+SESSION_ENGINE = f'django.contrib.sessions.backends.{SESSION_MODUS}'
+SESSION_CACHE_ALIAS = 'sitzungen'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'sitzungen': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('SESSION_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'arbeitsanweisungen_sitzungen')),
+        'TIMEOUT': 60 * 60 * 24 * 14,  # wie SESSION_COOKIE_AGE
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('SESSION_CACHE_MAX_ENTRIES', '20000'))},
+    },
+}
+
+# Benutzer-Objekte für Sekunden im Sitzungs-Cache halten (0 = bei jeder Anfrage aus der DB),
+# wird bei jeder Änderung am Benutzer verworfen
+AUTHENTICATION_BACKENDS = ['arbeitsanweisungen.anmeldung.GecachterModelBackend']
+BENUTZER_CACHE_SEKUNDEN = int(os.environ.get('BENUTZER_CACHE_SEKUNDEN', '0' if SESSION_MODUS == 'db' else '300'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -150,6 +214,20 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ] if os.path.exists(os.path.join(BASE_DIR, 'static')) else []
 
+# Produktiv: gehashte Dateinamen plus .gz-Varianten (collectstatic mit DEBUG=False),
+# in der Entwicklung die Originaldateien ohne Manifest
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'arbeitsanweisungen.statische_dateien.KomprimierterManifestStorage'
+        ),
+    },
+}
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
@@ -157,8 +235,76 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # Data directory
 DATA_DIR = os.path.join(BASE_DIR, 'data')
 
+# Dokument-Dateien (arbeitsanweisungen/ablage.py): lokal in DATA_DIR oder mit
+# DOKUMENTE_SPEICHER=s3 in einem S3-kompatiblen Objektspeicher (z.B. MinIO, benötigt
+# boto3). Nach einem Wechsel überträgt manage.py dateien_migrieren den Bestand.
+DOKUMENTE_SPEICHER = os.environ.get('DOKUMENTE_SPEICHER', 'lokal')
+if DOKUMENTE_SPEICHER == 's3':
+    STORAGES['dokumente'] = {
+        'BACKEND': 'arbeitsanweisungen.objektspeicher.S3Speicher',
+        'OPTIONS': {
+            'bucket': os.environ.get('S3_BUCKET', 'arbeitsanweisungen'),
+            'endpoint_url': os.environ.get('S3_ENDPOINT_URL') or None,
+            # Adresse des Objektspeichers für Browser (vorab signierte Download-URLs),
+            # leer = S3_ENDPOINT_URL
+            'oeffentliche_url': os.environ.get('S3_OEFFENTLICHE_URL') or None,
+            'region': os.environ.get('S3_REGION') or None,
+            'access_key': os.environ.get('S3_ACCESS_KEY') or None,
+            'secret_key': os.environ.get('S3_SECRET_KEY') or None,
+            'praefix': os.environ.get('S3_PRAEFIX', ''),
+            'url_gueltigkeit': int(os.environ.get('S3_URL_GUELTIGKEIT', '300')),
+            # Multipart-Upload ab S3_MULTIPART_AB Bytes, in Teilen von S3_TEIL_GROESSE Bytes
+            'multipart_ab': int(os.environ.get('S3_MULTIPART_AB', str(8 * 1024 * 1024))),
+            'teil_groesse': int(os.environ.get('S3_TEIL_GROESSE', str(8 * 1024 * 1024))),
+        },
+    }
+else:
+    STORAGES['dokumente'] = {
+        'BACKEND': 'arbeitsanweisungen.ablage.LokalerSpeicher',
+    }
+
 X_FRAME_OPTIONS = 'SAMEORIGIN'
 
+# Performance-Messung (arbeitsanweisungen.middleware.PerformanceMiddleware)
+PERFORMANCE_SERVER_TIMING = os.environ.get('PERFORMANCE_SERVER_TIMING', 'True') == 'True'
+PERFORMANCE_SLOW_REQUEST_MS = int(os.environ.get('PERFORMANCE_SLOW_REQUEST_MS', '1000'))
+# Token für den Prometheus-Endpunkt /metriken/ (leer = nur Staff-Benutzer)
+PERFORMANCE_METRICS_TOKEN = os.environ.get('PERFORMANCE_METRICS_TOKEN', '')
+
+# Kategorien und Arbeitsplätze: Sekunden zwischen zwei Prüfungen auf Änderungen im Admin
+STAMMDATEN_PRUEFINTERVALL = float(os.environ.get('STAMMDATEN_PRUEFINTERVALL', '5'))
+
+# Admin-Liste: ab dieser geschätzten Trefferzahl kein exaktes COUNT(*) mehr (nur PostgreSQL)
+ADMIN_SCHAETZUNG_AB = int(os.environ.get('ADMIN_SCHAETZUNG_AB', '10000'))
+
+# Export: Dateien mit mehreren Prozessen komprimieren (1 = im Request-Thread),
+# aber erst ab dieser Gesamtgröße in Bytes, darunter lohnt der Pool nicht
+EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', '1'))
+EXPORT_PARALLEL_AB = int(os.environ.get('EXPORT_PARALLEL_AB', str(8 * 1024 * 1024)))
+
+# Import: Threads zum Kopieren der Dateien aus dem Archiv (die Datenbank schreibt
+# immer ein einzelner Thread in Batches)
+IMPORT_WORKERS = int(os.environ.get('IMPORT_WORKERS', '4'))
+
+# Vorschau: Office-Dokumente werden einmal je Inhalt nach PDF konvertiert (LibreOffice)
+# und in einem größenbegrenzten Cache außerhalb von DATA_DIR abgelegt
+VORSCHAU_KONVERTER = os.environ.get('VORSCHAU_KONVERTER', '')  # leer = soffice/libreoffice im PATH
+VORSCHAU_CACHE_DIR = os.environ.get('VORSCHAU_CACHE_DIR', os.path.join(BASE_DIR, 'vorschau_cache'))
+VORSCHAU_CACHE_MAX_MB = int(os.environ.get('VORSCHAU_CACHE_MAX_MB', '500'))
+VORSCHAU_TIMEOUT = int(os.environ.get('VORSCHAU_TIMEOUT', '120'))
+# Nach einer fehlgeschlagenen Konvertierung wird dieselbe Fassung so lange nicht erneut versucht
+VORSCHAU_FEHLER_SEKUNDEN = int(os.environ.get('VORSCHAU_FEHLER_SEKUNDEN', '3600'))
+
+# Kiosk-Seiten: statisches HTML je Arbeitsplatz, von nginx unter /kiosk/ ausgeliefert
+# (leer = aus)
+KIOSK_DIR = os.environ.get('KIOSK_DIR', '')
+
+# Zugriffsprotokoll (Download/Vorschau): gepuffert, geschrieben in Batches von
+# ZUGRIFF_PUFFER_GROESSE oder spätestens alle ZUGRIFF_PUFFER_SEKUNDEN (0 = ohne
+# Hintergrund-Thread, nur bei vollem Puffer)
+ZUGRIFF_PUFFER_GROESSE = int(os.environ.get('ZUGRIFF_PUFFER_GROESSE', '200'))
+ZUGRIFF_PUFFER_SEKUNDEN = float(os.environ.get('ZUGRIFF_PUFFER_SEKUNDEN', '5'))
+
 # Security Settings for Production
 if not DEBUG:
     SECURE_SSL_REDIRECT = False  # Set to True wenn HTTPS verwendet wird
@@ -167,41 +313,59 @@ if not DEBUG:
     SECURE_BROWSER_XSS_FILTER = True
     SECURE_CONTENT_TYPE_NOSNIFF = True
 
+# Alle Warnungen nur in der Entwicklung anzeigen (in Produktion kostet das Filtern bei jedem Import Zeit)
+if DEBUG:
+    import warnings
+    warnings.filterwarnings('default')
+
+# Logging: JSON-Zeilen (LOG_FORMAT=json, Standard ohne DEBUG) oder lesbarer Text,
+# geschrieben von einem Hintergrund-Thread (siehe arbeitsanweisungen/protokoll.py).
+# LOG_LEVEL gilt für alle Logger, LOG_LEVELS setzt einzelne, z.B.
+# LOG_LEVELS=django.db.backends=DEBUG,arbeitsanweisungen.performance=WARNING
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text' if DEBUG else 'json')
+LOG_LEVELS = dict(
+    (name.strip(), level.strip().upper())
+    for name, _, level in (eintrag.partition('=') for eintrag in os.getenv('LOG_LEVELS', '').split(','))
+    if name.strip() and level.strip()
+)
 
-
-import warnings
-warnings.filterwarnings('default')
-
-# Logging
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
     'formatters': {
         'verbose': {
-            'format': '{levelname} {asctime} {module} {message}',
+            'format': '{levelname} {asctime} {name} {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'arbeitsanweisungen.protokoll.JsonFormatter',
+        },
     },
     'handlers': {
         'console': {
-            'class': 'logging.StreamHandler'
+            'class': 'arbeitsanweisungen.protokoll.HintergrundHandler',
+            'stream': 'ext://sys.stderr',
+            'formatter': 'json' if LOG_FORMAT == 'json' else 'verbose',
         },
     },
     'root': {
         'handlers': ['console'],
-        'level': 'DEBUG' if DEBUG else 'INFO',
+        'level': os.getenv('LOG_LEVEL', 'INFO'),
     },
     'loggers': {
         'django': {
             'handlers': ['console'],
-            'level': os.getenv('DJANGO_LOG_LEVEL', 'DEBUG'),
+            # DEBUG nur bei Bedarf: django.db.backends protokolliert sonst jede SQL-Abfrage
+            'level': os.getenv('DJANGO_LOG_LEVEL', 'INFO'),
             'propagate': False,
+        },
         'django.utils.autoreload': {
-                'level': 'WARNING',  # Nur Warnungen und Fehler
-                'handlers': ['console'],
-                'propagate': False,
-            },
+            'level': 'WARNING',  # Nur Warnungen und Fehler
+        },
+        'arbeitsanweisungen.performance': {
+            'level': 'INFO',
         },
+        **{name: {'level': level} for name, level in LOG_LEVELS.items()},
     },
 }
 
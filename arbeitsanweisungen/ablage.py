@@ -0,0 +1,244 @@
+"""
+Ablage der Dokument-Dateien über die Storage-API von Django.
+
+Alle Zugriffe auf die Dateien der Arbeitsanweisungen laufen über den Storage
+``dokumente`` aus STORAGES:
+
+- lokal (Standard): ``LokalerSpeicher``, ein FileSystemStorage in DATA_DIR
+- S3-kompatibel (DOKUMENTE_SPEICHER=s3, z.B. MinIO): ``objektspeicher.S3Speicher``
+
+``datei_pfad`` behält sein Format (Pfad unter DATA_DIR), der Name im Storage
+ist der Dateiname. Damit bleiben Eindeutigkeit und Abgleich unverändert, und
+beim Wechsel des Storage müssen nur die Dateien kopiert werden
+(``manage.py dateien_migrieren``). Altbestand mit Pfaden außerhalb von
+DATA_DIR wird weiter direkt aus dem Dateisystem gelesen, bis der Befehl ihn
+in den Storage übernommen hat.
+"""
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, storages
+from django.http import FileResponse
+from django.utils.functional import cached_property
+
+SPEICHER = 'dokumente'
+
+BLOCK_GROESSE = 1024 * 1024
+
+
+class LokalerSpeicher(FileSystemStorage):
+    """
+    FileSystemStorage in DATA_DIR (folgt auch override_settings). Vorhandene
+    Dateien werden überschrieben statt umbenannt, wie beim Import erwartet.
+    """
+
+    def __init__(self, location=None, **kwargs):
+        kwargs.setdefault('allow_overwrite', True)
+        super().__init__(location, **kwargs)
+
+    @cached_property
+    def base_location(self):
+        return self._value_or_setting(self._location, settings.DATA_DIR)
+
+    def _clear_cached_properties(self, setting, **kwargs):
+        super()._clear_cached_properties(setting, **kwargs)
+        if setting == 'DATA_DIR':
+            self.__dict__.pop('base_location', None)
+            self.__dict__.pop('location', None)
+
+
+def speicher():
+    return storages[SPEICHER]
+
+
+def lokal():
+    """True, wenn die Dateien im lokalen Dateisystem liegen"""
+    return isinstance(speicher(), FileSystemStorage)
+
+
+def name(pfad):
+    """Name im Storage zu `pfad` oder None (kein Pfad oder Altbestand außerhalb von DATA_DIR)"""
+    if not pfad:
+        return None
+    pfad = os.path.normpath(pfad)
+    if os.path.dirname(pfad) != os.path.normpath(settings.DATA_DIR):
+        return None
+    return os.path.basename(pfad)
+
+
+def pfad(dateiname):
+    """datei_pfad zum Namen im Storage"""
+    return os.path.join(settings.DATA_DIR, dateiname)
+
+
+def lokaler_pfad(pfad):
+    """Pfad im Dateisystem oder None, wenn die Datei in einem Objektspeicher liegt"""
+    dateiname = name(pfad)
+    if dateiname is None:
+        return pfad or None
+    return speicher().path(dateiname) if lokal() else None
+
+
+def existiert(pfad):
+    dateiname = name(pfad)
+    if dateiname is None:
+        return bool(pfad) and os.path.isfile(pfad)
+    return speicher().exists(dateiname)
+
+
+def stat(pfad):
+    """(Größe in Bytes, Änderungszeit in ns) oder None, wenn die Datei fehlt"""
+    try:
+        lokaler = lokaler_pfad(pfad)
+        if lokaler is not None:
+            stat_ergebnis = os.stat(lokaler)
+            return stat_ergebnis.st_size, stat_ergebnis.st_mtime_ns
+        objektspeicher = speicher()
+        if hasattr(objektspeicher, 'kopfdaten'):
+            # Eine Anfrage statt je einer für Größe und Änderungszeit
+            return objektspeicher.kopfdaten(name(pfad))
+        dateiname = name(pfad)
+        return (objektspeicher.size(dateiname),
+                int(objektspeicher.get_modified_time(dateiname).timestamp() * 1_000_000_000))
+    except (OSError, TypeError, ValueError):
+        return None
+
+
+def dateistatus(pfade):
+    """
+    {datei_pfad (normalisiert): (Größe in Bytes, Änderungszeit in ns)} der
+    vorhandenen Dateien unter `pfade`. Aus einem Objektspeicher mit einer
+    Auflistung statt einer Anfrage je Datei, lokal und für Altbestand per
+    os.stat.
+    """
+    pfade = {os.path.normpath(p) for p in pfade if p}
+    ergebnis = {}
+    if not lokal() and any(name(p) is not None for p in pfade):
+        for dateiname, groesse, mtime_ns in _auflisten(speicher()):
+            datei_pfad = os.path.normpath(pfad(dateiname))
+            if datei_pfad in pfade:
+                ergebnis[datei_pfad] = (groesse, mtime_ns)
+    for datei_pfad in pfade - ergebnis.keys():
+        if lokal() or name(datei_pfad) is None:
+            stat_ergebnis = stat(datei_pfad)
+            if stat_ergebnis is not None:
+                ergebnis[datei_pfad] = stat_ergebnis
+    return ergebnis
+
+
+def oeffnen(pfad):
+    """Datei zum Lesen (binär), wird blockweise gelesen statt vollständig geladen"""
+    dateiname = name(pfad)
+    if dateiname is None:
+        return open(pfad, 'rb')
+    return speicher().open(dateiname, 'rb')
+
+
+@contextmanager
+def lokale_datei(pfad):
+    """
+    Pfad einer Datei im Dateisystem mit dem Inhalt von `pfad` (für externe
+    Programme). Aus einem Objektspeicher als temporäre Kopie.
+    """
+    lokaler = lokaler_pfad(pfad)
+    if lokaler is not None:
+        yield lokaler
+        return
+    with tempfile.TemporaryDirectory(prefix='ablage_') as verzeichnis:
+        ziel = os.path.join(verzeichnis, os.path.basename(pfad))
+        with oeffnen(pfad) as quelle, open(ziel, 'wb') as f:
+            shutil.copyfileobj(quelle, f, BLOCK_GROESSE)
+        yield ziel
+
+
+def speichern(dateiname, inhalt):
+    """Speichert `inhalt` (File, UploadedFile) unter `dateiname`, gibt den datei_pfad zurück"""
+    return pfad(speicher().save(dateiname, inhalt))
+
+
+def temp_verzeichnis():
+    """
+    Verzeichnis für Dateien, die mit uebernehmen() abgelegt werden. Lokal im
+    Storage selbst, damit os.replace auf demselben Dateisystem bleibt.
+    """
+    if lokal():
+        verzeichnis = speicher().location
+        os.makedirs(verzeichnis, exist_ok=True)
+        return verzeichnis
+    return tempfile.gettempdir()
+
+
+def uebernehmen(temp_pfad, dateiname):
+    """
+    Legt eine fertig geschriebene Datei aus temp_verzeichnis() unter
+    `dateiname` ab (lokal atomar per os.replace, sonst per Upload). Die
+    temporäre Datei ist danach entfernt. Gibt den datei_pfad zurück.
+    """
+    if lokal():
+        os.replace(temp_pfad, speicher().path(dateiname))
+        return pfad(dateiname)
+    try:
+        with open(temp_pfad, 'rb') as f:
+            return speichern(dateiname, File(f, dateiname))
+    finally:
+        os.remove(temp_pfad)
+
+
+def loeschen(pfad):
+    """Löscht die Datei, eine bereits fehlende ist kein Fehler (sonst OSError)"""
+    dateiname = name(pfad)
+    if dateiname is not None:
+        speicher().delete(dateiname)
+        return
+    try:
+        os.remove(pfad)
+    except FileNotFoundError:
+        pass
+
+
+def dateien():
+    """Alle Dateien im Storage: {datei_pfad (normalisiert): Änderungszeit als Timestamp}"""
+    objektspeicher = speicher()
+    if lokal():
+        verzeichnis = objektspeicher.location
+        if not os.path.isdir(verzeichnis):
+            return {}
+        with os.scandir(verzeichnis) as eintraege:
+            return {
+                os.path.normpath(pfad(e.name)): e.stat(follow_symlinks=False).st_mtime
+                for e in eintraege if e.is_file(follow_symlinks=False)
+            }
+    return {os.path.normpath(pfad(n)): mtime_ns / 1_000_000_000 for n, _, mtime_ns in _auflisten(objektspeicher)}
+
+
+def _auflisten(objektspeicher):
+    """(Name, Größe in Bytes, Änderungszeit in ns) aller Dateien eines Objektspeichers"""
+    if hasattr(objektspeicher, 'auflisten'):
+        return objektspeicher.auflisten()
+    return ((n, objektspeicher.size(n), int(objektspeicher.get_modified_time(n).timestamp() * 1_000_000_000))
+            for n in objektspeicher.listdir('')[1])
+
+
+def download_url(pfad, dateiname):
+    """
+    Vorab signierte URL für den Download direkt aus dem Objektspeicher oder
+    None (lokal liefert Django die Datei aus)
+    """
+    objektspeicher = speicher()
+    name_im_speicher = name(pfad)
+    if name_im_speicher is None or not hasattr(objektspeicher, 'download_url'):
+        return None
+    return objektspeicher.download_url(name_im_speicher, dateiname)
+
+
+def datei_antwort(pfad, **kwargs):
+    """FileResponse, die die Datei blockweise aus dem Storage streamt (mit Content-Length)"""
+    datei = oeffnen(pfad)
+    response = FileResponse(datei, **kwargs)
+    if not response.has_header('Content-Length') and getattr(datei, 'size', None) is not None:
+        response['Content-Length'] = datei.size
+    return response
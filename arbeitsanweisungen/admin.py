@@ -1,15 +1,159 @@
-from django.contrib import admin
-from .models import Arbeitsanweisung
+from django.conf import settings
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils.functional import cached_property
+
+from . import statistik
+from .dateien import dateien_nach_commit_loeschen
+from .models import Arbeitsanweisung, ArbeitsplatzEintrag, Dokumentzugriff, KategorieEintrag, ZugriffeProTag
+from .stammdaten import verzeichnis
+
+
+class GeschaetzterPaginator(Paginator):
+    """
+    Paginator ohne vollständiges COUNT(*) auf großen Tabellen:
+
+    - ungefiltert: Summe aus der Statistik-Tabelle (O(Kategorien))
+    - gefiltert auf PostgreSQL: Schätzung des Planers, sobald sie über
+      ADMIN_SCHAETZUNG_AB liegt (darunter ist ein exaktes COUNT billig)
+    - sonst: exaktes COUNT
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            return statistik.kategorie_zaehler()['alle']
+
+        if connection.vendor == 'postgresql':
+            schaetzung = self._planer_schaetzung(queryset)
+            if schaetzung is not None and schaetzung >= getattr(settings, 'ADMIN_SCHAETZUNG_AB', 10000):
+                return schaetzung
+
+        return super().count
+
+    @staticmethod
+    def _planer_schaetzung(queryset):
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        try:
+            return int(plan[0]['Plan']['Plan Rows'])
+        except (KeyError, IndexError, TypeError, ValueError):
+            return None
 
 
 @admin.register(Arbeitsanweisung)
 class ArbeitsanweisungAdmin(admin.ModelAdmin):
-    list_display = ['nummer', 'name', 'get_arbeitsplaetze_anzeige', 'kategorie', 'erstellt_am']
-    list_filter = ['kategorie', 'erstellt_am']
-    search_fields = ['nummer', 'name']
+    list_display = ['nummer', 'name', 'get_arbeitsplaetze_anzeige', 'kategorie', 'revision', 'erstellt_am']
+    # Kein Datumsfilter auf erstellt_am: der erzeugt eigene Abfragen über die ganze Tabelle
+    list_filter = ['kategorie']
+    # Nummern werden exakt gesucht (siehe get_search_results), Namen per icontains
+    search_fields = ['name']
+    search_help_text = 'Nummer (exakt) oder Teil des Namens'
+    list_per_page = 50
+
+    # Große Tabellen: kein zweites COUNT(*) für "x von y", geschätzte Seitenzahl
+    show_full_result_count = False
+    paginator = GeschaetzterPaginator
+
+    actions = ['revision_erhoehen']
 
     def get_arbeitsplaetze_anzeige(self, obj):
         """Zeigt Arbeitsplätze in der Admin-Liste"""
         return obj.get_arbeitsplaetze_display()
 
-    get_arbeitsplaetze_anzeige.short_description = 'Arbeitsplätze'
\ No newline at end of file
+    get_arbeitsplaetze_anzeige.short_description = 'Arbeitsplätze'
+
+    def get_search_results(self, request, queryset, search_term):
+        begriff = search_term.strip()
+        if begriff.isdigit():
+            # Exakter Treffer über den eindeutigen Index statt icontains mit CAST auf die Zahl
+            return queryset.filter(nummer=int(begriff)), False
+        return super().get_search_results(request, queryset, search_term)
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        # Je Kategorie eine Aktion "Kategorie setzen", Liste kommt aus den Stammdaten
+        for kategorie in verzeichnis().kategorien:
+            name = f'kategorie_{kategorie.schluessel}'
+            actions[name] = (self._kategorie_aktion(kategorie.schluessel), name,
+                             f'Kategorie setzen: {kategorie.label}')
+        return actions
+
+    @staticmethod
+    def _kategorie_aktion(schluessel):
+        def kategorie_setzen(modeladmin, request, queryset):
+            with transaction.atomic(), statistik.nachfuehren(queryset):
+                anzahl = queryset.update(kategorie=schluessel)
+            modeladmin.message_user(request, f'Kategorie von {anzahl} Arbeitsanweisung(en) geändert.',
+                                    messages.SUCCESS)
+        return kategorie_setzen
+
+    @admin.action(description='Revision erhöhen')
+    def revision_erhoehen(self, request, queryset):
+        with transaction.atomic(), statistik.nachfuehren(queryset):
+            anzahl = queryset.update(revision=F('revision') + 1)
+        self.message_user(request, f'Revision von {anzahl} Arbeitsanweisung(en) erhöht.', messages.SUCCESS)
+
+    def delete_queryset(self, request, queryset):
+        # Mengenbasiertes Löschen umgeht Arbeitsanweisung.delete(): Statistik hier
+        # nachführen und Dateien erst nach erfolgreichem Commit entfernen
+        with transaction.atomic(), statistik.nachfuehren(queryset):
+            dateien_nach_commit_loeschen(queryset.values_list('datei_pfad', flat=True))
+            super().delete_queryset(request, queryset)
+
+
+@admin.register(KategorieEintrag)
+class KategorieEintragAdmin(admin.ModelAdmin):
+    list_display = ['schluessel', 'label', 'farbe', 'icon', 'reihenfolge', 'bit']
+    list_editable = ['label', 'farbe', 'icon', 'reihenfolge']
+    search_fields = ['schluessel', 'label']
+
+
+@admin.register(ArbeitsplatzEintrag)
+class ArbeitsplatzEintragAdmin(admin.ModelAdmin):
+    list_display = ['schluessel', 'label', 'reihenfolge', 'bit']
+    list_editable = ['label', 'reihenfolge']
+    search_fields = ['schluessel', 'label']
+
+
+class NurLesenAdmin(admin.ModelAdmin):
+    """Protokolle werden nur von der Anwendung geschrieben"""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Dokumentzugriff)
+class DokumentzugriffAdmin(NurLesenAdmin):
+    list_display = ['zeitpunkt', 'nummer', 'revision', 'art', 'benutzername', 'ip']
+    list_filter = ['art']
+    search_fields = ['benutzername']
+    search_help_text = 'Nummer (exakt) oder Benutzername'
+    list_per_page = 100
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        begriff = search_term.strip()
+        if begriff.isdigit():
+            return queryset.filter(nummer=int(begriff)), False
+        return super().get_search_results(request, queryset, search_term)
+
+
+@admin.register(ZugriffeProTag)
+class ZugriffeProTagAdmin(NurLesenAdmin):
+    list_display = ['tag', 'nummer', 'revision', 'art', 'anzahl', 'benutzer']
+    list_filter = ['art']
+    search_fields = ['=nummer']
+    list_per_page = 100
+    show_full_result_count = False
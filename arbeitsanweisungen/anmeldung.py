@@ -0,0 +1,85 @@
+"""
+Anmeldung mit gecachtem Benutzer-Objekt.
+
+Der AuthenticationMiddleware-Aufruf ``get_user()`` liest bei jeder
+angemeldeten Anfrage den Benutzer aus der Datenbank. Mit
+BENUTZER_CACHE_SEKUNDEN > 0 liegt das Objekt im Sitzungs-Cache (Datei-Cache,
+von allen gunicorn-Workern geteilt). Jede Änderung am Benutzer (auch
+last_login und Passwort) verwirft den Eintrag, die Prüfung des
+Session-Hashes nach einer Passwortänderung bleibt damit wirksam.
+Berechtigungen werden nicht mitgecacht (das Objekt wird vor der ersten
+Rechteprüfung gespeichert), Gruppen- und Rechteänderungen wirken sofort.
+"""
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.sessions.backends.db import SessionStore as DbSessionStore
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+
+def _cache():
+    return caches[settings.SESSION_CACHE_ALIAS]
+
+
+def _schluessel(user_id):
+    return f'benutzer:{user_id}'
+
+
+def benutzer_verwerfen(user_id):
+    if settings.BENUTZER_CACHE_SEKUNDEN > 0:
+        _cache().delete(_schluessel(user_id))
+
+
+class GecachterModelBackend(ModelBackend):
+    """ModelBackend, dessen get_user() zuerst im Cache nachsieht"""
+
+    def get_user(self, user_id):
+        sekunden = settings.BENUTZER_CACHE_SEKUNDEN
+        if sekunden <= 0:
+            return super().get_user(user_id)
+
+        schluessel = _schluessel(user_id)
+        user = _cache().get(schluessel)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                _cache().set(schluessel, user, sekunden)
+        return user
+
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def benutzer_geaendert(sender, instance, **kwargs):
+    # Sofort und nach dem Commit, sonst könnte ein paralleler Request den alten Stand erneut cachen
+    pk = instance.pk
+    benutzer_verwerfen(pk)
+    transaction.on_commit(lambda: benutzer_verwerfen(pk))
+
+
+def abgelaufene_sitzungen_loeschen(batch_groesse=5000, pause=0.0):
+    """
+    Löscht abgelaufene Sitzungen aus django_session in Batches (kurze
+    Sperren statt eines DELETE über die ganze Tabelle). Gibt die Anzahl
+    gelöschter Sitzungen zurück, None wenn die Sitzungen nur im Cache liegen
+    (dort verfallen sie von selbst).
+    """
+    store = import_module(settings.SESSION_ENGINE).SessionStore
+    if not issubclass(store, DbSessionStore):
+        return None
+
+    model = store.get_model_class()
+    grenze = timezone.now()
+    geloescht = 0
+    while True:
+        pks = list(model.objects.filter(expire_date__lt=grenze).values_list('pk', flat=True)[:batch_groesse])
+        if not pks:
+            return geloescht
+        geloescht += model.objects.filter(pk__in=pks).delete()[0]
+        if pause:
+            time.sleep(pause)
+
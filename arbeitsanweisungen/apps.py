@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ArbeitsanweisungenConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'arbeitsanweisungen'
+
+    def ready(self):
+        # Signal-Empfänger für den Benutzer-Cache und die Kiosk-Seiten registrieren
+        from . import anmeldung, kiosk  # noqa: F401
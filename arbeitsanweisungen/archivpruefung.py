@@ -0,0 +1,143 @@
+"""
+Prüfung eines Export-Archivs gegen die Prüfsummen im Manifest.
+
+Der Export hält je Datei SHA-256 und Größe im Manifest fest (``datei_sha256``,
+``datei_groesse``). Geprüft wird in zwei Stufen:
+
+1. ohne Entpacken: jede Datei muss im Archiv liegen, die Größe aus dem
+   Inhaltsverzeichnis des ZIP muss passen
+2. Inhalt: die Dateien werden von mehreren Threads entpackt und gehasht
+   (zlib und hashlib geben den GIL frei). Mit ``beim_ersten_fehler`` brechen
+   alle Threads ab, sobald eine Abweichung gefunden ist.
+
+Einträge ohne Prüfsumme (ältere Exporte) werden nur entpackt, dabei prüft
+zipfile die CRC-32 des Archivs.
+"""
+import hashlib
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+from .manifest import eintraege_lesen
+
+BLOCK_GROESSE = 1024 * 1024
+
+
+@dataclass
+class PruefErgebnis:
+    geprueft: int = 0
+    ohne_pruefsumme: int = 0
+    gelesen: int = 0  # Bytes
+    fehler: list = field(default_factory=list)
+    abgebrochen: bool = False
+
+    @property
+    def ok(self):
+        return not self.fehler
+
+
+class _Abbruch(Exception):
+    pass
+
+
+def archiv_pruefen(zip_pfad, worker=None, beim_ersten_fehler=True):
+    """
+    Prüft das Archiv unter `zip_pfad` mit `worker` Threads (Standard:
+    IMPORT_WORKERS). Löst manifest.UngueltigesArchiv aus, wenn das Manifest
+    fehlt oder unlesbar ist.
+    """
+    ergebnis = PruefErgebnis()
+    with zipfile.ZipFile(zip_pfad) as zipf:
+        groessen = {info.filename: info.file_size for info in zipf.infolist()}
+
+        def zeile_fehlerhaft(zeilennummer, fehler):
+            ergebnis.fehler.append(f'Manifest Zeile {zeilennummer}: {fehler}')
+
+        auftraege = []
+        for meta in eintraege_lesen(zipf, zeile_fehlerhaft):
+            datei_name = meta.get('datei_name') if isinstance(meta, dict) else None
+            if not datei_name:
+                continue
+            mitglied = f'dateien/{datei_name}'
+            erwartet_groesse = meta.get('datei_groesse')
+            if mitglied not in groessen:
+                ergebnis.fehler.append(f'{mitglied}: fehlt im Archiv')
+            elif erwartet_groesse is not None and groessen[mitglied] != erwartet_groesse:
+                ergebnis.fehler.append(
+                    f'{mitglied}: Größe {groessen[mitglied]} statt {erwartet_groesse} Bytes')
+            else:
+                auftraege.append((groessen[mitglied], mitglied, meta.get('datei_sha256')))
+            if ergebnis.fehler and beim_ersten_fehler:
+                ergebnis.abgebrochen = True
+                return ergebnis
+
+    if auftraege:
+        _inhalte_pruefen(zip_pfad, auftraege, worker or settings.IMPORT_WORKERS, beim_ersten_fehler, ergebnis)
+    return ergebnis
+
+
+def _inhalte_pruefen(zip_pfad, auftraege, worker, beim_ersten_fehler, ergebnis):
+    abbruch = threading.Event()
+    lokal = threading.local()
+    offene_dateien = []
+    lock = threading.Lock()
+
+    def zip_handle():
+        # Eigenes Handle je Thread, das Lesen aus einem ZipFile ist nicht thread-sicher
+        zipf = getattr(lokal, 'zipf', None)
+        if zipf is None:
+            zipf = lokal.zipf = zipfile.ZipFile(zip_pfad)
+            with lock:
+                offene_dateien.append(zipf)
+        return zipf
+
+    def pruefen(auftrag):
+        _, mitglied, erwartet = auftrag
+        if abbruch.is_set():
+            return
+        hash_wert = hashlib.sha256()
+        gelesen = 0
+        try:
+            with zip_handle().open(mitglied) as quelle:
+                while block := quelle.read(BLOCK_GROESSE):
+                    if abbruch.is_set():
+                        raise _Abbruch
+                    hash_wert.update(block)
+                    gelesen += len(block)
+        except _Abbruch:
+            return
+        except (zipfile.BadZipFile, OSError, EOFError) as e:
+            fehler = f'{mitglied}: {e}'
+        else:
+            fehler = None
+            if erwartet is not None and hash_wert.hexdigest() != erwartet:
+                fehler = f'{mitglied}: SHA-256 stimmt nicht überein'
+
+        with lock:
+            ergebnis.gelesen += gelesen
+            if erwartet is None:
+                ergebnis.ohne_pruefsumme += 1
+            if fehler:
+                ergebnis.fehler.append(fehler)
+                if beim_ersten_fehler:
+                    abbruch.set()
+            else:
+                ergebnis.geprueft += 1
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, worker), thread_name_prefix='archivpruefung') as pool:
+            # Große Dateien zuerst, damit am Ende nicht ein Thread allein hasht
+            futures = [pool.submit(pruefen, auftrag) for auftrag in sorted(auftraege, key=lambda a: a[0], reverse=True)]
+            for future in futures:
+                future.result()
+                if abbruch.is_set():
+                    for offen in futures:
+                        offen.cancel()
+                    break
+    finally:
+        for zipf in offene_dateien:
+            zipf.close()
+    ergebnis.abgebrochen = abbruch.is_set()
@@ -0,0 +1,387 @@
+"""
+Benchmark aller Views: Anzahl Abfragen, Latenz-Perzentile und Spitzenspeicher.
+
+Wird über ``python manage.py benchmark`` ausgeführt (eigene Test-Datenbank und
+temporäres DATA_DIR). Die Ergebnisse werden als JSON geschrieben, damit
+Messungen verschiedener Commits verglichen werden können.
+"""
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .forms import ArbeitsanweisungSearchForm
+from . import statistik
+from .models import Arbeitsanweisung
+from .stammdaten import verzeichnis
+
+# Dateitypen der erzeugten Testdateien (Endung, Größe in Bytes)
+DATEI_TYPEN = (
+    ('.pdf', 16 * 1024),
+    ('.txt', 2 * 1024),
+    ('.xlsx', 8 * 1024),
+)
+
+
+def perzentil(werte, p):
+    """Perzentil mit linearer Interpolation (p zwischen 0 und 100)"""
+    werte = sorted(werte)
+    if len(werte) == 1:
+        return werte[0]
+    k = (len(werte) - 1) * p / 100
+    f = int(k)
+    c = min(f + 1, len(werte) - 1)
+    return werte[f] + (werte[c] - werte[f]) * (k - f)
+
+
+def latenz_statistik(dauern):
+    """Latenz-Kennzahlen in Millisekunden"""
+    ms = [d * 1000 for d in dauern]
+    return {
+        'min': round(min(ms), 3),
+        'mittel': round(statistics.fmean(ms), 3),
+        'p50': round(perzentil(ms, 50), 3),
+        'p90': round(perzentil(ms, 90), 3),
+        'p95': round(perzentil(ms, 95), 3),
+        'p99': round(perzentil(ms, 99), 3),
+        'max': round(max(ms), 3),
+    }
+
+
+class Benchmark:
+    """
+    Befüllt die aktuelle Datenbank und DATA_DIR mit Testdaten und misst alle Views.
+    Erwartet eine leere (Test-)Datenbank.
+    """
+
+    SEED_BATCH = 5000
+    IMPORT_UMFANG = 1000
+
+    def __init__(self, wiederholungen=20, wiederholungen_schwer=3, szenarien=None, ausgabe=None):
+        self.wiederholungen = wiederholungen
+        self.wiederholungen_schwer = wiederholungen_schwer
+        self.szenarien = set(szenarien) if szenarien else None
+        self.ausgabe = ausgabe or (lambda text: None)
+        self.client = Client()
+        self.anzahl = 0
+        self._temp_archive = []
+
+        user_model = get_user_model()
+        self.user = user_model.objects.filter(username='benchmark').first() \
+            or user_model.objects.create_user('benchmark', password='benchmark')
+        self.client.force_login(self.user)
+
+    # ========== Testdaten ==========
+
+    def befuellen(self, ziel_anzahl):
+        """Ergänzt Arbeitsanweisungen samt Dateien bis `ziel_anzahl` erreicht ist"""
+        os.makedirs(settings.DATA_DIR, exist_ok=True)
+        kategorien = [k.schluessel for k in verzeichnis().kategorien]
+        arbeitsplaetze = [a.schluessel for a in verzeichnis().arbeitsplaetze]
+        inhalte = {endung: os.urandom(groesse) for endung, groesse in DATEI_TYPEN}
+
+        batch = []
+        for i in range(self.anzahl, ziel_anzahl):
+            nummer = (i + 1) * 10
+            endung, _ = DATEI_TYPEN[i % len(DATEI_TYPEN)]
+            datei_pfad = os.path.join(settings.DATA_DIR, f'AA_{nummer}_benchmark{endung}')
+            with open(datei_pfad, 'wb') as f:
+                f.write(inhalte[endung])
+
+            batch.append(Arbeitsanweisung(
+                nummer=nummer,
+                name=f'Anweisung {nummer} {kategorien[i % len(kategorien)]}',
+                kategorie=kategorien[i % len(kategorien)],
+                arbeitsplaetze=[arbeitsplaetze[(i + k) % len(arbeitsplaetze)] for k in range(1 + i % 3)],
+                revision=1 + i % 5,
+                datei_pfad=datei_pfad,
+            ))
+            if len(batch) >= self.SEED_BATCH:
+                self._anlegen(batch)
+                batch = []
+        if batch:
+            self._anlegen(batch)
+        self.anzahl = ziel_anzahl
+
+    def _anlegen(self, batch):
+        # bulk_create umgeht save(), Statistik daher direkt fortschreiben
+        Arbeitsanweisung.objects.bulk_create(batch)
+        statistik.anpassen([], [statistik.werte(anweisung) for anweisung in batch])
+
+    # ========== Messung ==========
+
+    def messen(self, anfrage, wiederholungen):
+        """
+        Führt `anfrage` (gibt eine Response zurück) mehrfach aus.
+        Abfragen werden beim ersten Lauf gezählt, Spitzenspeicher in einem
+        eigenen Lauf mit tracemalloc, damit die Latenz nicht verfälscht wird.
+        """
+        abfragen = []
+        with connection.execute_wrapper(lambda execute, *args: abfragen.append(1) or execute(*args)):
+            status = self._ausfuehren(anfrage)
+
+        dauern = []
+        for _ in range(wiederholungen):
+            start = time.perf_counter()
+            self._ausfuehren(anfrage)
+            dauern.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        try:
+            self._ausfuehren(anfrage)
+            _, spitze = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'status': status,
+            'abfragen': len(abfragen),
+            'latenz_ms': latenz_statistik(dauern),
+            'spitzenspeicher_kb': round(spitze / 1024, 1),
+        }
+
+    def _ausfuehren(self, anfrage):
+        response = anfrage()
+        # Gestreamte Antworten (Download, Export) vollständig lesen
+        if getattr(response, 'streaming', False):
+            for _ in response.streaming_content:
+                pass
+        response.close()
+        return response.status_code
+
+    def szenarien_liste(self):
+        """Alle Szenarien als (name, anfrage, schwer)"""
+        liste_url = reverse('arbeitsanweisung_liste')
+        beispiel = Arbeitsanweisung.objects.order_by('nummer')[self.anzahl // 2].nummer
+
+        szenarien = []
+        for sortierung, _ in ArbeitsanweisungSearchForm.base_fields['sortierung'].choices:
+            szenarien.append((f'liste?sortierung={sortierung}',
+                              self._get(liste_url, {'sortierung': sortierung}), False))
+        for arbeitsplatz, _ in verzeichnis().arbeitsplatz_choices:
+            szenarien.append((f'liste?arbeitsplatz={arbeitsplatz}',
+                              self._get(liste_url, {'arbeitsplatz': arbeitsplatz}), False))
+        szenarien += [
+            ('liste?suchbegriff', self._get(liste_url, {'suchbegriff': 'Anweisung 1'}), False),
+            # Verbindungsaufbau: neue Verbindung pro Request (CONN_MAX_AGE=0) gegen persistente Verbindung
+            ('verbindung?modus=neu', self._mit_neuer_verbindung(self._get(liste_url)), False),
+            ('verbindung?modus=persistent', self._get(liste_url), False),
+            ('detail', self._get(reverse('arbeitsanweisung_detail', args=[beispiel])), False),
+            ('download', self._get(reverse('arbeitsanweisung_datei_download', args=[beispiel])), False),
+            ('preview', self._get(reverse('arbeitsanweisung_datei_preview', args=[beispiel])), False),
+            ('export', self._get(reverse('arbeitsanweisung_export_all')), True),
+            ('import', self._import_anfrage(), True),
+        ]
+        return szenarien
+
+    def _get(self, url, params=None):
+        return lambda: self.client.get(url, params or {})
+
+    def _mit_neuer_verbindung(self, anfrage):
+        """
+        Schließt die Verbindung vor jedem Request, wie es Django bei CONN_MAX_AGE=0
+        am Ende jedes Requests tut. Bei SQLite-In-Memory-Datenbanken ignoriert
+        Django das Schließen, dort ist kein Unterschied messbar.
+        """
+        def mit_neuer_verbindung():
+            connection.close()
+            return anfrage()
+        return mit_neuer_verbindung
+
+    def _import_anfrage(self):
+        """
+        Importiert ein Export-Archiv der ersten IMPORT_UMFANG Arbeitsanweisungen
+        mit Überschreiben (das Import-Formular begrenzt Archive auf 100 MB)
+        """
+        from .export import export_archiv_schreiben
+
+        archiv = None
+
+        def anfrage():
+            nonlocal archiv
+            if archiv is None:
+                fd, archiv = tempfile.mkstemp(suffix='.zip')
+                self._temp_archive.append(archiv)
+                with os.fdopen(fd, 'wb') as f:
+                    export_archiv_schreiben(Arbeitsanweisung.objects.all()[:self.IMPORT_UMFANG], f)
+            with open(archiv, 'rb') as f:
+                return self.client.post(reverse('arbeitsanweisung_import'),
+                                        {'zip_datei': f, 'ueberschreiben': 'on'})
+        return anfrage
+
+    def ausfuehren(self, groessen):
+        """Misst alle Szenarien für jede Bestandsgröße, gibt die Ergebnisse zurück"""
+        ergebnisse = {}
+        for groesse in sorted(groessen):
+            start = time.perf_counter()
+            self.befuellen(groesse)
+            self.ausgabe(f'{groesse} Arbeitsanweisungen angelegt ({time.perf_counter() - start:.1f} s)')
+
+            self._temp_archive = []
+            try:
+                ergebnisse[str(groesse)] = messwerte = {}
+                for name, anfrage, schwer in self.szenarien_liste():
+                    if self.szenarien and name.split('?')[0] not in self.szenarien:
+                        continue
+                    wiederholungen = self.wiederholungen_schwer if schwer else self.wiederholungen
+                    messwerte[name] = self.messen(anfrage, wiederholungen)
+                    latenz = messwerte[name]['latenz_ms']
+                    self.ausgabe(f'  {name:45} {messwerte[name]["abfragen"]:5} Abfragen  '
+                                 f'p50 {latenz["p50"]:9.2f} ms  p95 {latenz["p95"]:9.2f} ms  '
+                                 f'{messwerte[name]["spitzenspeicher_kb"]:10.1f} KB')
+                neu, persistent = messwerte.get('verbindung?modus=neu'), messwerte.get('verbindung?modus=persistent')
+                if neu and persistent:
+                    ersparnis = neu['latenz_ms']['p50'] - persistent['latenz_ms']['p50']
+                    self.ausgabe(f'  Persistente Verbindung spart {ersparnis:.2f} ms pro Request (p50, {connection.vendor})')
+            finally:
+                for archiv in self._temp_archive:
+                    os.remove(archiv)
+        return ergebnisse
+
+
+# Korpus für die Export-Skalierung: (Endung, Größe in Bytes, Anteil Text)
+# PDF: Text-Streams und eingebettete Bilder, TXT: reiner Text, XLSX: bereits ZIP-komprimiert
+KORPUS_TYPEN = (
+    ('.pdf', 512 * 1024, 0.5),
+    ('.txt', 64 * 1024, 1.0),
+    ('.xlsx', 128 * 1024, 0.0),
+)
+
+KORPUS_WOERTER = (
+    'Arbeitsanweisung Prüfung Maschine Werkstück Schweißnaht Sicherheit Qualität Montage '
+    'Bauteil Toleranz Messmittel Freigabe Schutzbrille Handschuhe Spannvorrichtung Drehmoment '
+    'prüfen einstellen reinigen dokumentieren kontrollieren der die das und mit nach vor'
+).split()
+
+
+def export_korpus(verzeichnis, anzahl, seed=1):
+    """
+    Legt `anzahl` Dateien gemischter Typen in `verzeichnis` an und gibt passende,
+    nicht gespeicherte Arbeitsanweisungen zurück (für export_archiv_schreiben).
+    """
+    zufall = random.Random(seed)
+    jetzt = timezone.now()
+    anweisungen = []
+    for i in range(anzahl):
+        endung, groesse, text_anteil = KORPUS_TYPEN[i % len(KORPUS_TYPEN)]
+        text_bytes = int(groesse * text_anteil)
+        text = ' '.join(zufall.choices(KORPUS_WOERTER, k=text_bytes // 6 + 1)).encode()[:text_bytes]
+        inhalt = text + zufall.randbytes(groesse - len(text))
+
+        datei_pfad = os.path.join(verzeichnis, f'AA_{(i + 1) * 10}_korpus{endung}')
+        with open(datei_pfad, 'wb') as f:
+            f.write(inhalt)
+        anweisungen.append(Arbeitsanweisung(
+            nummer=(i + 1) * 10, name=f'Korpus {i + 1}', kategorie='arbeitsanweisung',
+            arbeitsplaetze=[], revision=1, datei_pfad=datei_pfad, erstellt_am=jetzt,
+        ))
+    return anweisungen
+
+
+def export_skalierung(anweisungen, worker_liste, wiederholungen=3, ausgabe=None):
+    """
+    Misst export_archiv_schreiben mit verschiedenen Worker-Anzahlen.
+    Der Pool wird vor der Messung einmal gestartet (Start der Prozesse zählt nicht).
+    """
+    from .export import export_archiv_schreiben
+
+    ausgabe = ausgabe or (lambda text: None)
+    volumen = sum(os.path.getsize(a.datei_pfad) for a in anweisungen)
+    ergebnisse = {}
+    basis = None
+
+    with override_settings(EXPORT_PARALLEL_AB=0):
+        for worker in worker_liste:
+            dauern = []
+            for lauf in range(wiederholungen + 1):
+                with tempfile.TemporaryFile() as ziel:
+                    start = time.perf_counter()
+                    export_archiv_schreiben(anweisungen, ziel, worker=worker)
+                    if lauf:
+                        dauern.append(time.perf_counter() - start)
+                    archiv_groesse = ziel.tell()
+
+            sekunden = statistics.median(dauern)
+            basis = basis or sekunden
+            ergebnisse[str(worker)] = werte = {
+                'sekunden': round(sekunden, 3),
+                'mb_pro_s': round(volumen / sekunden / (1024 * 1024), 1),
+                'beschleunigung': round(basis / sekunden, 2),
+                'archiv_mb': round(archiv_groesse / (1024 * 1024), 1),
+            }
+            ausgabe(f'  Export {worker:2} Worker: {werte["sekunden"]:7.3f} s  {werte["mb_pro_s"]:7.1f} MB/s  '
+                    f'x{werte["beschleunigung"]:.2f}')
+    return ergebnisse
+
+
+def import_skalierung(anweisungen, worker_liste, wiederholungen=3, ausgabe=None):
+    """
+    Misst archiv_importieren (mit Überschreiben) mit verschiedenen Thread-Anzahlen
+    für das Kopieren der Dateien. Der erste Lauf legt die Arbeitsanweisungen an
+    und zählt nicht, gemessen werden Aktualisierungen.
+    """
+    from django.core.files.uploadedfile import SimpleUploadedFile
+
+    from .export import export_archiv_schreiben
+    from .importieren import archiv_importieren
+
+    ausgabe = ausgabe or (lambda text: None)
+    volumen = sum(os.path.getsize(a.datei_pfad) for a in anweisungen)
+    ergebnisse = {}
+    basis = None
+
+    with tempfile.TemporaryFile() as archiv:
+        export_archiv_schreiben(anweisungen, archiv, worker=1)
+        archiv.seek(0)
+        inhalt = archiv.read()
+
+    with tempfile.TemporaryDirectory(prefix='import_') as ziel_dir, override_settings(DATA_DIR=ziel_dir):
+        for worker in worker_liste:
+            dauern = []
+            for lauf in range(wiederholungen + 1):
+                upload = SimpleUploadedFile('import.zip', inhalt, content_type='application/zip')
+                start = time.perf_counter()
+                ergebnis = archiv_importieren(upload, ueberschreiben=True, worker=worker)
+                if lauf:
+                    dauern.append(time.perf_counter() - start)
+
+            sekunden = statistics.median(dauern)
+            basis = basis or sekunden
+            ergebnisse[str(worker)] = werte = {
+                'sekunden': round(sekunden, 3),
+                'mb_pro_s': round(volumen / sekunden / (1024 * 1024), 1),
+                'beschleunigung': round(basis / sekunden, 2),
+                'fehler': ergebnis.fehler,
+            }
+            ausgabe(f'  Import {worker:2} Worker: {werte["sekunden"]:7.3f} s  {werte["mb_pro_s"]:7.1f} MB/s  '
+                    f'x{werte["beschleunigung"]:.2f}')
+    return ergebnisse
+
+
+def vergleichen(alt, neu, schwelle=0.1):
+    """
+    Vergleicht zwei Ergebnisdateien. Gibt Zeilen für alle Szenarien zurück, deren
+    p50-Latenz um mehr als `schwelle` gestiegen ist oder die mehr Abfragen brauchen.
+    """
+    zeilen = []
+    for groesse, szenarien in neu.get('ergebnisse', {}).items():
+        for name, werte in szenarien.items():
+            vorher = alt.get('ergebnisse', {}).get(groesse, {}).get(name)
+            if not vorher:
+                continue
+            p50_alt, p50_neu = vorher['latenz_ms']['p50'], werte['latenz_ms']['p50']
+            if werte['abfragen'] > vorher['abfragen']:
+                zeilen.append(f'{groesse} {name}: Abfragen {vorher["abfragen"]} -> {werte["abfragen"]}')
+            if p50_alt and (p50_neu - p50_alt) / p50_alt > schwelle:
+                zeilen.append(f'{groesse} {name}: p50 {p50_alt:.2f} ms -> {p50_neu:.2f} ms')
+    return zeilen
@@ -0,0 +1,31 @@
+import logging
+
+from django.db import transaction
+
+from . import ablage
+
+logger = logging.getLogger(__name__)
+
+
+def dateien_loeschen(pfade):
+    """Löscht die angegebenen Dateien, Fehler werden gesammelt statt abzubrechen"""
+    fehler = []
+    for pfad in pfade:
+        if not pfad:
+            continue
+        try:
+            ablage.loeschen(pfad)
+        except OSError as e:
+            fehler.append((pfad, e))
+            logger.warning('Fehler beim Löschen der Datei %s: %s', pfad, e)
+    return fehler
+
+
+def dateien_nach_commit_loeschen(pfade):
+    """
+    Löscht Dateien gesammelt, sobald die laufende Transaktion erfolgreich
+    abgeschlossen ist. Bei einem Rollback bleiben die Dateien erhalten.
+    """
+    pfade = [pfad for pfad in pfade if pfad]
+    if pfade:
+        transaction.on_commit(lambda: dateien_loeschen(pfade))
@@ -0,0 +1,186 @@
+import json
+import logging
+import os
+import platform
+import shutil
+import tempfile
+import time
+import zipfile
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import QuerySet
+from django.http import FileResponse
+
+from . import ablage, metriken
+from .manifest import MANIFEST, ManifestSchreiber, pruefsumme
+
+logger = logging.getLogger(__name__)
+
+
+def export_archiv_schreiben(arbeitsanweisungen, ziel, worker=None):
+    """
+    Schreibt Arbeitsanweisungen samt Dateien als Export-Archiv nach `ziel`
+    (Pfad oder File-Objekt). Gibt die Anzahl exportierter Einträge zurück.
+
+    Mit mehr als einem `worker` (Standard: EXPORT_WORKERS) werden die Dateien
+    parallel komprimiert, sofern sie zusammen mindestens EXPORT_PARALLEL_AB
+    Bytes groß sind. Das Archiv ist in beiden Fällen gleich aufgebaut.
+
+    Jede Datei wird nur einmal gelesen: die Prüfsumme entsteht beim
+    Schreiben ins Archiv (bzw. im Worker-Prozess beim Komprimieren). Das
+    Manifest wird deshalb nach den Dateien geschrieben, die Metadaten liegen
+    bis dahin zeilenweise in einer temporären Datei. Aus einem Objektspeicher
+    werden die Dateien sequentiell direkt ins Archiv gestreamt, für die
+    parallele Komprimierung einmal in ein temporäres Verzeichnis geladen.
+
+    Struktur:
+    - arbeitsanweisungen.jsonl: Metadaten, eine Zeile je Arbeitsanweisung (siehe manifest.py)
+    - README.txt
+    - dateien/: Alle zugehörigen Dateien
+    """
+    if worker is None:
+        worker = settings.EXPORT_WORKERS
+    if isinstance(arbeitsanweisungen, QuerySet):
+        arbeitsanweisungen = arbeitsanweisungen.iterator(chunk_size=2000)
+
+    with tempfile.TemporaryDirectory(prefix='export_') as arbeitsverzeichnis, \
+            zipfile.ZipFile(ziel, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        # Metadaten zwischenspeichern, Dateien merken (datei_pfad, arcname)
+        metadaten_pfad = os.path.join(arbeitsverzeichnis, 'metadaten.jsonl')
+        dateien = []
+        with open(metadaten_pfad, 'w', encoding='utf-8') as metadaten:
+            for anweisung in arbeitsanweisungen:
+                meta = {
+                    'nummer': anweisung.nummer,
+                    'name': anweisung.name,
+                    'arbeitsplaetze': anweisung.arbeitsplaetze,
+                    'kategorie': anweisung.kategorie,
+                    'revision': anweisung.revision,
+                    'erstellt_am': anweisung.erstellt_am.isoformat(),
+                    'datei_name': None,
+                }
+                if anweisung.datei_pfad:
+                    meta['datei_name'] = os.path.basename(anweisung.datei_pfad)
+                    dateien.append((anweisung.datei_pfad, f'dateien/{meta["datei_name"]}'))
+                metadaten.write(json.dumps(meta, ensure_ascii=False) + '\n')
+
+        # Eine Abfrage des Storage für alle Größen (aus einem Objektspeicher eine Auflistung)
+        status = ablage.dateistatus(pfad for pfad, _ in dateien)
+        dateien = [(pfad, arcname, status[os.path.normpath(pfad)])
+                   for pfad, arcname in dateien if os.path.normpath(pfad) in status]
+        gesamt_groesse = sum(groesse for _, _, (groesse, _) in dateien)
+
+        # {arcname: (SHA-256, Größe)} der geschriebenen Dateien
+        if worker > 1 and len(dateien) > 1 and gesamt_groesse >= settings.EXPORT_PARALLEL_AB \
+                and _parallel_unterstuetzt(zipf):
+            from .kompression import dateien_parallel_schreiben
+
+            lokale = _lokal_bereitstellen(dateien, arbeitsverzeichnis)
+            pruefsummen = dateien_parallel_schreiben(zipf, lokale, worker)
+        else:
+            pruefsummen = {}
+            for pfad, arcname, (groesse, _) in dateien:
+                try:
+                    pruefsummen[arcname] = _datei_schreiben(zipf, pfad, arcname, groesse)
+                except FileNotFoundError:
+                    pass
+
+        # Metadaten Zeile für Zeile ins Manifest, mit Prüfsumme für Import und verify_export
+        with ManifestSchreiber(zipf) as manifest, open(metadaten_pfad, encoding='utf-8') as metadaten:
+            for zeile in metadaten:
+                meta = json.loads(zeile)
+                if meta['datei_name']:
+                    werte = pruefsummen.get(f'dateien/{meta["datei_name"]}')
+                    if werte is None:
+                        meta['datei_name'] = None
+                    else:
+                        meta['datei_sha256'], meta['datei_groesse'] = werte
+                manifest.schreiben(meta)
+        zipf.writestr('README.txt', _readme(manifest.anzahl))
+
+    return manifest.anzahl
+
+
+def _parallel_unterstuetzt(zipf):
+    from . import kompression
+
+    if kompression.unterstuetzt(zipf):
+        return True
+    logger.warning('Paralleler Export mit Python %s nicht geprüft, Dateien werden sequentiell komprimiert',
+                   platform.python_version())
+    return False
+
+
+def _datei_schreiben(zipf, pfad, arcname, groesse):
+    """Streamt die Datei ins Archiv, gibt (SHA-256, Größe) zurück (beim Schreiben berechnet)"""
+    lokaler = ablage.lokaler_pfad(pfad)
+    if lokaler is not None:
+        # Wie ZipFile.write: Änderungszeit und Rechte aus dem Dateisystem
+        zinfo = zipfile.ZipInfo.from_file(lokaler, arcname)
+    else:
+        zinfo = zipfile.ZipInfo(arcname, time.localtime()[:6])
+        zinfo.external_attr = 0o644 << 16
+        zinfo.file_size = groesse  # für die Entscheidung über ZIP64
+    zinfo.compress_type = zipfile.ZIP_DEFLATED
+    with ablage.oeffnen(pfad) as quelle, zipf.open(zinfo, 'w') as ziel:
+        return pruefsumme(quelle, ziel)
+
+
+def _lokal_bereitstellen(dateien, verzeichnis):
+    """
+    [(Pfad im Dateisystem, arcname), ...] für die Worker-Prozesse. Dateien aus
+    einem Objektspeicher werden dafür einmal nach `verzeichnis` geladen,
+    fehlende übersprungen.
+    """
+    kopien = os.path.join(verzeichnis, 'dateien')
+    os.makedirs(kopien, exist_ok=True)
+    lokale = []
+    for pfad, arcname, _ in dateien:
+        lokaler = ablage.lokaler_pfad(pfad)
+        if lokaler is None:
+            lokaler = os.path.join(kopien, os.path.basename(pfad))
+            try:
+                with ablage.oeffnen(pfad) as quelle, open(lokaler, 'wb') as kopie:
+                    shutil.copyfileobj(quelle, kopie, ablage.BLOCK_GROESSE)
+            except FileNotFoundError:
+                continue
+        lokale.append((lokaler, arcname))
+    return lokale
+
+
+def export_response(arbeitsanweisungen, praefix='arbeitsanweisungen_export'):
+    """
+    Erstellt das Export-Archiv in einer temporären Datei und gibt es als Download zurück.
+    Gibt (response, anzahl) zurück.
+    """
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    zip_name = f'{praefix}_{timestamp}.zip'
+
+    # Temporäre Datei wird beim Schließen der Response automatisch entfernt
+    temp_datei = tempfile.TemporaryFile()
+    try:
+        anzahl = export_archiv_schreiben(arbeitsanweisungen, temp_datei)
+        metriken.datei_io(temp_datei.tell())
+        temp_datei.seek(0)
+    except Exception:
+        temp_datei.close()
+        raise
+
+    response = FileResponse(temp_datei, as_attachment=True, filename=zip_name,
+                            content_type='application/zip')
+    return response, anzahl
+
+
+def _readme(anzahl):
+    return (
+        'Arbeitsanweisungen Export\n'
+        + '=' * 50 + '\n\n'
+        + f'Export-Datum: {datetime.now().strftime("%d.%m.%Y %H:%M:%S")}\n'
+        + f'Anzahl Arbeitsanweisungen: {anzahl}\n\n'
+        + 'Struktur:\n'
+        + f'- {MANIFEST}: Metadaten, eine Zeile je Arbeitsanweisung (erste Zeile: Format und Version)\n'
+        + '- dateien/: Alle zugehörigen Dateien\n\n'
+        + 'Import:\n'
+        + 'Verwenden Sie die Import-Funktion in der Arbeitsanweisungen-Verwaltung.\n'
+    )
@@ -1,11 +1,36 @@
+import logging
 import os
+import re
+from datetime import datetime
 
 from django import forms
-from django.conf import settings
 from django.db.models import Q
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, connection
+from . import ablage
 from .models import Arbeitsanweisung
+from .stammdaten import arbeitsplatz_choices, kategorie_choices
+
+logger = logging.getLogger(__name__)
+
+
+# Einmal beim Import kompiliert statt bei jedem Upload
+_SONDERZEICHEN = re.compile(r'[^\w\s-]')
+_TRENNZEICHEN = re.compile(r'[-\s]+')
+
+
+def bereinigter_dateiname(original_name):
+    """Dateiname ohne Sonderzeichen und mit Zeitstempel, Ergebnis: (name, zeitstempel, endung)"""
+    # Dateiendung extrahieren
+    name, ext = os.path.splitext(original_name)
+
+    # Sonderzeichen entfernen
+    name = _TRENNZEICHEN.sub('_', _SONDERZEICHEN.sub('', name))
+
+    # Zeitstempel hinzufügen für Eindeutigkeit
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+    return name, timestamp, ext
 
 
 class ArbeitsanweisungCreationForm(forms.ModelForm):
@@ -14,7 +39,7 @@ class ArbeitsanweisungCreationForm(forms.ModelForm):
     """
 
     arbeitsplaetze = forms.MultipleChoiceField(
-        choices=Arbeitsanweisung.ARBEITSPLATZ_CHOICES,
+        choices=arbeitsplatz_choices,
         widget=forms.CheckboxSelectMultiple(attrs={
             'class': 'form-check-input'
         }),
@@ -89,20 +114,9 @@ class ArbeitsanweisungCreationForm(forms.ModelForm):
         # Datei speichern, wenn vorhanden
         datei = self.cleaned_data.get('datei')
         if datei:
-            # Sicherstellen, dass das /data Verzeichnis existiert
-            data_dir = os.path.join(settings.BASE_DIR, 'data')
-            os.makedirs(data_dir, exist_ok=True)
-
-            # Dateinamen bereinigen und eindeutig machen
+            # Dateinamen bereinigen und eindeutig machen, Ablage im Dokument-Storage
             dateiname = self._bereinigte_dateiname(datei.name)
-            dateipfad = os.path.join(data_dir, dateiname)
-
-            # Datei speichern
-            with open(dateipfad, 'wb+') as destination:
-                for chunk in datei.chunks():
-                    destination.write(chunk)
-
-            instance.datei_pfad = dateipfad
+            instance.datei_pfad = ablage.speichern(dateiname, datei)
 
         if commit:
             instance.save()
@@ -111,19 +125,7 @@ class ArbeitsanweisungCreationForm(forms.ModelForm):
 
     def _bereinigte_dateiname(self, original_name):
         """Erstellt einen bereinigten, eindeutigen Dateinamen"""
-        import re
-        from datetime import datetime
-
-        # Dateiendung extrahieren
-        name, ext = os.path.splitext(original_name)
-
-        # Sonderzeichen entfernen
-        name = re.sub(r'[^\w\s-]', '', name)
-        name = re.sub(r'[-\s]+', '_', name)
-
-        # Zeitstempel hinzufügen für Eindeutigkeit
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-
+        name, timestamp, ext = bereinigter_dateiname(original_name)
         return f"{name}_{timestamp}{ext}"
 
 
@@ -133,7 +135,7 @@ class ArbeitsanweisungChangeForm(forms.ModelForm):
     """
 
     arbeitsplaetze = forms.MultipleChoiceField(
-        choices=Arbeitsanweisung.ARBEITSPLATZ_CHOICES,
+        choices=arbeitsplatz_choices,
         widget=forms.CheckboxSelectMultiple(attrs={
             'class': 'form-check-input'
         }),
@@ -203,37 +205,19 @@ class ArbeitsanweisungChangeForm(forms.ModelForm):
 
         # Alte Datei löschen, wenn gewünscht
         if self.cleaned_data.get('datei_loeschen') and instance.datei_pfad:
-            if os.path.exists(instance.datei_pfad):
-                try:
-                    os.remove(instance.datei_pfad)
-                except Exception as e:
-                    print(f"Fehler beim Löschen der alten Datei: {e}")
+            self._alte_datei_loeschen(instance.datei_pfad)
             instance.datei_pfad = None
 
         # Neue Datei speichern, wenn vorhanden
         datei = self.cleaned_data.get('datei')
         if datei:
             # Alte Datei erst löschen
-            if instance.datei_pfad and os.path.exists(instance.datei_pfad):
-                try:
-                    os.remove(instance.datei_pfad)
-                except Exception as e:
-                    print(f"Fehler beim Löschen der alten Datei: {e}")
+            if instance.datei_pfad:
+                self._alte_datei_loeschen(instance.datei_pfad)
 
-            # Sicherstellen, dass das /data Verzeichnis existiert
-            data_dir = os.path.join(settings.BASE_DIR, 'data')
-            os.makedirs(data_dir, exist_ok=True)
-
-            # Dateinamen bereinigen und eindeutig machen
+            # Dateinamen bereinigen und eindeutig machen, Ablage im Dokument-Storage
             dateiname = self._bereinigte_dateiname(datei.name, instance.nummer)
-            dateipfad = os.path.join(data_dir, dateiname)
-
-            # Datei speichern
-            with open(dateipfad, 'wb+') as destination:
-                for chunk in datei.chunks():
-                    destination.write(chunk)
-
-            instance.datei_pfad = dateipfad
+            instance.datei_pfad = ablage.speichern(dateiname, datei)
 
         if commit:
             instance.save()
@@ -242,21 +226,16 @@ class ArbeitsanweisungChangeForm(forms.ModelForm):
 
     def _bereinigte_dateiname(self, original_name, nummer):
         """Erstellt einen bereinigten, eindeutigen Dateinamen"""
-        import re
-        from datetime import datetime
-
-        # Dateiendung extrahieren
-        name, ext = os.path.splitext(original_name)
-
-        # Sonderzeichen entfernen
-        name = re.sub(r'[^\w\s-]', '', name)
-        name = re.sub(r'[-\s]+', '_', name)
-
-        # Zeitstempel hinzufügen für Eindeutigkeit
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-
+        name, timestamp, ext = bereinigter_dateiname(original_name)
         return f"AA_{nummer}_{name}_{timestamp}{ext}"
 
+    @staticmethod
+    def _alte_datei_loeschen(pfad):
+        try:
+            ablage.loeschen(pfad)
+        except Exception as e:
+            logger.warning('Fehler beim Löschen der alten Datei %s: %s', pfad, e)
+
 
 class ArbeitsanweisungSearchForm(forms.Form):
     """
@@ -274,7 +253,7 @@ class ArbeitsanweisungSearchForm(forms.Form):
     arbeitsplatz = forms.ChoiceField(
         required=False,
         label='Arbeitsplatz',
-        choices=[('', 'Alle Abteilungen')] + list(Arbeitsanweisung.ARBEITSPLATZ_CHOICES),
+        choices=lambda: [('', 'Alle Abteilungen'), *arbeitsplatz_choices()],
         widget=forms.Select(attrs={
             'class': 'form-control'
         })
@@ -297,6 +276,10 @@ class ArbeitsanweisungSearchForm(forms.Form):
         })
     )
 
+    def ist_gefiltert(self):
+        """True, wenn die Suche die Treffermenge einschränkt (Sortierung zählt nicht)"""
+        return bool(self.cleaned_data.get('suchbegriff') or self.cleaned_data.get('arbeitsplatz'))
+
     def filter_queryset(self, queryset):
         """
         Filtert QuerySet und gibt IMMER ein QuerySet zurück (nie None!)
@@ -319,7 +302,11 @@ class ArbeitsanweisungSearchForm(forms.Form):
         # Filter nach Arbeitsplatz
         arbeitsplatz = data.get('arbeitsplatz')
         if arbeitsplatz:
-            queryset = queryset.filter(arbeitsplaetze__contains=[arbeitsplatz])
+            if connection.features.supports_json_field_contains:
+                queryset = queryset.filter(arbeitsplaetze__contains=[arbeitsplatz])
+            else:
+                # SQLite kennt kein JSON-contains: exakter Treffer auf den serialisierten Schlüssel
+                queryset = queryset.filter(arbeitsplaetze__icontains=f'"{arbeitsplatz}"')
 
         # Sortierung
         if data.get('sortierung'):
@@ -330,6 +317,26 @@ class ArbeitsanweisungSearchForm(forms.Form):
         # =========================================================
 
 
+class ArbeitsanweisungExportForm(ArbeitsanweisungSearchForm):
+    """
+    Filter für den Export: dieselben Parameter wie die Suche plus Kategorie-Reiter
+    """
+    kategorie = forms.ChoiceField(
+        required=False,
+        label='Kategorie',
+        choices=lambda: [('', 'Alle Kategorien'), *kategorie_choices()],
+    )
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+
+        kategorie = self.cleaned_data.get('kategorie') if self.is_valid() else None
+        if kategorie:
+            queryset = queryset.filter(kategorie=kategorie)
+
+        return queryset
+
+
 class ArbeitsanweisungImportForm(forms.Form):
     """
     Form zum Importieren von Arbeitsanweisungen aus einem ZIP-Archiv
@@ -353,6 +360,16 @@ class ArbeitsanweisungImportForm(forms.Form):
         })
     )
 
+    pruefen = forms.BooleanField(
+        required=False,
+        initial=True,
+        label='Archiv vor dem Import prüfen',
+        help_text='Vergleicht alle Dateien mit den Prüfsummen des Exports, bei einer Abweichung wird nichts importiert',
+        widget=forms.CheckboxInput(attrs={
+            'class': 'form-check-input'
+        })
+    )
+
     def clean_zip_datei(self):
         datei = self.cleaned_data.get('zip_datei')
         if datei:
@@ -364,4 +381,65 @@ class ArbeitsanweisungImportForm(forms.Form):
             if datei.size > 100 * 1024 * 1024:
                 raise ValidationError('Die ZIP-Datei darf maximal 100 MB groß sein.')
 
-        return datei
\ No newline at end of file
+        return datei
+
+class ArbeitsanweisungMassenaktionForm(forms.Form):
+    """
+    Form für Massenaktionen auf mehrere ausgewählte Arbeitsanweisungen
+    """
+    AKTION_CHOICES = [
+        ('kategorie', 'Kategorie ändern'),
+        ('arbeitsplaetze', 'Arbeitsplätze ersetzen'),
+        ('revision', 'Revision erhöhen'),
+        ('export', 'Auswahl exportieren'),
+        ('loeschen', 'Auswahl löschen'),
+    ]
+
+    auswahl = forms.TypedMultipleChoiceField(
+        coerce=int,
+        label='Auswahl',
+        error_messages={'required': 'Bitte wählen Sie mindestens eine Arbeitsanweisung aus.'},
+    )
+
+    aktion = forms.ChoiceField(
+        choices=[('', 'Aktion wählen...')] + AKTION_CHOICES,
+        label='Aktion',
+        widget=forms.Select(attrs={
+            'class': 'form-select'
+        })
+    )
+
+    neue_kategorie = forms.ChoiceField(
+        required=False,
+        choices=lambda: [('', 'Kategorie wählen...'), *kategorie_choices()],
+        label='Neue Kategorie',
+        widget=forms.Select(attrs={
+            'class': 'form-select'
+        })
+    )
+
+    neue_arbeitsplaetze = forms.MultipleChoiceField(
+        required=False,
+        choices=arbeitsplatz_choices,
+        label='Neue Arbeitsplätze',
+        widget=forms.CheckboxSelectMultiple(attrs={
+            'class': 'form-check-input'
+        })
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Nummern werden erst beim Ausführen gegen die Datenbank aufgelöst
+        auswahl = self.data.getlist('auswahl') if hasattr(self.data, 'getlist') else []
+        self.fields['auswahl'].choices = [(nummer, nummer) for nummer in auswahl]
+
+    def clean(self):
+        cleaned_data = super().clean()
+        aktion = cleaned_data.get('aktion')
+
+        if aktion == 'kategorie' and not cleaned_data.get('neue_kategorie'):
+            self.add_error('neue_kategorie', 'Bitte wählen Sie eine Kategorie aus.')
+        if aktion == 'arbeitsplaetze' and not cleaned_data.get('neue_arbeitsplaetze'):
+            self.add_error('neue_arbeitsplaetze', 'Bitte wählen Sie mindestens einen Arbeitsplatz aus.')
+
+        return cleaned_data
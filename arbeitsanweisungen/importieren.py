@@ -0,0 +1,336 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+
+from . import ablage, metriken, signale, statistik, vorschau
+from .dateien import dateien_loeschen, dateien_nach_commit_loeschen
+from .manifest import UngueltigesArchiv, eintraege_lesen
+from .models import Arbeitsanweisung
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ImportErgebnis:
+    erstellt: int = 0
+    aktualisiert: int = 0
+    uebersprungen: int = 0
+    fehler: int = 0
+
+    def meldung(self):
+        meldung_teile = []
+        if self.erstellt > 0:
+            meldung_teile.append(f'{self.erstellt} neu erstellt')
+        if self.aktualisiert > 0:
+            meldung_teile.append(f'{self.aktualisiert} aktualisiert')
+        if self.uebersprungen > 0:
+            meldung_teile.append(f'{self.uebersprungen} übersprungen')
+        if self.fehler > 0:
+            meldung_teile.append(f'{self.fehler} Fehler')
+        return f'Import abgeschlossen: {", ".join(meldung_teile)}'
+
+
+def archiv_importieren(zip_datei, ueberschreiben, worker=None, pruefen=False):
+    """
+    Importiert Arbeitsanweisungen aus einem hochgeladenen Export-Archiv.
+    Löst UngueltigesArchiv aus, wenn das Archiv nicht gelesen werden kann.
+
+    Dateien werden von `worker` Threads (Standard: IMPORT_WORKERS) direkt aus
+    dem Archiv in den Dokument-Storage kopiert, die Datenbank wird in Batches geschrieben.
+    Die Metadaten werden schrittweise gelesen (siehe manifest.py), der erste
+    Batch wird geschrieben, bevor der Rest gelesen ist.
+
+    Dateien mit Prüfsumme im Manifest werden immer beim Kopieren verglichen,
+    abweichende zählen als Fehler. Mit `pruefen` wird vorher das ganze Archiv
+    geprüft (archivpruefung.py) und bei einer Abweichung nichts importiert.
+    """
+    # Temporäres Verzeichnis erstellen
+    temp_dir = tempfile.mkdtemp()
+
+    try:
+        # Upload speichern
+        zip_pfad = os.path.join(temp_dir, 'upload.zip')
+        with open(zip_pfad, 'wb+') as destination:
+            for chunk in zip_datei.chunks():
+                destination.write(chunk)
+        metriken.datei_io(zip_datei.size)
+
+        if pruefen:
+            _archiv_pruefen(zip_pfad, worker)
+
+        try:
+            zip_ref = zipfile.ZipFile(zip_pfad, 'r')
+        except zipfile.BadZipFile:
+            raise UngueltigesArchiv('Ungültige ZIP-Datei.')
+
+        with zip_ref:
+            import_lauf = ArchivImport(zip_pfad, set(zip_ref.namelist()), ueberschreiben,
+                                       worker or settings.IMPORT_WORKERS)
+            try:
+                return import_lauf.ausfuehren(eintraege_lesen(zip_ref, import_lauf.zeile_fehlerhaft))
+            except zipfile.BadZipFile as e:
+                # Erst beim Lesen aufgefallen (z.B. CRC-Fehler), bisherige Batches bleiben gespeichert
+                raise UngueltigesArchiv(f'Archiv ist beschädigt: {e}')
+
+    finally:
+        # Temporäres Verzeichnis aufräumen
+        if os.path.exists(temp_dir):
+            shutil.rmtree(temp_dir)
+
+
+def _archiv_pruefen(zip_pfad, worker):
+    from .archivpruefung import archiv_pruefen
+
+    try:
+        pruefung = archiv_pruefen(zip_pfad, worker)
+    except zipfile.BadZipFile:
+        raise UngueltigesArchiv('Ungültige ZIP-Datei.')
+    if not pruefung.ok:
+        raise UngueltigesArchiv(f'Archiv-Prüfung fehlgeschlagen, nichts importiert: {pruefung.fehler[0]}')
+
+
+@dataclass
+class _Zeile:
+    """Eine zu schreibende Arbeitsanweisung des aktuellen Batches"""
+    anweisung: Arbeitsanweisung
+    neu: bool
+    alter_pfad: Optional[str] = None
+    mitglied: Optional[str] = None
+    ziel_pfad: Optional[str] = None
+    # Laut Manifest (ab Version 2), None = ungeprüft
+    erwartet_sha256: Optional[str] = None
+    erwartet_groesse: Optional[int] = None
+    # Ergebnis der Kopie
+    ziel_vorher_vorhanden: bool = False
+    sha256: Optional[str] = None
+    fehler: Optional[Exception] = None
+
+
+class ArchivImport:
+    """
+    Import in Batches:
+
+    1. Batch planen: vorhandene Arbeitsanweisungen mit einer Abfrage laden,
+       übersprungene und ungültige Einträge zählen
+    2. Dateien des Batches parallel aus dem Archiv kopieren (und hashen)
+    3. Ein einziger Schreiber legt den Batch per bulk_create/bulk_update in einer
+       Transaktion an; schlägt das fehl, wird zeilenweise wiederholt, damit die
+       Zähler exakt bleiben. Ersetzte Dateien werden erst nach dem Commit gelöscht.
+
+    Kommt eine Nummer im Archiv mehrfach vor, beginnt dort ein neuer Batch, damit
+    das Ergebnis dem zeilenweisen Import entspricht.
+    """
+
+    BATCH_GROESSE = 500
+    FELDER = ['name', 'arbeitsplaetze', 'kategorie', 'revision', 'datei_pfad']
+
+    def __init__(self, zip_pfad, mitglieder, ueberschreiben, worker):
+        self.zip_pfad = zip_pfad
+        self.mitglieder = mitglieder
+        self.ueberschreiben = ueberschreiben
+        self.worker = max(1, worker)
+        self.ergebnis = ImportErgebnis()
+        self._lokal = threading.local()
+        self._zip_dateien = []
+        self._zip_lock = threading.Lock()
+
+    def ausfuehren(self, metadata):
+        self.temp_dir = ablage.temp_verzeichnis()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.worker) as pool:
+                for batch in self._batches(metadata):
+                    zeilen = self._planen(batch)
+                    list(pool.map(self._datei_kopieren, zeilen))
+                    self._schreiben(zeilen)
+        finally:
+            for zipf in self._zip_dateien:
+                zipf.close()
+
+        return self.ergebnis
+
+    # ========== Planung ==========
+
+    def _batches(self, metadata):
+        batch, nummern = [], set()
+        for meta in metadata:
+            nummer = meta.get('nummer') if isinstance(meta, dict) else None
+            if len(batch) >= self.BATCH_GROESSE or (nummer is not None and nummer in nummern):
+                yield batch
+                batch, nummern = [], set()
+            batch.append(meta)
+            nummern.add(nummer)
+        if batch:
+            yield batch
+
+    def _planen(self, batch):
+        gueltig = []
+        for meta in batch:
+            try:
+                gueltig.append((meta, int(meta['nummer']), meta['name'], meta['kategorie'], int(meta['revision'])))
+            except (KeyError, TypeError, ValueError) as e:
+                self._fehler(meta, e)
+
+        vorhanden = {a.nummer: a for a in Arbeitsanweisung.objects.filter(nummer__in=[g[1] for g in gueltig])}
+
+        zeilen = []
+        for meta, nummer, name, kategorie, revision in gueltig:
+            anweisung = vorhanden.get(nummer)
+            if anweisung is not None and not self.ueberschreiben:
+                self.ergebnis.uebersprungen += 1
+                continue
+
+            if anweisung is None:
+                zeile = _Zeile(Arbeitsanweisung(nummer=nummer), neu=True)
+            else:
+                zeile = _Zeile(anweisung, neu=False, alter_pfad=anweisung.datei_pfad)
+            zeile.anweisung.name = name
+            zeile.anweisung.kategorie = kategorie
+            zeile.anweisung.revision = revision
+            zeile.anweisung.arbeitsplaetze = meta.get('arbeitsplaetze', [])
+
+            # Datei nur übernehmen, wenn sie im Archiv liegt (Name ohne Pfadanteile)
+            datei_name = os.path.basename(meta.get('datei_name') or '')
+            if datei_name and f'dateien/{datei_name}' in self.mitglieder:
+                zeile.mitglied = f'dateien/{datei_name}'
+                zeile.ziel_pfad = ablage.pfad(datei_name)
+                zeile.erwartet_sha256 = meta.get('datei_sha256')
+                zeile.erwartet_groesse = meta.get('datei_groesse')
+            zeilen.append(zeile)
+
+        self._dateikonflikte_pruefen(zeilen)
+        return [zeile for zeile in zeilen if zeile.fehler is None]
+
+    def _dateikonflikte_pruefen(self, zeilen):
+        """
+        Zieldateien, die schon zu einer anderen Arbeitsanweisung gehören, würden
+        deren Datei überschreiben und am eindeutigen datei_pfad scheitern
+        """
+        ziele = {}
+        for zeile in zeilen:
+            if zeile.ziel_pfad:
+                ziele.setdefault(zeile.ziel_pfad, []).append(zeile)
+
+        belegt = dict(Arbeitsanweisung.objects.filter(datei_pfad__in=list(ziele)).values_list('datei_pfad', 'nummer'))
+        for ziel_pfad, betroffene in ziele.items():
+            for i, zeile in enumerate(betroffene):
+                besitzer = belegt.get(ziel_pfad)
+                if i > 0 or (besitzer is not None and besitzer != zeile.anweisung.nummer):
+                    zeile.fehler = ValueError(f'Datei {os.path.basename(ziel_pfad)} gehört bereits zu einer anderen Arbeitsanweisung')
+                    self._fehler({'nummer': zeile.anweisung.nummer}, zeile.fehler)
+
+    # ========== Dateien (Thread-Pool) ==========
+
+    def _zip(self):
+        """Eigenes ZipFile-Handle pro Thread, das Lesen aus einem Handle ist nicht thread-sicher"""
+        zipf = getattr(self._lokal, 'zipf', None)
+        if zipf is None:
+            zipf = self._lokal.zipf = zipfile.ZipFile(self.zip_pfad, 'r')
+            with self._zip_lock:
+                self._zip_dateien.append(zipf)
+        return zipf
+
+    def _datei_kopieren(self, zeile):
+        if not zeile.mitglied:
+            return
+        dateiname = os.path.basename(zeile.ziel_pfad)
+        temp_pfad = os.path.join(self.temp_dir, f'{dateiname}.import-{threading.get_ident()}')
+        try:
+            zeile.ziel_vorher_vorhanden = ablage.existiert(zeile.ziel_pfad)
+            hash_wert = hashlib.sha256()
+            groesse = 0
+            with self._zip().open(zeile.mitglied) as quelle, open(temp_pfad, 'wb') as ziel:
+                while block := quelle.read(1024 * 1024):
+                    hash_wert.update(block)
+                    groesse += len(block)
+                    ziel.write(block)
+            zeile.sha256 = hash_wert.hexdigest()
+            # Abweichende Datei nicht übernehmen (die vorhandene bleibt unverändert)
+            if zeile.erwartet_groesse is not None and groesse != zeile.erwartet_groesse:
+                raise ValueError(f'Datei {dateiname}: Größe {groesse} statt {zeile.erwartet_groesse} Bytes')
+            if zeile.erwartet_sha256 is not None and zeile.sha256 != zeile.erwartet_sha256:
+                raise ValueError(f'Datei {dateiname}: SHA-256 stimmt nicht überein')
+            ablage.uebernehmen(temp_pfad, dateiname)
+        except Exception as e:
+            zeile.fehler = e
+            dateien_loeschen([temp_pfad])
+
+    # ========== Datenbank (ein Schreiber) ==========
+
+    def _schreiben(self, zeilen):
+        ok = []
+        for zeile in zeilen:
+            if zeile.fehler is not None:
+                self._fehler({'nummer': zeile.anweisung.nummer}, zeile.fehler)
+                continue
+            zeile.anweisung.datei_pfad = zeile.ziel_pfad if zeile.mitglied else None
+            ok.append(zeile)
+
+        neue = [z for z in ok if z.neu]
+        geaendert = [z for z in ok if not z.neu]
+        try:
+            with transaction.atomic():
+                Arbeitsanweisung.objects.bulk_create([z.anweisung for z in neue])
+                Arbeitsanweisung.objects.bulk_update([z.anweisung for z in geaendert], self.FELDER)
+                # bulk_create/bulk_update umgehen save(): Statistik hier fortschreiben
+                alt = [z.anweisung._statistik_alt for z in geaendert]
+                neu = [statistik.werte(z.anweisung) for z in ok]
+                statistik.anpassen(alt, neu)
+                signale.melden(alt, neu)
+                dateien_nach_commit_loeschen(self._ersetzte_dateien(ok))
+                # Wie der post_save-Receiver: Office-Dokumente für die Vorschau vormerken
+                pdf_quellen = [z.anweisung.datei_pfad for z in ok if vorschau.konvertierbar(z.anweisung.datei_pfad)]
+                transaction.on_commit(lambda: [vorschau.vormerken(pfad) for pfad in pdf_quellen])
+        except Exception:
+            # Einzeln wiederholen, damit nur die fehlerhaften Zeilen als Fehler zählen
+            for zeile in neue:
+                zeile.anweisung.pk = None
+            self._zeilenweise_schreiben(ok)
+            return
+
+        for zeile in geaendert:
+            zeile.anweisung._statistik_alt = statistik.werte(zeile.anweisung)
+        self.ergebnis.erstellt += len(neue)
+        self.ergebnis.aktualisiert += len(geaendert)
+
+    def _zeilenweise_schreiben(self, zeilen):
+        for zeile in zeilen:
+            try:
+                with transaction.atomic():
+                    zeile.anweisung.save()
+                    dateien_nach_commit_loeschen(self._ersetzte_dateien([zeile]))
+            except Exception as e:
+                self._fehler({'nummer': zeile.anweisung.nummer}, e)
+                # Neu kopierte Datei nicht verwaist zurücklassen
+                if zeile.mitglied and not zeile.ziel_vorher_vorhanden:
+                    dateien_loeschen([zeile.ziel_pfad])
+                continue
+            if zeile.neu:
+                self.ergebnis.erstellt += 1
+            else:
+                self.ergebnis.aktualisiert += 1
+
+    @staticmethod
+    def _ersetzte_dateien(zeilen):
+        # Alte Datei löschen (nicht, wenn sie gerade durch die neue ersetzt wurde)
+        return [z.alter_pfad for z in zeilen if z.alter_pfad and z.alter_pfad != z.anweisung.datei_pfad]
+
+    def zeile_fehlerhaft(self, zeilennummer, fehler):
+        """Zeile der Metadaten-Datei, die sich nicht lesen lässt"""
+        self.ergebnis.fehler += 1
+        logger.warning('Fehler beim Import: Zeile %s der Metadaten ist ungültig: %s', zeilennummer, fehler)
+
+    def _fehler(self, meta, fehler):
+        self.ergebnis.fehler += 1
+        nummer = meta.get('nummer') if isinstance(meta, dict) else None
+        logger.warning('Fehler beim Import von AA %s: %s', nummer, fehler)
@@ -0,0 +1,201 @@
+"""
+Kiosk-Seiten: statisches HTML je Arbeitsplatz und Kategorie.
+
+Die Terminals in der Werkstatt zeigen nur die Dokumente ihres Arbeitsplatzes
+und ändern nichts. Ihre Seiten werden daher nach KIOSK_DIR gerendert und von
+nginx direkt ausgeliefert (``/kiosk/<arbeitsplatz>/`` und
+``/kiosk/<arbeitsplatz>/<kategorie>.html``), ohne Django zu erreichen.
+
+Neu geschrieben werden nur die Seiten der Arbeitsplätze, die das Signal
+``signale.arbeitsplaetze_geaendert`` meldet, in einem Hintergrund-Thread
+nach dem Commit. Unveränderte Seiten bleiben unangetastet (gleiche ETags,
+die Terminals laden nichts neu). ``manage.py kiosk_erzeugen`` schreibt alle.
+Läufe aus verschiedenen Prozessen (gunicorn-Worker, Management-Befehl)
+werden über eine Dateisperre in KIOSK_DIR nacheinander ausgeführt, damit ein
+älterer Datenbankstand keinen neueren überschreibt.
+"""
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.dispatch import receiver
+from django.template.loader import render_to_string
+
+from .forms import ArbeitsanweisungSearchForm
+from .models import Arbeitsanweisung
+from .signale import arbeitsplaetze_geaendert
+from .stammdaten import verzeichnis
+
+try:
+    import fcntl
+except ImportError:  # Windows (nur Entwicklung), dort ohne Sperre
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE = 'arbeitsanweisungen/kiosk.html'
+SPERRDATEI = '.sperre'
+
+_lock = threading.Lock()
+_offen = set()
+_alle_offen = False
+_executor = None
+
+
+def aktiv():
+    return bool(settings.KIOSK_DIR)
+
+
+def erzeugen(arbeitsplaetze=None):
+    """
+    Schreibt die Seiten der angegebenen Arbeitsplätze, ohne Angabe alle samt
+    Übersicht (entfernte Arbeitsplätze werden gelöscht). Gibt die Anzahl
+    geänderter Dateien zurück.
+    """
+    if not aktiv():
+        return 0
+    os.makedirs(settings.KIOSK_DIR, exist_ok=True)
+    with _sperre():
+        return _erzeugen(arbeitsplaetze)
+
+
+@contextmanager
+def _sperre():
+    """Exklusive Sperre über alle Prozesse, gelesen wird erst nach dem Warten"""
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(settings.KIOSK_DIR, SPERRDATEI), 'a') as datei:
+        fcntl.flock(datei, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(datei, fcntl.LOCK_UN)
+
+
+def _erzeugen(arbeitsplaetze):
+    stand = verzeichnis()
+    bekannt = {a.schluessel: a for a in stand.arbeitsplaetze}
+    alle = arbeitsplaetze is None
+
+    geaendert = 0
+    for schluessel in (bekannt if alle else sorted(set(arbeitsplaetze) & bekannt.keys())):
+        geaendert += _arbeitsplatz_schreiben(bekannt[schluessel], stand)
+
+    if alle:
+        geaendert += _schreiben(os.path.join(settings.KIOSK_DIR, 'index.html'),
+                                render_to_string(TEMPLATE, {'arbeitsplaetze': stand.arbeitsplaetze}))
+        for eintrag in os.scandir(settings.KIOSK_DIR):
+            if eintrag.is_dir() and eintrag.name not in bekannt:
+                shutil.rmtree(eintrag.path, ignore_errors=True)
+                geaendert += 1
+    return geaendert
+
+
+def _arbeitsplatz_schreiben(arbeitsplatz, stand):
+    form = ArbeitsanweisungSearchForm({'arbeitsplatz': arbeitsplatz.schluessel})
+    anweisungen = form.filter_queryset(Arbeitsanweisung.objects.order_by('nummer')).only(
+        'nummer', 'name', 'revision', 'kategorie', 'datei_pfad', 'arbeitsplaetze')
+
+    je_kategorie = defaultdict(list)
+    for anweisung in anweisungen:
+        je_kategorie[anweisung.kategorie].append(anweisung)
+    # Reihenfolge der Stammdaten, unbekannte Kategorien am Ende
+    kategorien = [k for k in stand.kategorien if k.schluessel in je_kategorie]
+    kategorien += [stand.kategorie(s) for s in sorted(je_kategorie.keys() - {k.schluessel for k in kategorien})]
+    reiter = [(k, len(je_kategorie[k.schluessel])) for k in kategorien]
+
+    verzeichnis_pfad = os.path.join(settings.KIOSK_DIR, arbeitsplatz.schluessel)
+    os.makedirs(verzeichnis_pfad, exist_ok=True)
+    seiten = {'index.html': (None, [a for k in kategorien for a in je_kategorie[k.schluessel]])}
+    for kategorie in kategorien:
+        seiten[f'{kategorie.schluessel}.html'] = (kategorie, je_kategorie[kategorie.schluessel])
+
+    geaendert = 0
+    for dateiname, (kategorie, liste) in seiten.items():
+        inhalt = render_to_string(TEMPLATE, {
+            'arbeitsplatz': arbeitsplatz,
+            'kategorie': kategorie,
+            'reiter': reiter,
+            'gesamt': sum(anzahl for _, anzahl in reiter),
+            'anweisungen': liste,
+        })
+        geaendert += _schreiben(os.path.join(verzeichnis_pfad, dateiname), inhalt)
+
+    # Seiten von Kategorien ohne Dokumente an diesem Arbeitsplatz entfernen
+    for eintrag in os.scandir(verzeichnis_pfad):
+        if eintrag.name.endswith('.html') and eintrag.name not in seiten:
+            os.remove(eintrag.path)
+            geaendert += 1
+    return geaendert
+
+
+def _schreiben(pfad, inhalt):
+    """Schreibt atomar und nur bei geändertem Inhalt, gibt 1 bei Änderung zurück"""
+    daten = inhalt.encode('utf-8')
+    try:
+        with open(pfad, 'rb') as f:
+            if f.read() == daten:
+                return 0
+    except FileNotFoundError:
+        pass
+    fd, temp = tempfile.mkstemp(dir=os.path.dirname(pfad), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(daten)
+        # mkstemp legt 0600 an, nginx liest unter einem anderen Benutzer
+        os.chmod(temp, 0o644)
+        os.replace(temp, pfad)
+    except BaseException:
+        os.remove(temp)
+        raise
+    return 1
+
+
+def vormerken(arbeitsplaetze):
+    """
+    Schreibt die Seiten im Hintergrund (ein Thread je Prozess). Meldungen,
+    die eintreffen, solange ein Lauf aussteht, werden zusammengefasst.
+    """
+    global _alle_offen, _executor
+
+    if not aktiv():
+        return
+    with _lock:
+        ausstehend = _alle_offen or bool(_offen)
+        if arbeitsplaetze is None:
+            _alle_offen = True
+        else:
+            _offen.update(arbeitsplaetze)
+        if ausstehend:
+            return
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='kiosk')
+    _executor.submit(_hintergrund)
+
+
+def _hintergrund():
+    global _alle_offen
+
+    with _lock:
+        arbeitsplaetze = None if _alle_offen else set(_offen)
+        _alle_offen = False
+        _offen.clear()
+    try:
+        erzeugen(arbeitsplaetze)
+    except Exception:
+        logger.exception('Fehler beim Schreiben der Kiosk-Seiten')
+    finally:
+        connections.close_all()
+
+
+@receiver(arbeitsplaetze_geaendert)
+def arbeitsplaetze_neu_schreiben(sender, arbeitsplaetze, **kwargs):
+    vormerken(arbeitsplaetze)
@@ -0,0 +1,169 @@
+"""
+Parallele Komprimierung von Archiv-Mitgliedern für den Export.
+
+Die Dateien werden in einem Prozess-Pool als Raw-Deflate (identisch zu
+zipfile.ZIP_DEFLATED) in temporäre Dateien komprimiert und anschließend in
+fester Reihenfolge unverändert ins ZIP kopiert. Die SHA-256-Prüfsumme für
+das Manifest berechnet der Worker im selben Durchlauf. Das Modul importiert bewusst
+kein Django, damit die per 'spawn' gestarteten Worker schnell bereit sind.
+
+Für vorkomprimierte Mitglieder hat zipfile keine öffentliche API,
+vorkomprimiert_schreiben() greift auf interne Attribute von ZipFile zu. Der
+parallele Weg ist daher nur für die Python-Versionen in GETESTET freigegeben
+(geprüft mit einem Round-Trip über ZipFile.testzip()), sonst schreibt der
+Export sequentiell über ZipFile.open.
+"""
+import hashlib
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .manifest import pruefsumme
+
+BLOCK_GROESSE = 1024 * 1024
+
+# Python-Versionen, mit denen vorkomprimiert_schreiben() geprüft ist
+GETESTET = frozenset({(3, 10), (3, 11), (3, 12), (3, 13)})
+# Von vorkomprimiert_schreiben() genutzte Interna von ZipFile
+_ZIPFILE_INTERNA = ('_lock', '_writecheck', '_didModify', 'start_dir', 'fp', 'filelist', 'NameToInfo')
+
+_pool = None
+_pool_worker = 0
+_pool_lock = threading.Lock()
+
+
+def unterstuetzt(zipf=None):
+    """True, wenn vorkomprimierte Mitglieder mit dieser Python-Version sicher geschrieben werden"""
+    if sys.version_info[:2] not in GETESTET:
+        return False
+    return zipf is None or all(hasattr(zipf, attribut) for attribut in _ZIPFILE_INTERNA)
+
+
+def komprimieren(quell_pfad, ziel_pfad):
+    """
+    Komprimiert `quell_pfad` als Raw-Deflate nach `ziel_pfad`. Gibt (crc32,
+    unkomprimierte Größe, komprimierte Größe, SHA-256 als Hex) zurück, None
+    wenn die Quelle inzwischen gelöscht wurde.
+    """
+    try:
+        quelle = open(quell_pfad, 'rb')
+    except FileNotFoundError:
+        return None
+    kompressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    hash_wert = hashlib.sha256()
+    crc = groesse = 0
+    with quelle, open(ziel_pfad, 'wb') as ziel:
+        while block := quelle.read(BLOCK_GROESSE):
+            crc = zlib.crc32(block, crc)
+            hash_wert.update(block)
+            groesse += len(block)
+            ziel.write(kompressor.compress(block))
+        ziel.write(kompressor.flush())
+        return crc, groesse, ziel.tell(), hash_wert.hexdigest()
+
+
+def datei_schreiben(zipf, quell_pfad, arcname):
+    """Schreibt die Datei wie ZipFile.write ins Archiv, gibt (SHA-256 als Hex, Größe) zurück"""
+    zinfo = zipfile.ZipInfo.from_file(quell_pfad, arcname)
+    zinfo.compress_type = zipfile.ZIP_DEFLATED
+    with open(quell_pfad, 'rb') as quelle, zipf.open(zinfo, 'w') as ziel:
+        return pruefsumme(quelle, ziel)
+
+
+def pool(worker):
+    """
+    Prozessweit geteilter Pool, wird beim ersten parallelen Export gestartet.
+    'spawn' statt fork: die gunicorn-Worker laufen mit mehreren Threads.
+    """
+    global _pool, _pool_worker
+
+    with _pool_lock:
+        if _pool is None or _pool_worker != worker:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=worker, mp_context=multiprocessing.get_context('spawn'))
+            _pool_worker = worker
+        return _pool
+
+
+def dateien_parallel_schreiben(zipf, dateien, worker):
+    """
+    Schreibt `dateien` [(quell_pfad, arcname), ...] komprimiert in das zum
+    Schreiben geöffnete `zipf`. Die Komprimierung läuft in `worker` Prozessen,
+    die Mitglieder landen in der Reihenfolge von `dateien` im Archiv. Gibt
+    {arcname: (SHA-256 als Hex, Größe)} zurück, inzwischen gelöschte Dateien
+    fehlen darin wie beim sequentiellen Export.
+    """
+    pruefsummen = {}
+    with tempfile.TemporaryDirectory(prefix='export_') as arbeitsverzeichnis:
+        ziele = [os.path.join(arbeitsverzeichnis, f'{i}.deflate') for i in range(len(dateien))]
+        ergebnisse = pool(worker).map(
+            komprimieren, [quell_pfad for quell_pfad, _ in dateien], ziele,
+            chunksize=max(1, len(dateien) // (worker * 8)),
+        )
+
+        # map liefert in Eingabereihenfolge, fertige Mitglieder werden sofort geschrieben
+        erledigt = 0
+        try:
+            for (quell_pfad, arcname), ziel, ergebnis in zip(dateien, ziele, ergebnisse):
+                erledigt += 1
+                if ergebnis is None:
+                    continue
+                crc, groesse, komprimiert, sha256 = ergebnis
+                try:
+                    zinfo = zipfile.ZipInfo.from_file(quell_pfad, arcname)
+                except FileNotFoundError:
+                    continue
+                vorkomprimiert_schreiben(zipf, zinfo, crc, groesse, komprimiert, ziel)
+                os.remove(ziel)
+                pruefsummen[arcname] = (sha256, groesse)
+        except BrokenProcessPool:
+            # Worker-Prozess abgestürzt: Pool verwerfen, Rest im eigenen Prozess komprimieren
+            _pool_verwerfen()
+            for quell_pfad, arcname in dateien[erledigt:]:
+                try:
+                    pruefsummen[arcname] = datei_schreiben(zipf, quell_pfad, arcname)
+                except FileNotFoundError:
+                    pass
+    return pruefsummen
+
+
+def _pool_verwerfen():
+    global _pool
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def vorkomprimiert_schreiben(zipf, zinfo, crc, groesse, komprimiert, daten_pfad):
+    """
+    Schreibt bereits Deflate-komprimierte Daten als Mitglied `zinfo` in `zipf`.
+    zipfile hat dafür keine öffentliche API, der Ablauf entspricht ZipFile.write
+    mit vorab bekannten Größen (daher ohne Data Descriptor). Nur aufrufen,
+    wenn unterstuetzt(zipf) True liefert.
+    """
+    zinfo.compress_type = zipfile.ZIP_DEFLATED
+    zinfo.CRC = crc
+    zinfo.file_size = groesse
+    zinfo.compress_size = komprimiert
+    zip64 = groesse > zipfile.ZIP64_LIMIT or komprimiert > zipfile.ZIP64_LIMIT
+
+    with zipf._lock:
+        zipf._writecheck(zinfo)
+        zipf._didModify = True
+        zinfo.header_offset = zipf.fp.tell()
+        zipf.fp.write(zinfo.FileHeader(zip64))
+        with open(daten_pfad, 'rb') as daten:
+            shutil.copyfileobj(daten, zipf.fp, BLOCK_GROESSE)
+        zipf.filelist.append(zinfo)
+        zipf.NameToInfo[zinfo.filename] = zinfo
+        zipf.start_dir = zipf.fp.tell()
@@ -0,0 +1,145 @@
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+from datetime import datetime
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from arbeitsanweisungen.benchmark import (
+    Benchmark, export_korpus, export_skalierung, import_skalierung, vergleichen,
+)
+
+
+class Command(BaseCommand):
+    """
+    Misst alle Views gegen eine eigene Test-Datenbank und ein temporäres DATA_DIR.
+    Die Produktivdaten werden nicht angefasst.
+    """
+    help = 'Benchmark aller Views (Abfragen, Latenz-Perzentile, Spitzenspeicher) mit JSON-Ausgabe'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--groessen', type=int, nargs='+', default=[1000, 10000, 50000],
+            help='Anzahl Arbeitsanweisungen je Messreihe (Standard: 1000 10000 50000)',
+        )
+        parser.add_argument(
+            '--wiederholungen', type=int, default=20,
+            help='Wiederholungen pro Szenario (Standard: 20)',
+        )
+        parser.add_argument(
+            '--wiederholungen-schwer', type=int, default=3,
+            help='Wiederholungen für Export und Import (Standard: 3)',
+        )
+        parser.add_argument(
+            '--szenarien', nargs='+',
+            help='Nur diese Szenarien messen (z.B. liste detail download preview export import)',
+        )
+        parser.add_argument(
+            '--ausgabe', default='bench_output.json',
+            help='Zieldatei für die Ergebnisse (Standard: bench_output.json)',
+        )
+        parser.add_argument(
+            '--export-worker', type=int, nargs='+',
+            help='Zusätzlich die Export-Komprimierung mit diesen Worker-Anzahlen messen (z.B. 1 2 4 8)',
+        )
+        parser.add_argument(
+            '--import-worker', type=int, nargs='+',
+            help='Zusätzlich den Import mit diesen Thread-Anzahlen für die Dateikopien messen (z.B. 1 2 4 8)',
+        )
+        parser.add_argument(
+            '--export-korpus', type=int, default=300,
+            help='Anzahl Dateien (PDF/TXT/XLSX gemischt) für Export- und Import-Skalierung (Standard: 300)',
+        )
+        parser.add_argument(
+            '--vergleich',
+            help='Frühere Ergebnisdatei, gegen die Verschlechterungen gemeldet werden',
+        )
+
+    def handle(self, *args, **options):
+        if options['wiederholungen'] < 1 or options['wiederholungen_schwer'] < 1:
+            raise CommandError('Wiederholungen müssen mindestens 1 sein.')
+
+        # SQL-Ausgaben und Warnungen für langsame Requests würden die Messung überdecken
+        for name, level in (('django.db.backends', logging.INFO), ('arbeitsanweisungen.performance', logging.ERROR)):
+            logging.getLogger(name).setLevel(level)
+
+        setup_test_environment(debug=False)
+        alter_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        data_dir = tempfile.mkdtemp(prefix='benchmark_data_')
+        try:
+            with override_settings(DATA_DIR=data_dir):
+                benchmark = Benchmark(
+                    wiederholungen=options['wiederholungen'],
+                    wiederholungen_schwer=options['wiederholungen_schwer'],
+                    szenarien=options['szenarien'],
+                    ausgabe=self.stdout.write,
+                )
+                ergebnisse = benchmark.ausfuehren(options['groessen'])
+
+                skalierung = import_werte = None
+                if options['export_worker'] or options['import_worker']:
+                    korpus_dir = os.path.join(data_dir, 'korpus')
+                    os.makedirs(korpus_dir)
+                    korpus = export_korpus(korpus_dir, options['export_korpus'])
+                    self.stdout.write(f'Skalierung mit {options["export_korpus"]} Dateien '
+                                      f'({os.cpu_count()} CPU-Kerne)')
+                    if options['export_worker']:
+                        skalierung = export_skalierung(
+                            korpus, options['export_worker'], options['wiederholungen_schwer'], self.stdout.write,
+                        )
+                    if options['import_worker']:
+                        import_werte = import_skalierung(
+                            korpus, options['import_worker'], options['wiederholungen_schwer'], self.stdout.write,
+                        )
+        finally:
+            connection.creation.destroy_test_db(alter_name, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+        daten = {
+            'meta': self._meta(options),
+            'ergebnisse': ergebnisse,
+        }
+        if skalierung:
+            daten['export_skalierung'] = skalierung
+        if import_werte:
+            daten['import_skalierung'] = import_werte
+        with open(options['ausgabe'], 'w', encoding='utf-8') as f:
+            json.dump(daten, f, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'✓ Ergebnisse geschrieben: {options["ausgabe"]}'))
+
+        if options['vergleich']:
+            with open(options['vergleich'], encoding='utf-8') as f:
+                alt = json.load(f)
+            verschlechterungen = vergleichen(alt, daten)
+            for zeile in verschlechterungen:
+                self.stdout.write(self.style.WARNING(zeile))
+            if not verschlechterungen:
+                self.stdout.write(self.style.SUCCESS('✓ Keine Verschlechterung gegenüber dem Vergleich'))
+
+    def _meta(self, options):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, timeout=5,
+            ).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            commit = None
+
+        return {
+            'zeitpunkt': datetime.now().isoformat(timespec='seconds'),
+            'commit': commit,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'datenbank': connection.vendor,
+            'wiederholungen': options['wiederholungen'],
+            'wiederholungen_schwer': options['wiederholungen_schwer'],
+        }
@@ -0,0 +1,120 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from arbeitsanweisungen import ablage, statistik
+from arbeitsanweisungen.models import Arbeitsanweisung
+
+
+class Command(BaseCommand):
+    """
+    Gleicht den Dokument-Storage (siehe ablage.py) mit den Dateipfaden in der
+    Datenbank ab.
+
+    - Verwaiste Dateien: liegen im Storage, gehören aber zu keiner Arbeitsanweisung
+    - Fehlende Dateien: Arbeitsanweisung verweist auf eine Datei, die es nicht mehr gibt
+
+    Ohne Optionen wird nur berichtet. Der Storage wird einmal aufgelistet
+    und alle Dateipfade mit einer einzigen Abfrage geladen.
+    """
+    help = 'Findet verwaiste Dateien im Dokument-Storage und Einträge mit fehlender Datei (optional: bereinigen)'
+
+    # Chunk-Größe für UPDATE ... WHERE id IN (...)
+    BATCH_GROESSE = 1000
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='Entspricht --dateien-loeschen und --eintraege-bereinigen',
+        )
+        parser.add_argument(
+            '--dateien-loeschen', action='store_true',
+            help='Verwaiste Dateien aus dem Storage löschen',
+        )
+        parser.add_argument(
+            '--eintraege-bereinigen', action='store_true',
+            help='Dateipfad bei Einträgen mit fehlender Datei entfernen',
+        )
+        parser.add_argument(
+            '--min-alter', type=int, default=300,
+            help='Verwaiste Dateien erst ab diesem Alter in Sekunden berücksichtigen '
+                 '(schützt laufende Uploads, Standard: 300)',
+        )
+        parser.add_argument(
+            '--liste', action='store_true',
+            help='Betroffene Dateien und Einträge einzeln ausgeben',
+        )
+
+    def handle(self, *args, **options):
+        dateien_loeschen = options['fix'] or options['dateien_loeschen']
+        eintraege_bereinigen = options['fix'] or options['eintraege_bereinigen']
+        start = time.monotonic()
+
+        data_dir = os.path.normpath(settings.DATA_DIR)
+        # {datei_pfad: mtime}, datei_pfad bleibt auch bei einem Objektspeicher unter DATA_DIR
+        dateien = ablage.dateien()
+
+        # Alle Dateipfade mit einer Abfrage laden
+        eintraege = Arbeitsanweisung.objects.exclude(datei_pfad__isnull=True) \
+            .exclude(datei_pfad='').values_list('pk', 'nummer', 'datei_pfad')
+
+        bekannte_pfade = set()
+        fehlend = []
+        for pk, nummer, datei_pfad in eintraege.iterator(chunk_size=2000):
+            pfad = os.path.normpath(datei_pfad)
+            bekannte_pfade.add(pfad)
+            if os.path.dirname(pfad) == data_dir:
+                existiert = pfad in dateien
+            else:
+                # Pfade außerhalb von DATA_DIR einzeln prüfen (Altbestand)
+                existiert = ablage.existiert(pfad)
+            if not existiert:
+                fehlend.append((pk, nummer, datei_pfad))
+
+        grenze = time.time() - options['min_alter']
+        verwaist = sorted(
+            pfad for pfad, mtime in dateien.items()
+            if pfad not in bekannte_pfade and mtime < grenze
+        )
+
+        self.stdout.write(f'Dateien im Dokument-Storage: {len(dateien)}')
+        self.stdout.write(f'Einträge mit Dateipfad: {len(bekannte_pfade)}')
+        self._melden('Verwaiste Dateien', verwaist, options['liste'], lambda p: p)
+        self._melden('Einträge mit fehlender Datei', fehlend, options['liste'],
+                     lambda e: f'AA {e[1]}: {e[2]}')
+
+        if eintraege_bereinigen and fehlend:
+            bereinigt = self._eintraege_bereinigen([pk for pk, _, _ in fehlend])
+            self.stdout.write(self.style.SUCCESS(f'✓ {bereinigt} Einträge bereinigt'))
+
+        if dateien_loeschen and verwaist:
+            geloescht = 0
+            for pfad in verwaist:
+                try:
+                    ablage.loeschen(pfad)
+                    geloescht += 1
+                except OSError as e:
+                    self.stderr.write(f'Fehler beim Löschen von {pfad}: {e}')
+            self.stdout.write(self.style.SUCCESS(f'✓ {geloescht} verwaiste Dateien gelöscht'))
+
+        self.stdout.write(f'Dauer: {time.monotonic() - start:.2f} s')
+
+    def _eintraege_bereinigen(self, pks):
+        """Setzt datei_pfad mengenbasiert auf NULL"""
+        anzahl = 0
+        with transaction.atomic():
+            for i in range(0, len(pks), self.BATCH_GROESSE):
+                batch = Arbeitsanweisung.objects.filter(pk__in=pks[i:i + self.BATCH_GROESSE])
+                with statistik.nachfuehren(batch):
+                    anzahl += batch.update(datei_pfad=None)
+        return anzahl
+
+    def _melden(self, titel, eintraege, liste, formatieren):
+        stil = self.style.WARNING if eintraege else self.style.SUCCESS
+        self.stdout.write(stil(f'{titel}: {len(eintraege)}'))
+        if liste:
+            for eintrag in eintraege:
+                self.stdout.write(f'  - {formatieren(eintrag)}')
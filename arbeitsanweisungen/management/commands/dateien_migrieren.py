@@ -0,0 +1,178 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, Value, When
+
+from arbeitsanweisungen import ablage, statistik
+from arbeitsanweisungen.models import Arbeitsanweisung
+
+
+@dataclass
+class _Auftrag:
+    pk: int
+    nummer: int
+    quelle: str
+    dateiname: str
+    # Bisheriger datei_pfad, wenn er bleiben muss (Dateien aus --quelle)
+    datei_pfad: Optional[str] = None
+    # datei_pfad der abgelegten Kopie, wie vom Storage vergeben
+    neuer_pfad: Optional[str] = None
+
+
+class Command(BaseCommand):
+    """
+    Verschiebt vorhandene Dokument-Dateien in den Storage ``dokumente`` (siehe
+    ablage.py):
+
+    - Altbestand mit Pfaden außerhalb von DATA_DIR: wird unter seinem
+      Dateinamen abgelegt, datei_pfad zeigt danach in DATA_DIR
+    - nach dem Wechsel auf einen Objektspeicher (DOKUMENTE_SPEICHER=s3): die
+      Dateien aus dem lokalen Verzeichnis --quelle (Standard: DATA_DIR), die
+      im Storage noch fehlen; datei_pfad bleibt unverändert
+
+    Jede Kopie wird über die Größe geprüft, erst danach wird das Original
+    gelöscht (mit --kopieren bleibt es erhalten). Die Uploads laufen in
+    mehreren Threads, die Datenbank wird mengenbasiert aktualisiert.
+    """
+    help = 'Verschiebt vorhandene Dokument-Dateien in den Dokument-Storage (lokal oder S3)'
+
+    BATCH_GROESSE = 1000
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--quelle', default=settings.DATA_DIR,
+            help='Lokales Verzeichnis mit den bisherigen Dateien (Standard: DATA_DIR)',
+        )
+        parser.add_argument(
+            '--kopieren', action='store_true',
+            help='Originale nach der Übertragung behalten',
+        )
+        parser.add_argument(
+            '--probelauf', action='store_true',
+            help='Nur berichten, nichts übertragen',
+        )
+        parser.add_argument(
+            '--worker', type=int, default=settings.IMPORT_WORKERS,
+            help=f'Threads für die Übertragung (Standard: IMPORT_WORKERS = {settings.IMPORT_WORKERS})',
+        )
+        parser.add_argument(
+            '--liste', action='store_true',
+            help='Betroffene Dateien einzeln ausgeben',
+        )
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        auftraege, bereits, fehlend, konflikte = self._planen(os.path.normpath(options['quelle']))
+
+        self.stdout.write(f'Bereits im Storage: {bereits}')
+        self._melden('Zu übertragen', auftraege, options['liste'], lambda a: f'AA {a.nummer}: {a.quelle}',
+                     warnung=False)
+        self._melden('Datei nicht gefunden', fehlend, options['liste'], lambda e: f'AA {e[0]}: {e[1]}')
+        self._melden('Name im Storage bereits belegt', konflikte, options['liste'], lambda e: f'AA {e[0]}: {e[1]}')
+        if options['probelauf'] or not auftraege:
+            return
+
+        fertig, fehler = self._uebertragen(auftraege, max(1, options['worker']))
+        self._pfade_umstellen([a for a in fertig if a.datei_pfad is None])
+
+        if not options['kopieren']:
+            for auftrag in fertig:
+                try:
+                    os.remove(auftrag.quelle)
+                except OSError as e:
+                    self.stderr.write(f'Fehler beim Löschen von {auftrag.quelle}: {e}')
+
+        aktion = 'kopiert' if options['kopieren'] else 'verschoben'
+        stil = self.style.WARNING if fehler else self.style.SUCCESS
+        self.stdout.write(stil(
+            f'✓ {len(fertig)} Dateien {aktion}, {fehler} Fehler [{time.monotonic() - start:.2f} s]'))
+
+    def _planen(self, quelle_dir):
+        # Eine Auflistung des Storage statt einer Anfrage je Datei
+        vorhanden = set(ablage.dateien())
+        eintraege = list(Arbeitsanweisung.objects.exclude(datei_pfad__isnull=True)
+                         .exclude(datei_pfad='').values_list('pk', 'nummer', 'datei_pfad'))
+        belegt = {os.path.normpath(pfad) for _, _, pfad in eintraege} | vorhanden
+
+        auftraege, fehlend, konflikte = [], [], []
+        bereits = 0
+        for pk, nummer, datei_pfad in eintraege:
+            name = ablage.name(datei_pfad)
+            if name is None:
+                # Altbestand außerhalb von DATA_DIR
+                if not os.path.isfile(datei_pfad):
+                    fehlend.append((nummer, datei_pfad))
+                    continue
+                dateiname = os.path.basename(datei_pfad)
+                ziel = os.path.normpath(ablage.pfad(dateiname))
+                if ziel in belegt:
+                    konflikte.append((nummer, dateiname))
+                    continue
+                belegt.add(ziel)
+                auftraege.append(_Auftrag(pk, nummer, datei_pfad, dateiname))
+            elif os.path.normpath(datei_pfad) in vorhanden:
+                bereits += 1
+            else:
+                quelle = os.path.join(quelle_dir, name)
+                ziel = ablage.lokaler_pfad(datei_pfad)
+                # Quelle und Ziel dürfen nicht dieselbe Datei sein (sonst wird das Original gelöscht)
+                if os.path.isfile(quelle) and (ziel is None or os.path.realpath(ziel) != os.path.realpath(quelle)):
+                    auftraege.append(_Auftrag(pk, nummer, quelle, name, datei_pfad))
+                else:
+                    fehlend.append((nummer, datei_pfad))
+        return auftraege, bereits, fehlend, konflikte
+
+    def _uebertragen(self, auftraege, worker):
+        fertig = []
+        fehler = 0
+        with ThreadPoolExecutor(max_workers=worker, thread_name_prefix='dateien_migrieren') as pool:
+            futures = {pool.submit(self._datei_uebertragen, auftrag): auftrag for auftrag in auftraege}
+            for future in as_completed(futures):
+                auftrag = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    fehler += 1
+                    self.stderr.write(f'AA {auftrag.nummer}: {auftrag.quelle}: {e}')
+                else:
+                    fertig.append(auftrag)
+        return fertig, fehler
+
+    @staticmethod
+    def _datei_uebertragen(auftrag):
+        with open(auftrag.quelle, 'rb') as f:
+            auftrag.neuer_pfad = ablage.speichern(auftrag.dateiname, File(f, auftrag.dateiname))
+        # Der Storage kann einen anderen Namen vergeben (get_available_name), ein
+        # bleibender datei_pfad zeigte dann auf ein fremdes Objekt
+        if auftrag.datei_pfad is not None and \
+                os.path.normpath(auftrag.neuer_pfad) != os.path.normpath(auftrag.datei_pfad):
+            ablage.loeschen(auftrag.neuer_pfad)
+            raise OSError(f'Storage hat die Datei als {ablage.name(auftrag.neuer_pfad)} abgelegt, '
+                          f'erwartet {auftrag.dateiname}')
+        erwartet = os.path.getsize(auftrag.quelle)
+        stat = ablage.stat(auftrag.neuer_pfad)
+        if stat is None or stat[0] != erwartet:
+            raise OSError(f'Kopie im Storage hat {stat[0] if stat else 0} statt {erwartet} Bytes')
+
+    def _pfade_umstellen(self, auftraege):
+        """Setzt datei_pfad mengenbasiert (ein UPDATE je Batch)"""
+        with transaction.atomic():
+            for i in range(0, len(auftraege), self.BATCH_GROESSE):
+                teil = auftraege[i:i + self.BATCH_GROESSE]
+                batch = Arbeitsanweisung.objects.filter(pk__in=[a.pk for a in teil])
+                with statistik.nachfuehren(batch):
+                    batch.update(datei_pfad=Case(*[When(pk=a.pk, then=Value(a.neuer_pfad)) for a in teil]))
+
+    def _melden(self, titel, eintraege, liste, formatieren, warnung=True):
+        stil = self.style.WARNING if eintraege and warnung else self.style.SUCCESS
+        self.stdout.write(stil(f'{titel}: {len(eintraege)}'))
+        if liste:
+            for eintrag in eintraege:
+                self.stdout.write(f'  - {formatieren(eintrag)}')
@@ -0,0 +1,91 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Was ein gunicorn-Worker beim Start importiert (preload_app lädt WSGI-App und URLconf)
+START_IMPORTE = (
+    'import django; django.setup(); '
+    'import app.wsgi; '
+    'from django.urls import get_resolver; get_resolver().url_patterns'
+)
+
+
+def importzeiten_parsen(ausgabe):
+    """
+    Parst die stderr-Ausgabe von ``python -X importtime``.
+    Gibt eine Liste von (modul, eigen_us, kumuliert_us) zurück.
+    """
+    eintraege = []
+    for zeile in ausgabe.splitlines():
+        if not zeile.startswith('import time:'):
+            continue
+        teile = zeile[len('import time:'):].split('|')
+        if len(teile) != 3:
+            continue
+        try:
+            eigen, kumuliert = int(teile[0]), int(teile[1])
+        except ValueError:
+            # Kopfzeile "self [us] | cumulative | imported package"
+            continue
+        eintraege.append((teile[2].strip(), eigen, kumuliert))
+    return eintraege
+
+
+def importzeit_messen(code=START_IMPORTE):
+    """Startet einen frischen Interpreter mit -X importtime und gibt die Messwerte zurück"""
+    umgebung = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get(
+        'DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE))
+    ergebnis = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True, text=True, cwd=settings.BASE_DIR, env=umgebung,
+    )
+    if ergebnis.returncode != 0:
+        raise CommandError(f'Import fehlgeschlagen:\n{ergebnis.stderr[-2000:]}')
+    return importzeiten_parsen(ergebnis.stderr)
+
+
+class Command(BaseCommand):
+    """
+    Import-Zeit-Profil des Worker-Starts auf Basis von ``python -X importtime``.
+    Zeigt die Module mit der größten kumulierten Import-Zeit.
+    """
+    help = 'Import-Zeit-Profil für den Start der Anwendung (python -X importtime)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top', type=int, default=25,
+            help='Anzahl der angezeigten Module (Standard: 25)',
+        )
+        parser.add_argument(
+            '--filter',
+            help='Nur Module anzeigen, deren Name diesen Text enthält (z.B. arbeitsanweisungen)',
+        )
+        parser.add_argument(
+            '--sortierung', choices=['kumuliert', 'eigen'], default='kumuliert',
+            help='Sortierung nach kumulierter oder eigener Import-Zeit (Standard: kumuliert)',
+        )
+        parser.add_argument(
+            '--code', default=START_IMPORTE,
+            help='Python-Code, dessen Importe gemessen werden (Standard: Worker-Start)',
+        )
+
+    def handle(self, *args, **options):
+        eintraege = importzeit_messen(options['code'])
+        gesamt_us = sum(eigen for _, eigen, _ in eintraege)
+
+        if options['filter']:
+            eintraege = [e for e in eintraege if options['filter'] in e[0]]
+        index = 2 if options['sortierung'] == 'kumuliert' else 1
+        eintraege.sort(key=lambda e: e[index], reverse=True)
+
+        self.stdout.write(f'{"Modul":60} {"eigen ms":>10} {"kumuliert ms":>13}')
+        for modul, eigen, kumuliert in eintraege[:options['top']]:
+            self.stdout.write(f'{modul[:60]:60} {eigen / 1000:10.2f} {kumuliert / 1000:13.2f}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Gesamt: {gesamt_us / 1000:.1f} ms für {len(eintraege)} Module'
+            + (f' (gefiltert: "{options["filter"]}")' if options['filter'] else '')
+        ))
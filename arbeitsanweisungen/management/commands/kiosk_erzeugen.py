@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from arbeitsanweisungen import kiosk
+
+
+class Command(BaseCommand):
+    """
+    Schreibt alle Kiosk-Seiten neu (Übersicht und je Arbeitsplatz eine Seite
+    pro Kategorie). Im Betrieb werden nur die Seiten der geänderten
+    Arbeitsplätze nachgeführt; der vollständige Lauf ist nach direkten
+    Datenbankänderungen oder einem neuen Template nötig.
+    """
+    help = 'Erzeugt die statischen Kiosk-Seiten je Arbeitsplatz'
+
+    def handle(self, *args, **options):
+        if not kiosk.aktiv():
+            raise CommandError('KIOSK_DIR ist nicht gesetzt.')
+
+        start = time.monotonic()
+        geaendert = kiosk.erzeugen()
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Kiosk-Seiten: {geaendert} Dateien geändert [{time.monotonic() - start:.2f} s]'))
@@ -0,0 +1,93 @@
+import json
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from arbeitsanweisungen.benchmark import latenz_statistik
+from arbeitsanweisungen.models import Arbeitsanweisung
+
+
+class Command(BaseCommand):
+    """
+    Kleiner Lasttest gegen einen laufenden Server (z.B. gunicorn mit
+    app/gunicorn_config.py): parallele Requests auf Liste und Download.
+    """
+    help = 'Lasttest für Liste und Download gegen einen laufenden Server'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', default='http://127.0.0.1:8000',
+            help='Basis-URL des Servers (Standard: http://127.0.0.1:8000)',
+        )
+        parser.add_argument(
+            '--parallel', type=int, default=16,
+            help='Gleichzeitige Verbindungen (Standard: 16)',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=500,
+            help='Requests pro Endpunkt (Standard: 500)',
+        )
+        parser.add_argument(
+            '--nummer', type=int,
+            help='Nummer für den Download-Endpunkt (Standard: erste Arbeitsanweisung mit Datei)',
+        )
+        parser.add_argument(
+            '--ausgabe',
+            help='Ergebnisse zusätzlich als JSON in diese Datei schreiben',
+        )
+
+    def handle(self, *args, **options):
+        basis = options['url'].rstrip('/')
+        nummer = options['nummer']
+        if nummer is None:
+            nummer = Arbeitsanweisung.objects.exclude(datei_pfad__isnull=True) \
+                .order_by('nummer').values_list('nummer', flat=True).first()
+
+        endpunkte = {'liste': f'{basis}/'}
+        if nummer is not None:
+            endpunkte['download'] = f'{basis}/{nummer}/download/'
+        else:
+            self.stderr.write('Keine Arbeitsanweisung mit Datei gefunden, Download wird übersprungen.')
+
+        ergebnisse = {}
+        for name, url in endpunkte.items():
+            ergebnisse[name] = werte = self._last(url, options['requests'], options['parallel'])
+            latenz = werte['latenz_ms']
+            self.stdout.write(
+                f'{name:10} {werte["requests_pro_s"]:8.1f} req/s  p50 {latenz["p50"]:8.2f} ms  '
+                f'p95 {latenz["p95"]:8.2f} ms  p99 {latenz["p99"]:8.2f} ms  Fehler {werte["fehler"]}'
+            )
+
+        if options['ausgabe']:
+            with open(options['ausgabe'], 'w', encoding='utf-8') as f:
+                json.dump({'url': basis, 'parallel': options['parallel'], 'ergebnisse': ergebnisse}, f, indent=2)
+
+        if any(werte['fehler'] for werte in ergebnisse.values()):
+            raise CommandError('Lasttest mit Fehlern beendet.')
+
+    def _last(self, url, anzahl, parallel):
+        def abrufen(_):
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(url, timeout=30) as response:
+                    while response.read(64 * 1024):
+                        pass
+                    ok = response.status == 200
+            except (urllib.error.URLError, OSError):
+                ok = False
+            return time.perf_counter() - start, ok
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=parallel) as executor:
+            messungen = list(executor.map(abrufen, range(anzahl)))
+        gesamt = time.perf_counter() - start
+
+        return {
+            'requests': anzahl,
+            'fehler': sum(1 for _, ok in messungen if not ok),
+            'requests_pro_s': round(anzahl / gesamt, 1),
+            'latenz_ms': latenz_statistik([dauer for dauer, _ in messungen]),
+        }
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from arbeitsanweisungen.anmeldung import abgelaufene_sitzungen_loeschen
+
+
+class Command(BaseCommand):
+    """
+    Löscht abgelaufene Sitzungen in Batches. Ersetzt ``clearsessions``, das
+    alle abgelaufenen Zeilen mit einem einzigen DELETE entfernt. Läuft bei
+    jedem Container-Start (startvorbereitung), für lange Laufzeiten zusätzlich
+    per Cron aufrufen.
+    """
+    help = 'Löscht abgelaufene Sitzungen aus django_session in Batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch', type=int, default=5000,
+            help='Sitzungen pro DELETE (Standard: 5000)',
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0.0,
+            help='Pause zwischen zwei Batches in Sekunden (Standard: 0)',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch'] < 1:
+            raise CommandError('--batch muss mindestens 1 sein.')
+
+        start = time.monotonic()
+        geloescht = abgelaufene_sitzungen_loeschen(options['batch'], options['pause'])
+        if geloescht is None:
+            self.stdout.write('Sitzungen liegen nur im Cache, dort verfallen sie selbst.')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {geloescht} abgelaufene Sitzungen gelöscht [{time.monotonic() - start:.2f} s]'))
@@ -0,0 +1,135 @@
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.db.utils import OperationalError
+
+
+class Command(BaseCommand):
+    """
+    Alle Schritte vor dem Start von gunicorn in einem einzigen Prozess:
+
+    1. Warten bis die Datenbank erreichbar ist (ohne feste Zusatzwartezeit)
+    2. Django System Check
+    3. Migrationen nur ausführen, wenn noch welche offen sind
+    4. Admin-Benutzer anlegen, falls er noch nicht existiert
+    5. Abgelaufene Sitzungen in Batches löschen
+    6. Static-Dateien sammeln (nur mit Manifest, also DEBUG=False): schreibt
+       gehashte Dateien und staticfiles.json in das Volume, das nginx
+       ausliefert. Beim Build gesammelte Dateien würden ein bestehendes
+       Volume nie erreichen.
+    7. Kiosk-Seiten schreiben (nur mit KIOSK_DIR, unveränderte bleiben erhalten)
+
+    Ersetzt die getrennten Aufrufe von check, migrate und dem Superuser-Skript
+    in entrypoint.sh (jeweils ein eigener Django-Start).
+    """
+    help = 'Bereitet den Container-Start vor: DB-Wartezeit, Check, Migrationen, Admin-Benutzer'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--versuche', type=int, default=60,
+            help='Maximale Verbindungsversuche zur Datenbank (Standard: 60)',
+        )
+        parser.add_argument(
+            '--intervall', type=float, default=0.5,
+            help='Wartezeit zwischen Verbindungsversuchen in Sekunden (Standard: 0.5)',
+        )
+        parser.add_argument(
+            '--ohne-check', action='store_true',
+            help='Django System Check überspringen',
+        )
+        parser.add_argument(
+            '--ohne-static', action='store_true',
+            help='collectstatic überspringen',
+        )
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Datenbank-Alias (Standard: default)',
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        self.start = time.monotonic()
+
+        self._schritt('Datenbank erreichbar', self._auf_datenbank_warten,
+                      connection, options['versuche'], options['intervall'])
+        if not options['ohne_check']:
+            self._schritt('System Check', call_command, 'check', verbosity=0)
+        self._schritt('Migrationen', self._migrieren, connection, options['database'])
+        self._schritt('Admin-Benutzer', self._admin_anlegen)
+        self._schritt('Abgelaufene Sitzungen', self._sitzungen_aufraeumen)
+        if not options['ohne_static']:
+            self._schritt('Static-Dateien', self._static_sammeln)
+        self._schritt('Kiosk-Seiten', self._kiosk_erzeugen)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Startvorbereitung abgeschlossen in {time.monotonic() - self.start:.2f} s'))
+
+    def _schritt(self, name, funktion, *args, **kwargs):
+        start = time.monotonic()
+        ergebnis = funktion(*args, **kwargs)
+        hinweis = f' ({ergebnis})' if isinstance(ergebnis, str) else ''
+        self.stdout.write(f'✓ {name}{hinweis} [{time.monotonic() - start:.2f} s]')
+
+    def _auf_datenbank_warten(self, connection, versuche, intervall):
+        for versuch in range(1, versuche + 1):
+            try:
+                connection.ensure_connection()
+                return f'Versuch {versuch}' if versuch > 1 else None
+            except OperationalError as e:
+                if versuch == versuche:
+                    raise CommandError(f'Datenbank nicht erreichbar nach {versuche} Versuchen: {e}')
+                self.stdout.write(f'Datenbank ist noch nicht bereit - warte... (Versuch {versuch}/{versuche})')
+                time.sleep(intervall)
+
+    def _migrieren(self, connection, database):
+        # Schneller Pfad: nur der Migrationsgraph und die django_migrations-Tabelle werden gelesen
+        executor = MigrationExecutor(connection)
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        if not plan:
+            return 'keine offenen Migrationen'
+
+        call_command('migrate', database=database, interactive=False, verbosity=1)
+        return f'{len(plan)} ausgeführt'
+
+    def _admin_anlegen(self):
+        username = os.environ.get('DJANGO_SUPERUSER_USERNAME', 'admin')
+        email = os.environ.get('DJANGO_SUPERUSER_EMAIL', 'admin@example.com')
+        password = os.environ.get('DJANGO_SUPERUSER_PASSWORD', 'admin123')
+
+        User = get_user_model()
+        if User.objects.filter(username=username).exists():
+            return f'{username} existiert bereits'
+
+        try:
+            User.objects.create_superuser(username, email, password)
+        except IntegrityError:
+            # Parallel gestarteter Container war schneller
+            return f'{username} existiert bereits'
+        return f'{username} erstellt'
+
+    def _sitzungen_aufraeumen(self):
+        from arbeitsanweisungen.anmeldung import abgelaufene_sitzungen_loeschen
+
+        geloescht = abgelaufene_sitzungen_loeschen()
+        return 'nur Cache' if geloescht is None else f'{geloescht} gelöscht'
+
+    def _static_sammeln(self):
+        from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+
+        if not isinstance(staticfiles_storage, ManifestStaticFilesStorage):
+            return 'ohne Manifest (DEBUG)'
+        # Ohne --clear: ältere gehashte Dateien bleiben für noch ausgelieferte Seiten erreichbar
+        call_command('collectstatic', interactive=False, verbosity=0)
+        return 'gesammelt'
+
+    def _kiosk_erzeugen(self):
+        from arbeitsanweisungen import kiosk
+
+        if not kiosk.aktiv():
+            return 'KIOSK_DIR nicht gesetzt'
+        return f'{kiosk.erzeugen()} geändert'
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from arbeitsanweisungen import statistik
+
+
+class Command(BaseCommand):
+    """
+    Baut die materialisierten Zähler (Statistik-Tabelle) vollständig neu auf.
+    Normalerweise werden sie bei jeder Änderung fortgeschrieben; der Neuaufbau
+    ist nach direkten Datenbankänderungen nötig und aktualisiert außerdem die
+    Anzahl fehlender Dateien.
+    """
+    help = 'Baut die Statistik für Dashboard und Kategorie-Reiter neu auf'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ohne-dateipruefung', action='store_true',
+            help='Fehlende Dateien nicht prüfen (letzter Stand bleibt erhalten)',
+        )
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        zaehler = statistik.neu_aufbauen(dateien_pruefen=not options['ohne_dateipruefung'])
+
+        gesamt = sum(anzahl for (_, dimension, _), anzahl in zaehler.items() if dimension == statistik.GESAMT)
+        fehlend = sum(anzahl for (_, dimension, _), anzahl in zaehler.items() if dimension == statistik.DATEI_FEHLT)
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Statistik neu aufgebaut: {gesamt} Arbeitsanweisungen, {len(zaehler)} Zähler, '
+            f'{fehlend} fehlende Dateien [{time.monotonic() - start:.2f} s]'
+        ))
@@ -0,0 +1,51 @@
+import os
+import time
+import zipfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from arbeitsanweisungen.archivpruefung import archiv_pruefen
+from arbeitsanweisungen.manifest import UngueltigesArchiv
+
+
+class Command(BaseCommand):
+    """
+    Prüft ein Export-Archiv gegen die SHA-256-Prüfsummen im Manifest, bevor
+    daraus wiederhergestellt wird. Die Dateien werden parallel gehasht, beim
+    ersten Fehler wird abgebrochen (mit --alle-fehler vollständig geprüft).
+    Exit-Code 1 bei einer Abweichung.
+    """
+    help = 'Prüft die Dateien eines Export-Archivs gegen die Prüfsummen im Manifest'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archiv', help='Pfad zum Export-Archiv (ZIP)')
+        parser.add_argument(
+            '--worker', type=int, default=settings.IMPORT_WORKERS,
+            help=f'Threads zum Hashen (Standard: IMPORT_WORKERS = {settings.IMPORT_WORKERS})',
+        )
+        parser.add_argument(
+            '--alle-fehler', action='store_true',
+            help='Nicht beim ersten Fehler abbrechen, alle Abweichungen auflisten',
+        )
+
+    def handle(self, *args, **options):
+        if not os.path.isfile(options['archiv']):
+            raise CommandError(f'{options["archiv"]} nicht gefunden.')
+
+        start = time.monotonic()
+        try:
+            ergebnis = archiv_pruefen(options['archiv'], options['worker'],
+                                      beim_ersten_fehler=not options['alle_fehler'])
+        except (UngueltigesArchiv, zipfile.BadZipFile) as e:
+            raise CommandError(str(e))
+        dauer = time.monotonic() - start
+
+        for fehler in ergebnis.fehler:
+            self.stdout.write(self.style.ERROR(f'✗ {fehler}'))
+        zusammenfassung = (f'{ergebnis.geprueft} Dateien geprüft ({ergebnis.gelesen / 1024 / 1024:.1f} MB), '
+                           f'davon {ergebnis.ohne_pruefsumme} ohne Prüfsumme (nur CRC) [{dauer:.2f} s]')
+        if not ergebnis.ok:
+            hinweis = ', beim ersten Fehler abgebrochen' if ergebnis.abgebrochen else ''
+            raise CommandError(f'{len(ergebnis.fehler)} Fehler{hinweis}. {zusammenfassung}')
+        self.stdout.write(self.style.SUCCESS(f'✓ Archiv in Ordnung: {zusammenfassung}'))
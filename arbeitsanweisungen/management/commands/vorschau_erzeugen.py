@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from arbeitsanweisungen import vorschau
+from arbeitsanweisungen.models import Arbeitsanweisung
+
+
+class Command(BaseCommand):
+    """
+    Erzeugt die PDF-Vorschau aller Office-Dokumente, die noch nicht im Cache
+    liegen (z.B. nach einem Import oder nach dem Leeren des Caches), und
+    verdrängt anschließend alte Vorschauen über der Größengrenze.
+    """
+    help = 'Konvertiert Office-Dokumente für die Browser-Vorschau nach PDF'
+
+    def handle(self, *args, **options):
+        if not vorschau.konverter():
+            raise CommandError('Kein Konverter gefunden (LibreOffice installieren oder VORSCHAU_KONVERTER setzen).')
+
+        start = time.monotonic()
+        erzeugt = vorhanden = fehler = 0
+        pfade = Arbeitsanweisung.objects.exclude(datei_pfad__isnull=True).values_list('datei_pfad', flat=True)
+        for pfad in pfade.iterator(chunk_size=2000):
+            if not vorschau.konvertierbar(pfad):
+                continue
+            try:
+                if vorschau.vorschau_pfad(pfad):
+                    vorhanden += 1
+                elif vorschau.erzeugen(pfad):
+                    erzeugt += 1
+                else:
+                    fehler += 1
+            except OSError as e:
+                self.stdout.write(self.style.WARNING(f'{pfad}: {e}'))
+                fehler += 1
+
+        verdraengt = vorschau.aufraeumen()
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Vorschau: {erzeugt} erzeugt, {vorhanden} bereits vorhanden, {fehler} Fehler, '
+            f'{verdraengt} verdrängt [{time.monotonic() - start:.2f} s]'
+        ))
@@ -0,0 +1,43 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from arbeitsanweisungen import zugriffe
+
+
+class Command(BaseCommand):
+    """
+    Fasst das Zugriffsprotokoll zu Aufrufen je Tag, Arbeitsanweisung,
+    Revision und Art zusammen (Tabelle ZugriffeProTag). Ohne Angaben werden
+    die Tage seit dem letzten Lauf neu berechnet, für regelmäßige Läufe per
+    Cron. Optional werden danach alte Rohdaten gelöscht.
+    """
+    help = 'Verdichtet das Zugriffsprotokoll zu Tageszahlen je Arbeitsanweisung'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--von', type=date.fromisoformat,
+            help='Erster Tag (JJJJ-MM-TT), nur Tage deren Rohdaten noch vorhanden sind',
+        )
+        parser.add_argument(
+            '--bis', type=date.fromisoformat,
+            help='Letzter Tag (JJJJ-MM-TT, Standard: heute)',
+        )
+        parser.add_argument(
+            '--rohdaten-loeschen-nach', type=int, metavar='TAGE',
+            help='Verdichtete Rohdaten älter als TAGE löschen (Standard: behalten)',
+        )
+
+    def handle(self, *args, **options):
+        if options['von'] and options['bis'] and options['von'] > options['bis']:
+            raise CommandError('--von liegt nach --bis.')
+
+        start = time.monotonic()
+        zeilen = zugriffe.verdichten(options['von'], options['bis'])
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {zeilen} Tageszeilen geschrieben [{time.monotonic() - start:.2f} s]'))
+
+        if options['rohdaten_loeschen_nach'] is not None:
+            geloescht = zugriffe.rohdaten_loeschen(options['rohdaten_loeschen_nach'])
+            self.stdout.write(f'{geloescht} Rohdaten-Einträge gelöscht')
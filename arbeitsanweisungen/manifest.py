@@ -0,0 +1,133 @@
+"""
+Metadaten-Datei der Export-Archive.
+
+Version 2 (``arbeitsanweisungen.jsonl``, JSON Lines): eine Kopfzeile mit
+Format und Version, danach eine Zeile je Arbeitsanweisung, bei Dateien mit
+SHA-256 und Größe (``datei_sha256``, ``datei_groesse``). Der Export
+schreibt Zeile für Zeile direkt ins Archiv, der Import liest sie
+schrittweise, ohne die ganze Datei im Speicher zu halten, und kann mit dem
+ersten Batch beginnen, bevor der Rest gelesen ist.
+
+Version 1 (``arbeitsanweisungen.json``): ein einziges, eingerücktes
+JSON-Array. Wird beim Import weiterhin gelesen (als Ganzes).
+"""
+import hashlib
+import io
+import json
+from datetime import datetime
+
+MANIFEST = 'arbeitsanweisungen.jsonl'
+MANIFEST_V1 = 'arbeitsanweisungen.json'
+FORMAT = 'arbeitsanweisungen-export'
+VERSION = 2
+
+
+BLOCK_GROESSE = 1024 * 1024
+
+
+class UngueltigesArchiv(Exception):
+    """Das hochgeladene Archiv ist kein gültiges Export-Archiv"""
+
+
+class ManifestSchreiber:
+    """
+    Schreibt das Manifest als Mitglied eines geöffneten ZipFile::
+
+        with ManifestSchreiber(zipf) as manifest:
+            for meta in ...:
+                manifest.schreiben(meta)
+    """
+
+    def __init__(self, zipf):
+        self.zipf = zipf
+        self.anzahl = 0
+        self._datei = None
+
+    def __enter__(self):
+        self._datei = io.TextIOWrapper(self.zipf.open(MANIFEST, 'w'), encoding='utf-8', newline='\n')
+        self._zeile({'format': FORMAT, 'version': VERSION,
+                     'erstellt_am': datetime.now().isoformat(timespec='seconds')})
+        return self
+
+    def __exit__(self, *exc):
+        self._datei.close()
+
+    def schreiben(self, meta):
+        self._zeile(meta)
+        self.anzahl += 1
+
+    def _zeile(self, daten):
+        self._datei.write(json.dumps(daten, ensure_ascii=False, separators=(',', ':')))
+        self._datei.write('\n')
+
+
+def pruefsumme(quelle, kopie=None):
+    """(SHA-256 als Hex, Größe in Bytes) eines Datenstroms, optional zugleich nach `kopie` geschrieben"""
+    hash_wert = hashlib.sha256()
+    groesse = 0
+    while block := quelle.read(BLOCK_GROESSE):
+        hash_wert.update(block)
+        groesse += len(block)
+        if kopie is not None:
+            kopie.write(block)
+    return hash_wert.hexdigest(), groesse
+
+
+def manifest_name(mitglieder):
+    """Name der Metadaten-Datei im Archiv, bevorzugt Version 2"""
+    for name in (MANIFEST, MANIFEST_V1):
+        if name in mitglieder:
+            return name
+    raise UngueltigesArchiv(f'Ungültiges Export-Archiv: {MANIFEST} bzw. {MANIFEST_V1} fehlt.')
+
+
+def eintraege_lesen(zipf, bei_fehler=None):
+    """
+    Liefert die Einträge (dicts) des Manifests. Version 2 wird schrittweise
+    gelesen: eine fehlerhafte Zeile meldet ``bei_fehler(zeilennummer, fehler)``
+    und wird übersprungen. Ein unlesbarer Kopf löst UngueltigesArchiv aus.
+    """
+    name = manifest_name(set(zipf.namelist()))
+    if name == MANIFEST_V1:
+        yield from _v1_lesen(zipf)
+        return
+
+    with io.TextIOWrapper(zipf.open(name), encoding='utf-8') as datei:
+        try:
+            kopf = json.loads(datei.readline())
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise UngueltigesArchiv(f'Ungültiges Export-Archiv: Kopfzeile von {name} ist beschädigt.')
+        if not isinstance(kopf, dict) or kopf.get('format') != FORMAT:
+            raise UngueltigesArchiv(f'Ungültiges Export-Archiv: {name} hat kein bekanntes Format.')
+        if not isinstance(kopf.get('version'), int) or kopf['version'] > VERSION:
+            raise UngueltigesArchiv(
+                f'Export-Archiv hat Version {kopf.get("version")}, unterstützt wird bis Version {VERSION}.')
+
+        zeilennummer = 1
+        while True:
+            try:
+                zeile = datei.readline()
+            except UnicodeDecodeError as e:
+                if bei_fehler:
+                    bei_fehler(zeilennummer + 1, e)
+                return
+            if not zeile:
+                return
+            zeilennummer += 1
+            if not zeile.strip():
+                continue
+            try:
+                yield json.loads(zeile)
+            except json.JSONDecodeError as e:
+                if bei_fehler:
+                    bei_fehler(zeilennummer, e)
+
+
+def _v1_lesen(zipf):
+    try:
+        metadata = json.loads(zipf.read(MANIFEST_V1).decode('utf-8'))
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise UngueltigesArchiv('Ungültiges Export-Archiv: JSON-Datei ist beschädigt.')
+    if not isinstance(metadata, list):
+        raise UngueltigesArchiv('Ungültiges Export-Archiv: JSON-Datei enthält keine Liste.')
+    yield from metadata
@@ -0,0 +1,166 @@
+"""
+Performance-Metriken pro Request und pro View.
+
+Die Werte des laufenden Requests liegen thread-lokal (gunicorn gthread-Worker
+bearbeiten mehrere Requests parallel), die Summen pro View prozessweit.
+Jeder gunicorn-Worker führt eigene Summen; im Prometheus-Export werden sie
+daher mit dem Label ``worker`` (PID) unterschieden.
+"""
+import os
+import threading
+import time
+from collections import defaultdict
+
+# Grenzen der Histogramm-Buckets für die Request-Dauer in Sekunden
+DAUER_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lokal = threading.local()
+_lock = threading.Lock()
+_views = defaultdict(lambda: {
+    'anzahl': 0,
+    'dauer': 0.0,
+    'db_anzahl': 0,
+    'db_dauer': 0.0,
+    'template_dauer': 0.0,
+    'io_bytes': 0,
+    'buckets': [0] * len(DAUER_BUCKETS),
+})
+
+
+class RequestMetriken:
+    """Messwerte eines einzelnen Requests"""
+
+    __slots__ = ('start', 'db_anzahl', 'db_dauer', 'template_dauer', 'template_tiefe', 'io_bytes')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.db_anzahl = 0
+        self.db_dauer = 0.0
+        self.template_dauer = 0.0
+        self.template_tiefe = 0
+        self.io_bytes = 0
+
+    def dauer(self):
+        return time.perf_counter() - self.start
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        """Execute-Wrapper für django.db.connection.execute_wrapper()"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_dauer += time.perf_counter() - start
+            self.db_anzahl += 1
+
+
+def starten():
+    _lokal.metriken = RequestMetriken()
+    return _lokal.metriken
+
+
+def beenden():
+    _lokal.metriken = None
+
+
+def aktuell():
+    """Metriken des laufenden Requests oder None außerhalb eines Requests"""
+    return getattr(_lokal, 'metriken', None)
+
+
+def datei_io(anzahl_bytes):
+    """Meldet gelesene oder geschriebene Dateibytes für den laufenden Request"""
+    metriken = aktuell()
+    if metriken is not None and anzahl_bytes:
+        metriken.io_bytes += anzahl_bytes
+
+
+def erfassen(view, metriken, dauer):
+    """Übernimmt die Werte eines abgeschlossenen Requests in die Summen der View"""
+    with _lock:
+        summe = _views[view]
+        summe['anzahl'] += 1
+        summe['dauer'] += dauer
+        summe['db_anzahl'] += metriken.db_anzahl
+        summe['db_dauer'] += metriken.db_dauer
+        summe['template_dauer'] += metriken.template_dauer
+        summe['io_bytes'] += metriken.io_bytes
+        for i, grenze in enumerate(DAUER_BUCKETS):
+            if dauer <= grenze:
+                summe['buckets'][i] += 1
+
+
+def zuruecksetzen():
+    with _lock:
+        _views.clear()
+
+
+def template_messung_aktivieren():
+    """
+    Misst die Renderzeit aller Django-Templates. Gemessen wird am Template des
+    Backends, d.h. einmal pro render()/TemplateResponse; Includes und Vererbung
+    zählen zum äußeren Template.
+    """
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, '_metriken', False):
+        return
+
+    original = Template.render
+
+    def render(self, context=None, request=None):
+        metriken = aktuell()
+        if metriken is None:
+            return original(self, context, request)
+        metriken.template_tiefe += 1
+        start = time.perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            metriken.template_tiefe -= 1
+            if metriken.template_tiefe == 0:
+                metriken.template_dauer += time.perf_counter() - start
+
+    render._metriken = True
+    Template.render = render
+
+
+def prometheus_text():
+    """Summen aller Views im Prometheus-Textformat (Version 0.0.4)"""
+    with _lock:
+        views = {view: dict(summe, buckets=list(summe['buckets'])) for view, summe in _views.items()}
+
+    worker = os.getpid()
+    zeilen = []
+
+    def metrik(name, typ, hilfe, werte):
+        zeilen.append(f'# HELP {name} {hilfe}')
+        zeilen.append(f'# TYPE {name} {typ}')
+        zeilen.extend(werte)
+
+    def label(view, **extra):
+        teile = [f'view="{view}"', f'worker="{worker}"']
+        teile += [f'{k}="{v}"' for k, v in extra.items()]
+        return '{' + ','.join(teile) + '}'
+
+    histogramm = []
+    for view, summe in sorted(views.items()):
+        for grenze, anzahl in zip(DAUER_BUCKETS, summe['buckets']):
+            histogramm.append(f'arbeitsanweisungen_request_duration_seconds_bucket{label(view, le=grenze)} {anzahl}')
+        histogramm.append(f'arbeitsanweisungen_request_duration_seconds_bucket{label(view, le="+Inf")} {summe["anzahl"]}')
+        histogramm.append(f'arbeitsanweisungen_request_duration_seconds_sum{label(view)} {summe["dauer"]:.6f}')
+        histogramm.append(f'arbeitsanweisungen_request_duration_seconds_count{label(view)} {summe["anzahl"]}')
+    metrik('arbeitsanweisungen_request_duration_seconds', 'histogram',
+           'Gesamtdauer der Requests pro View', histogramm)
+
+    for name, schluessel, typ_format, hilfe in (
+        ('arbeitsanweisungen_db_queries_total', 'db_anzahl', '{}', 'Anzahl Datenbankabfragen pro View'),
+        ('arbeitsanweisungen_db_duration_seconds_total', 'db_dauer', '{:.6f}', 'Dauer der Datenbankabfragen pro View'),
+        ('arbeitsanweisungen_template_duration_seconds_total', 'template_dauer', '{:.6f}', 'Renderzeit der Templates pro View'),
+        ('arbeitsanweisungen_file_io_bytes_total', 'io_bytes', '{}', 'Gelesene und geschriebene Dateibytes pro View'),
+    ):
+        metrik(name, 'counter', hilfe, [
+            f'{name}{label(view)} {typ_format.format(summe[schluessel])}'
+            for view, summe in sorted(views.items())
+        ])
+
+    return '\n'.join(zeilen) + '\n'
@@ -0,0 +1,62 @@
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metriken
+
+logger = logging.getLogger('arbeitsanweisungen.performance')
+
+
+class PerformanceMiddleware:
+    """
+    Misst pro Request Gesamtdauer, Anzahl und Dauer der Datenbankabfragen,
+    Renderzeit der Templates und Datei-I/O.
+
+    - Server-Timing-Header für die Entwicklertools des Browsers
+    - Summen pro View für den Prometheus-Endpunkt (siehe views.performance_metriken)
+    - Langsame Requests werden ab PERFORMANCE_SLOW_REQUEST_MS protokolliert
+
+    Sollte als erste Middleware eingetragen sein, damit die übrigen Middlewares
+    in der Gesamtdauer enthalten sind.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'PERFORMANCE_SERVER_TIMING', True)
+        self.langsam_ab = getattr(settings, 'PERFORMANCE_SLOW_REQUEST_MS', 1000) / 1000
+        metriken.template_messung_aktivieren()
+
+    def __call__(self, request):
+        messung = metriken.starten()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(messung.db_wrapper))
+                response = self.get_response(request)
+            dauer = messung.dauer()
+        finally:
+            metriken.beenden()
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name or match.view_name) if match else 'unbekannt'
+        metriken.erfassen(view, messung, dauer)
+
+        if self.server_timing:
+            response['Server-Timing'] = ', '.join([
+                f'total;dur={dauer * 1000:.1f}',
+                f'db;dur={messung.db_dauer * 1000:.1f};desc="{messung.db_anzahl} Abfragen"',
+                f'tpl;dur={messung.template_dauer * 1000:.1f}',
+                f'io;desc="{messung.io_bytes} Bytes"',
+            ])
+
+        if dauer >= self.langsam_ab:
+            logger.warning(
+                'Langsamer Request: %s %s (%s) %.0f ms, %d Abfragen / %.0f ms DB, %.0f ms Templates, %d Bytes I/O',
+                request.method, request.path, view, dauer * 1000,
+                messung.db_anzahl, messung.db_dauer * 1000,
+                messung.template_dauer * 1000, messung.io_bytes,
+            )
+
+        return response
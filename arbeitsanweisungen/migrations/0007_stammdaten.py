@@ -0,0 +1,95 @@
+# Generated by Django 5.2.9 on 2026-10-19 14:47
+
+import arbeitsanweisungen.stammdaten
+import django.core.validators
+from django.db import migrations, models
+
+
+# Stand der bisher fest im Model hinterlegten Listen (schluessel, label, farbe, icon)
+KATEGORIEN = [
+    ('prozessbeschreibung', 'Prozessbeschreibung', 'info', 'bi-diagram-3'),
+    ('arbeitsanweisung', 'Arbeitsanweisung', 'primary', 'bi-file-text'),
+    ('betriebsanweisung', 'Betriebsanweisung', 'warning', 'bi-shield-check'),
+    ('stellenbeschreibung', 'Stellenbeschreibung', 'success', 'bi-person-badge'),
+    ('formblaetter', 'Formblätter', 'secondary', 'bi-file-earmark-ruled'),
+]
+
+ARBEITSPLAETZE = [
+    ('kalkulation', 'Kalkulation'),
+    ('fertigung', 'Fertigung'),
+    ('lager_versand_wareneingang', 'Lager / Versand / Wareneingang'),
+    ('lasern_stanzen_entgraten', 'Lasern / Stanzen / Entgraten'),
+    ('montage_zerspanen', 'Montage / Zerspanen'),
+    ('qualitaetssicherung', 'Qualitätssicherung'),
+    ('schweissen', 'Schweißen'),
+    ('sonst_handarbeitsplaetze', 'Sonst. Handarbeitsplätze'),
+    ('zerspanen_saegen', 'Zerspanen / Sägen'),
+    ('programmieren', 'Programmieren'),
+    ('konstruktion', 'Konstruktion'),
+]
+
+
+def standardwerte_anlegen(apps, schema_editor):
+    KategorieEintrag = apps.get_model('arbeitsanweisungen', 'KategorieEintrag')
+    ArbeitsplatzEintrag = apps.get_model('arbeitsanweisungen', 'ArbeitsplatzEintrag')
+
+    KategorieEintrag.objects.bulk_create([
+        KategorieEintrag(schluessel=schluessel, label=label, farbe=farbe, icon=icon, bit=i, reihenfolge=i)
+        for i, (schluessel, label, farbe, icon) in enumerate(KATEGORIEN)
+    ])
+    ArbeitsplatzEintrag.objects.bulk_create([
+        ArbeitsplatzEintrag(schluessel=schluessel, label=label, bit=i, reihenfolge=i)
+        for i, (schluessel, label) in enumerate(ARBEITSPLAETZE)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('arbeitsanweisungen', '0006_alter_arbeitsanweisung_revision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArbeitsplatzEintrag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('schluessel', models.SlugField(help_text='Wird in den Arbeitsanweisungen gespeichert, nach Verwendung nicht mehr ändern', unique=True, verbose_name='Schlüssel')),
+                ('label', models.CharField(max_length=100, verbose_name='Bezeichnung')),
+                ('bit', models.PositiveSmallIntegerField(blank=True, help_text='Automatisch vergeben, wenn leer', unique=True, validators=[django.core.validators.MaxValueValidator(62)], verbose_name='Bit-Position')),
+                ('reihenfolge', models.PositiveIntegerField(default=0, verbose_name='Reihenfolge')),
+                ('geaendert_am', models.DateTimeField(auto_now=True, verbose_name='Geändert am')),
+            ],
+            options={
+                'verbose_name': 'Arbeitsplatz',
+                'verbose_name_plural': 'Arbeitsplätze',
+                'ordering': ['reihenfolge', 'schluessel'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='KategorieEintrag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('schluessel', models.SlugField(help_text='Wird in den Arbeitsanweisungen gespeichert, nach Verwendung nicht mehr ändern', unique=True, verbose_name='Schlüssel')),
+                ('label', models.CharField(max_length=100, verbose_name='Bezeichnung')),
+                ('bit', models.PositiveSmallIntegerField(blank=True, help_text='Automatisch vergeben, wenn leer', unique=True, validators=[django.core.validators.MaxValueValidator(62)], verbose_name='Bit-Position')),
+                ('reihenfolge', models.PositiveIntegerField(default=0, verbose_name='Reihenfolge')),
+                ('geaendert_am', models.DateTimeField(auto_now=True, verbose_name='Geändert am')),
+                ('farbe', models.CharField(choices=[('primary', 'Primary (blau)'), ('secondary', 'Secondary (grau)'), ('success', 'Success (grün)'), ('info', 'Info (hellblau)'), ('warning', 'Warning (gelb)'), ('danger', 'Danger (rot)'), ('dark', 'Dark (schwarz)')], default='secondary', max_length=20, verbose_name='Farbe')),
+                ('icon', models.CharField(default='bi-file-text', help_text='Bootstrap-Icon-Klasse, z.B. bi-file-text', max_length=50, verbose_name='Icon')),
+            ],
+            options={
+                'verbose_name': 'Kategorie',
+                'verbose_name_plural': 'Kategorien',
+                'ordering': ['reihenfolge', 'schluessel'],
+                'abstract': False,
+            },
+        ),
+        migrations.AlterField(
+            model_name='arbeitsanweisung',
+            name='kategorie',
+            field=models.CharField(choices=arbeitsanweisungen.stammdaten.kategorie_choices, default='arbeitsanweisung', help_text='Art der Anweisung', max_length=50, verbose_name='Kategorie'),
+        ),
+        migrations.RunPython(standardwerte_anlegen, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.9 on 2026-10-19 14:50
+
+from collections import Counter
+
+from django.db import migrations, models
+
+
+def statistik_aufbauen(apps, schema_editor):
+    """Anfangsbestand aus den vorhandenen Arbeitsanweisungen (ohne Dateiprüfung)"""
+    Arbeitsanweisung = apps.get_model('arbeitsanweisungen', 'Arbeitsanweisung')
+    Statistik = apps.get_model('arbeitsanweisungen', 'Statistik')
+
+    # Stand von statistik.zaehlen() beim Anlegen der Tabelle
+    zaehler = Counter()
+    zeilen = Arbeitsanweisung.objects.order_by().values_list(
+        'kategorie', 'arbeitsplaetze', 'revision', 'datei_pfad').iterator(chunk_size=2000)
+    for kategorie, arbeitsplaetze, revision, datei_pfad in zeilen:
+        zaehler[(kategorie, 'gesamt', '')] += 1
+        zaehler[(kategorie, 'revision', str(revision))] += 1
+        for arbeitsplatz in set(arbeitsplaetze or ()):
+            zaehler[(kategorie, 'arbeitsplatz', arbeitsplatz)] += 1
+        if not datei_pfad:
+            zaehler[(kategorie, 'ohne_datei', '')] += 1
+
+    Statistik.objects.bulk_create([
+        Statistik(kategorie=kategorie, dimension=dimension, wert=wert, anzahl=anzahl)
+        for (kategorie, dimension, wert), anzahl in zaehler.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('arbeitsanweisungen', '0007_stammdaten'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Statistik',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kategorie', models.CharField(max_length=50, verbose_name='Kategorie')),
+                ('dimension', models.CharField(choices=[('gesamt', 'Gesamt'), ('arbeitsplatz', 'Arbeitsplatz'), ('revision', 'Revision'), ('ohne_datei', 'Ohne Datei'), ('datei_fehlt', 'Datei fehlt')], max_length=20, verbose_name='Dimension')),
+                ('wert', models.CharField(blank=True, default='', max_length=100, verbose_name='Wert')),
+                ('anzahl', models.IntegerField(default=0, verbose_name='Anzahl')),
+                ('aktualisiert_am', models.DateTimeField(auto_now=True, verbose_name='Aktualisiert am')),
+            ],
+            options={
+                'verbose_name': 'Statistik',
+                'verbose_name_plural': 'Statistiken',
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'kategorie', 'wert'), name='statistik_eindeutig')],
+            },
+        ),
+        migrations.RunPython(statistik_aufbauen, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.9 on 2026-10-19 14:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('arbeitsanweisungen', '0008_statistik'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='arbeitsanweisung',
+            index=models.Index(fields=['name'], name='aa_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='arbeitsanweisung',
+            index=models.Index(fields=['erstellt_am'], name='aa_erstellt_am_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='arbeitsanweisung',
+            index=models.Index(fields=['kategorie', 'nummer'], name='aa_kategorie_nummer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='arbeitsanweisung',
+            index=models.Index(fields=['kategorie', 'name'], name='aa_kategorie_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='arbeitsanweisung',
+            index=models.Index(fields=['kategorie', 'erstellt_am'], name='aa_kategorie_erstellt_am_idx'),
+        ),
+    ]
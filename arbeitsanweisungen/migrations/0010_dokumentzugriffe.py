@@ -0,0 +1,49 @@
+# Generated by Django 5.2.9 on 2026-10-19 15:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('arbeitsanweisungen', '0009_sortier_indizes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Dokumentzugriff',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('zeitpunkt', models.DateTimeField(verbose_name='Zeitpunkt')),
+                ('nummer', models.IntegerField(verbose_name='AA-Nummer')),
+                ('revision', models.IntegerField(verbose_name='Revision')),
+                ('art', models.CharField(choices=[('download', 'Download'), ('vorschau', 'Vorschau')], max_length=10, verbose_name='Art')),
+                ('benutzer_id', models.IntegerField(blank=True, null=True, verbose_name='Benutzer-ID')),
+                ('benutzername', models.CharField(blank=True, default='', max_length=150, verbose_name='Benutzername')),
+                ('ip', models.GenericIPAddressField(blank=True, null=True, verbose_name='IP-Adresse')),
+            ],
+            options={
+                'verbose_name': 'Dokumentzugriff',
+                'verbose_name_plural': 'Dokumentzugriffe',
+                'indexes': [models.Index(fields=['zeitpunkt'], name='zugriff_zeitpunkt_idx'), models.Index(fields=['nummer', 'zeitpunkt'], name='zugriff_nummer_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ZugriffeProTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.DateField(verbose_name='Tag')),
+                ('nummer', models.IntegerField(verbose_name='AA-Nummer')),
+                ('revision', models.IntegerField(verbose_name='Revision')),
+                ('art', models.CharField(choices=[('download', 'Download'), ('vorschau', 'Vorschau')], max_length=10, verbose_name='Art')),
+                ('anzahl', models.IntegerField(default=0, verbose_name='Anzahl')),
+                ('benutzer', models.IntegerField(default=0, verbose_name='Verschiedene Benutzer')),
+            ],
+            options={
+                'verbose_name': 'Zugriffe pro Tag',
+                'verbose_name_plural': 'Zugriffe pro Tag',
+                'indexes': [models.Index(fields=['nummer', 'tag'], name='zugriffe_tag_nummer_idx')],
+                'constraints': [models.UniqueConstraint(fields=('tag', 'nummer', 'revision', 'art'), name='zugriffe_tag_eindeutig')],
+            },
+        ),
+    ]
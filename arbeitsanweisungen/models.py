@@ -1,41 +1,23 @@
-from django.db import models
-from django.core.validators import MinValueValidator
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.functional import cached_property
+from django.core.validators import MaxValueValidator, MinValueValidator
 
+import logging
 import os
 
+from . import ablage, signale, statistik, vorschau
+from .stammdaten import kategorie_choices, ungueltig_machen, verzeichnis
+
+logger = logging.getLogger(__name__)
+
 
 class Arbeitsanweisung(models.Model):
     """
     Model für Arbeitsanweisungen
     """
 
-    # Vordefinierte Arbeitsplätze
-    ARBEITSPLATZ_CHOICES = [
-
-        ('kalkulation', 'Kalkulation'),
-        ('fertigung', 'Fertigung'),
-        ('lager_versand_wareneingang', 'Lager / Versand / Wareneingang'),
-        ('lasern_stanzen_entgraten', 'Lasern / Stanzen / Entgraten'),
-        ('montage_zerspanen', 'Montage / Zerspanen'),
-        ('qualitaetssicherung', 'Qualitätssicherung'),
-        ('schweissen', 'Schweißen'),
-        ('sonst_handarbeitsplaetze', 'Sonst. Handarbeitsplätze'),
-        ('zerspanen_saegen', 'Zerspanen / Sägen'),
-        ('programmieren', 'Programmieren'),
-        ('konstruktion', 'Konstruktion'),
-
-        # Weitere Arbeitsplätze hier hinzufügen
-    ]
-
-    # Kategorien
-    KATEGORIE_CHOICES = [
-        ('prozessbeschreibung', 'Prozessbeschreibung'),
-        ('arbeitsanweisung', 'Arbeitsanweisung'),
-        ('betriebsanweisung', 'Betriebsanweisung'),
-        ('stellenbeschreibung', 'Stellenbeschreibung'),
-        ('formblaetter', 'Formblätter'),
-    ]
-
     nummer = models.IntegerField(
         unique=True,
         validators=[MinValueValidator(1)],
@@ -57,7 +39,7 @@ class Arbeitsanweisung(models.Model):
 
     kategorie = models.CharField(
         max_length=50,
-        choices=KATEGORIE_CHOICES,
+        choices=kategorie_choices,
         default='arbeitsanweisung',
         verbose_name="Kategorie",
         help_text="Art der Anweisung"
@@ -85,10 +67,27 @@ class Arbeitsanweisung(models.Model):
         verbose_name = "Arbeitsanweisung"
         verbose_name_plural = "Arbeitsanweisungen"
         ordering = ['nummer']
+        # Ein Index je Sortierung der Suche (absteigend nutzt denselben Index rückwärts),
+        # jeweils ohne und mit vorangestellter Kategorie für die Kategorie-Reiter
+        indexes = [
+            models.Index(fields=['name'], name='aa_name_idx'),
+            models.Index(fields=['erstellt_am'], name='aa_erstellt_am_idx'),
+            models.Index(fields=['kategorie', 'nummer'], name='aa_kategorie_nummer_idx'),
+            models.Index(fields=['kategorie', 'name'], name='aa_kategorie_name_idx'),
+            models.Index(fields=['kategorie', 'erstellt_am'], name='aa_kategorie_erstellt_am_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nummer} - {self.name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Stand beim Laden merken, damit save() die Statistik ohne Zusatzabfrage anpassen kann
+        if statistik.FELDER_SET.issubset(field_names):
+            instance._statistik_alt = statistik.werte(instance)
+        return instance
+
     def save(self, *args, **kwargs):
         # Automatische Nummerngenerierung nur bei neuen Objekten
         if not self.pk and not self.nummer:
@@ -97,16 +96,37 @@ class Arbeitsanweisung(models.Model):
                 self.nummer = letzte_anweisung.nummer + 10
             else:
                 self.nummer = 10  # Startwert
-        super().save(*args, **kwargs)
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and statistik.FELDER_SET.isdisjoint(update_fields):
+            super().save(*args, **kwargs)
+            signale.melden([statistik.werte(self)])
+            return
+
+        with transaction.atomic():
+            alt = getattr(self, '_statistik_alt', None)
+            if alt is None and self.pk is not None:
+                alt = Arbeitsanweisung.objects.filter(pk=self.pk).values_list(*statistik.FELDER).first()
+            super().save(*args, **kwargs)
+            neu = statistik.werte(self)
+            statistik.anpassen([alt] if alt else [], [neu])
+            signale.melden([alt] if alt else [], [neu])
+        self._statistik_alt = neu
 
     def delete(self, *args, **kwargs):
         # Datei löschen, wenn Arbeitsanweisung gelöscht wird
-        if self.datei_pfad and os.path.exists(self.datei_pfad):
+        if self.datei_pfad:
             try:
-                os.remove(self.datei_pfad)
+                ablage.loeschen(self.datei_pfad)
             except Exception as e:
-                print(f"Fehler beim Löschen der Datei: {e}")
-        super().delete(*args, **kwargs)
+                logger.warning('Fehler beim Löschen der Datei %s: %s', self.datei_pfad, e)
+
+        with transaction.atomic():
+            alt = getattr(self, '_statistik_alt', None) or statistik.werte(self)
+            ergebnis = super().delete(*args, **kwargs)
+            statistik.anpassen([alt], [])
+            signale.melden([alt])
+        return ergebnis
 
     @property
     def dateiname(self):
@@ -115,51 +135,239 @@ class Arbeitsanweisung(models.Model):
             return os.path.basename(self.datei_pfad)
         return None
 
-    @property
+    @cached_property
     def datei_existiert(self):
-        """Prüft ob die Datei noch existiert"""
+        """Prüft ob die Datei noch existiert (einmal je Instanz)"""
         if self.datei_pfad:
-            return os.path.exists(self.datei_pfad)
+            return ablage.existiert(self.datei_pfad)
         return False
 
+    @staticmethod
+    def dateien_pruefen(arbeitsanweisungen):
+        """
+        Setzt datei_existiert für viele Arbeitsanweisungen auf einmal (mit
+        einem Objektspeicher eine Auflistung statt einer Anfrage je Zeile)
+        """
+        vorhanden = ablage.dateistatus(a.datei_pfad for a in arbeitsanweisungen)
+        for anweisung in arbeitsanweisungen:
+            anweisung.datei_existiert = (
+                bool(anweisung.datei_pfad) and os.path.normpath(anweisung.datei_pfad) in vorhanden)
+
     @property
     def kategorie_badge_farbe(self):
         """Gibt Bootstrap-Farbe für Kategorie-Badge zurück"""
-        farben = {
-            'alle': 'secondary',
-            'prozessbeschreibung': 'info',
-            'arbeitsanweisung': 'primary',
-            'betriebsanweisung': 'warning',
-            'stellenbeschreibung': 'success',
-            'formblaetter': 'secondary'
-        }
-        return farben.get(self.kategorie, 'secondary')
+        return verzeichnis().kategorie(self.kategorie).farbe
 
     @property
     def kategorie_icon(self):
         """Gibt passendes Icon für Kategorie zurück"""
-        icons = {
-            'alle': 'bi-collection',
-            'prozessbeschreibung': 'bi-diagram-3',
-            'arbeitsanweisung': 'bi-file-text',
-            'betriebsanweisung': 'bi-shield-check',
-            'stellenbeschreibung': 'bi-file-text',
-            'formblaetter': 'bi-file-text',
-        }
-        return icons.get(self.kategorie, 'bi-file-text')
+        return verzeichnis().kategorie(self.kategorie).icon
 
     def get_arbeitsplaetze_display(self):
         """Gibt lesbare Namen der Arbeitsplätze zurück"""
         if not self.arbeitsplaetze:
             return "Keine Arbeitsplätze zugewiesen"
 
-        arbeitsplatz_dict = dict(self.ARBEITSPLATZ_CHOICES)
-        return ", ".join([arbeitsplatz_dict.get(ap, ap) for ap in self.arbeitsplaetze])
+        return ", ".join(verzeichnis().arbeitsplatz_labels(self.arbeitsplaetze))
 
     def get_arbeitsplaetze_badges(self):
         """Gibt Liste von Arbeitsplätzen für Badge-Darstellung zurück"""
         if not self.arbeitsplaetze:
             return []
 
-        arbeitsplatz_dict = dict(self.ARBEITSPLATZ_CHOICES)
-        return [arbeitsplatz_dict.get(ap, ap) for ap in self.arbeitsplaetze]
\ No newline at end of file
+        return verzeichnis().arbeitsplatz_labels(self.arbeitsplaetze)
+
+
+class Statistik(models.Model):
+    """
+    Vorberechnete Zähler je Kategorie und Dimension (siehe statistik.py).
+    Wird von Arbeitsanweisung.save()/delete() und den Massenaktionen
+    fortgeschrieben, `manage.py statistik_aufbauen` baut sie neu auf.
+    """
+
+    DIMENSION_CHOICES = [
+        (statistik.GESAMT, 'Gesamt'),
+        (statistik.ARBEITSPLATZ, 'Arbeitsplatz'),
+        (statistik.REVISION, 'Revision'),
+        (statistik.OHNE_DATEI, 'Ohne Datei'),
+        (statistik.DATEI_FEHLT, 'Datei fehlt'),
+    ]
+
+    kategorie = models.CharField(max_length=50, verbose_name="Kategorie")
+    dimension = models.CharField(max_length=20, choices=DIMENSION_CHOICES, verbose_name="Dimension")
+    wert = models.CharField(max_length=100, blank=True, default='', verbose_name="Wert")
+    anzahl = models.IntegerField(default=0, verbose_name="Anzahl")
+    aktualisiert_am = models.DateTimeField(auto_now=True, verbose_name="Aktualisiert am")
+
+    class Meta:
+        verbose_name = "Statistik"
+        verbose_name_plural = "Statistiken"
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'kategorie', 'wert'], name='statistik_eindeutig'),
+        ]
+
+    def __str__(self):
+        return f"{self.kategorie} / {self.dimension} {self.wert}: {self.anzahl}"
+
+
+class StammdatenEintrag(models.Model):
+    """
+    Gemeinsame Felder für Kategorien und Arbeitsplätze. Änderungen werden von
+    stammdaten.verzeichnis() nach wenigen Sekunden übernommen.
+    """
+
+    schluessel = models.SlugField(
+        max_length=50,
+        unique=True,
+        verbose_name="Schlüssel",
+        help_text="Wird in den Arbeitsanweisungen gespeichert, nach Verwendung nicht mehr ändern"
+    )
+
+    label = models.CharField(max_length=100, verbose_name="Bezeichnung")
+
+    bit = models.PositiveSmallIntegerField(
+        unique=True,
+        blank=True,
+        validators=[MaxValueValidator(62)],
+        verbose_name="Bit-Position",
+        help_text="Automatisch vergeben, wenn leer"
+    )
+
+    reihenfolge = models.PositiveIntegerField(default=0, verbose_name="Reihenfolge")
+
+    geaendert_am = models.DateTimeField(auto_now=True, verbose_name="Geändert am")
+
+    class Meta:
+        abstract = True
+        ordering = ['reihenfolge', 'schluessel']
+
+    def __str__(self):
+        return self.label
+
+    def save(self, *args, **kwargs):
+        # Nächste freie Bit-Position vergeben
+        if self.bit is None:
+            hoechstes_bit = type(self).objects.aggregate(models.Max('bit'))['bit__max']
+            self.bit = 0 if hoechstes_bit is None else hoechstes_bit + 1
+        super().save(*args, **kwargs)
+
+
+class KategorieEintrag(StammdatenEintrag):
+    """
+    Kategorie mit Darstellung (Bootstrap-Farbe und -Icon)
+    """
+
+    FARBE_CHOICES = [
+        ('primary', 'Primary (blau)'),
+        ('secondary', 'Secondary (grau)'),
+        ('success', 'Success (grün)'),
+        ('info', 'Info (hellblau)'),
+        ('warning', 'Warning (gelb)'),
+        ('danger', 'Danger (rot)'),
+        ('dark', 'Dark (schwarz)'),
+    ]
+
+    farbe = models.CharField(max_length=20, choices=FARBE_CHOICES, default='secondary', verbose_name="Farbe")
+
+    icon = models.CharField(
+        max_length=50,
+        default='bi-file-text',
+        verbose_name="Icon",
+        help_text="Bootstrap-Icon-Klasse, z.B. bi-file-text"
+    )
+
+    class Meta(StammdatenEintrag.Meta):
+        verbose_name = "Kategorie"
+        verbose_name_plural = "Kategorien"
+
+
+class ArbeitsplatzEintrag(StammdatenEintrag):
+    """
+    Arbeitsplatz / Abteilung
+    """
+
+    class Meta(StammdatenEintrag.Meta):
+        verbose_name = "Arbeitsplatz"
+        verbose_name_plural = "Arbeitsplätze"
+
+
+class Dokumentzugriff(models.Model):
+    """
+    Ein Aufruf einer Datei (Download oder Vorschau) für den Audit-Nachweis.
+
+    Reine Anhänge-Tabelle ohne Fremdschlüssel: Nummer, Revision und Benutzer
+    werden als Werte festgehalten und bleiben auch nach dem Löschen der
+    Arbeitsanweisung oder des Benutzers nachvollziehbar. Abgefragt und
+    aufgeräumt wird immer über Zeiträume von ``zeitpunkt``, die Tabelle lässt
+    sich daher auf PostgreSQL nach Monaten partitionieren. Geschrieben wird
+    gepuffert, siehe zugriffe.py.
+    """
+
+    ART_CHOICES = [
+        ('download', 'Download'),
+        ('vorschau', 'Vorschau'),
+    ]
+
+    zeitpunkt = models.DateTimeField(verbose_name="Zeitpunkt")
+    nummer = models.IntegerField(verbose_name="AA-Nummer")
+    revision = models.IntegerField(verbose_name="Revision")
+    art = models.CharField(max_length=10, choices=ART_CHOICES, verbose_name="Art")
+    benutzer_id = models.IntegerField(null=True, blank=True, verbose_name="Benutzer-ID")
+    benutzername = models.CharField(max_length=150, blank=True, default='', verbose_name="Benutzername")
+    ip = models.GenericIPAddressField(null=True, blank=True, verbose_name="IP-Adresse")
+
+    class Meta:
+        verbose_name = "Dokumentzugriff"
+        verbose_name_plural = "Dokumentzugriffe"
+        indexes = [
+            models.Index(fields=['zeitpunkt'], name='zugriff_zeitpunkt_idx'),
+            models.Index(fields=['nummer', 'zeitpunkt'], name='zugriff_nummer_idx'),
+        ]
+
+    def __str__(self):
+        return f"AA {self.nummer} Rev. {self.revision}: {self.art} {self.benutzername or 'anonym'} {self.zeitpunkt}"
+
+
+class ZugriffeProTag(models.Model):
+    """
+    Verdichtete Aufrufe je Tag, Arbeitsanweisung, Revision und Art
+    (``manage.py zugriffe_verdichten``). Für Auswertungen über lange Zeiträume,
+    ohne die Rohdaten zu lesen.
+    """
+
+    tag = models.DateField(verbose_name="Tag")
+    nummer = models.IntegerField(verbose_name="AA-Nummer")
+    revision = models.IntegerField(verbose_name="Revision")
+    art = models.CharField(max_length=10, choices=Dokumentzugriff.ART_CHOICES, verbose_name="Art")
+    anzahl = models.IntegerField(default=0, verbose_name="Anzahl")
+    benutzer = models.IntegerField(default=0, verbose_name="Verschiedene Benutzer")
+
+    class Meta:
+        verbose_name = "Zugriffe pro Tag"
+        verbose_name_plural = "Zugriffe pro Tag"
+        constraints = [
+            models.UniqueConstraint(fields=['tag', 'nummer', 'revision', 'art'], name='zugriffe_tag_eindeutig'),
+        ]
+        indexes = [
+            models.Index(fields=['nummer', 'tag'], name='zugriffe_tag_nummer_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tag} AA {self.nummer} Rev. {self.revision} {self.art}: {self.anzahl}"
+
+
+@receiver([post_save, post_delete], sender=KategorieEintrag)
+@receiver([post_save, post_delete], sender=ArbeitsplatzEintrag)
+def stammdaten_geaendert(sender, **kwargs):
+    """Eigener Prozess lädt sofort neu, andere Worker nach dem Prüfintervall"""
+    ungueltig_machen()
+    # Bezeichnungen erscheinen auf allen Kiosk-Seiten
+    signale.alle_melden()
+
+
+@receiver(post_save, sender=Arbeitsanweisung)
+def vorschau_vormerken(sender, instance, **kwargs):
+    """Office-Dokumente nach dem Commit im Hintergrund nach PDF konvertieren"""
+    if vorschau.konvertierbar(instance.datei_pfad):
+        pfad = instance.datei_pfad
+        transaction.on_commit(lambda: vorschau.vormerken(pfad))
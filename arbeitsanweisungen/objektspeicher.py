@@ -0,0 +1,201 @@
+"""
+S3-kompatibler Objektspeicher für die Dokument-Dateien (AWS S3, MinIO, ...).
+
+Wird mit DOKUMENTE_SPEICHER=s3 als Storage ``dokumente`` eingetragen (siehe
+ablage.py) und benötigt das Paket boto3.
+
+- Hochladen: ab ``multipart_ab`` Bytes als Multipart-Upload in Teilen von
+  ``teil_groesse`` Bytes, bis zu ``parallele_teile`` gleichzeitig, kleinere
+  Dateien mit einem einzigen PUT
+- Lesen: der Body von GetObject wird blockweise gestreamt, nichts wird
+  vollständig in den Speicher geladen
+- Download: ``download_url()`` liefert eine vorab signierte URL, der Browser
+  lädt direkt aus dem Objektspeicher, ohne einen gunicorn-Worker zu belegen.
+  Liegt der Endpunkt intern (z.B. ``http://minio:9000``), wird mit
+  ``oeffentliche_url`` signiert, unter der der Browser ihn erreicht.
+
+Fehler des Objektspeichers werden als OSError gemeldet (fehlende Objekte als
+FileNotFoundError), wie beim lokalen Storage.
+"""
+import mimetypes
+import os
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files import File
+from django.core.files.storage import Storage
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+from django.utils.http import content_disposition_header
+
+try:
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+    from botocore.config import Config
+    from botocore.exceptions import BotoCoreError, ClientError
+except ImportError:  # optional, nur für DOKUMENTE_SPEICHER=s3
+    boto3 = None
+
+MB = 1024 * 1024
+
+# Fehlercodes für ein fehlendes Objekt (HeadObject liefert nur den HTTP-Status)
+NICHT_GEFUNDEN = frozenset({'404', 'NoSuchKey', 'NotFound'})
+
+
+class S3Datei(File):
+    """Lesender Stream auf ein Objekt, Größe aus der Antwort von GetObject"""
+
+    def __init__(self, body, name, groesse):
+        super().__init__(body, name)
+        self.mode = 'rb'
+        self.size = groesse
+
+
+@deconstructible
+class S3Speicher(Storage):
+
+    def __init__(self, bucket, endpoint_url=None, oeffentliche_url=None, region=None,
+                 access_key=None, secret_key=None, praefix='', url_gueltigkeit=300,
+                 multipart_ab=8 * MB, teil_groesse=8 * MB, parallele_teile=4):
+        if boto3 is None:
+            raise ImproperlyConfigured('DOKUMENTE_SPEICHER=s3 benötigt das Paket boto3.')
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url
+        self.oeffentliche_url = oeffentliche_url
+        self.region = region
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.praefix = f'{praefix.strip("/")}/' if praefix.strip('/') else ''
+        self.url_gueltigkeit = url_gueltigkeit
+        self.transfer = TransferConfig(multipart_threshold=multipart_ab, multipart_chunksize=teil_groesse,
+                                       max_concurrency=parallele_teile)
+        self._clients = {}
+        self._pid = None
+        self._lock = threading.Lock()
+
+    # ========== Verbindung ==========
+
+    def _client(self, endpoint_url):
+        # boto3-Clients sind thread-sicher, aber nicht über einen Fork hinweg
+        # (gunicorn preload_app): nach dem Fork neu anlegen
+        pid = os.getpid()
+        with self._lock:
+            if self._pid != pid:
+                self._clients = {}
+                self._pid = pid
+            client = self._clients.get(endpoint_url)
+            if client is None:
+                client = self._clients[endpoint_url] = boto3.session.Session().client(
+                    's3',
+                    endpoint_url=endpoint_url,
+                    region_name=self.region,
+                    aws_access_key_id=self.access_key,
+                    aws_secret_access_key=self.secret_key,
+                    # Pfad-Adressierung: MinIO und andere S3-Nachbauten kennen keine Bucket-Subdomains
+                    config=Config(signature_version='s3v4', s3={'addressing_style': 'path'},
+                                  retries={'max_attempts': 3, 'mode': 'standard'}),
+                )
+            return client
+
+    @property
+    def client(self):
+        return self._client(self.endpoint_url)
+
+    def _key(self, name):
+        return f'{self.praefix}{name}'
+
+    def _aufrufen(self, name, methode, **kwargs):
+        try:
+            return methode(Bucket=self.bucket, Key=self._key(name), **kwargs)
+        except ClientError as e:
+            code = str(e.response.get('Error', {}).get('Code', ''))
+            if code in NICHT_GEFUNDEN:
+                raise FileNotFoundError(f'{name} nicht im Objektspeicher') from e
+            raise OSError(f'Objektspeicher: {name}: {e}') from e
+        except BotoCoreError as e:
+            raise OSError(f'Objektspeicher: {name}: {e}') from e
+
+    # ========== Storage-API ==========
+
+    def _open(self, name, mode='rb'):
+        if mode != 'rb':
+            raise ValueError('Objekte können nur lesend (rb) geöffnet werden.')
+        antwort = self._aufrufen(name, self.client.get_object)
+        return S3Datei(antwort['Body'], name, antwort['ContentLength'])
+
+    def _save(self, name, content):
+        if getattr(content, 'seekable', lambda: False)():
+            content.seek(0)
+        content_type = getattr(content, 'content_type', None) or mimetypes.guess_type(name)[0]
+        try:
+            # upload_fileobj teilt große Dateien selbst in Multipart-Uploads auf
+            self.client.upload_fileobj(
+                content, self.bucket, self._key(name),
+                ExtraArgs={'ContentType': content_type or 'application/octet-stream'},
+                Config=self.transfer,
+            )
+        except (BotoCoreError, ClientError) as e:
+            raise OSError(f'Objektspeicher: {name}: {e}') from e
+        return name
+
+    def get_available_name(self, name, max_length=None):
+        # Überschreiben wie LokalerSpeicher, eindeutige Namen vergibt das Formular
+        return name
+
+    def delete(self, name):
+        if not name:
+            raise ValueError('Der Name muss für delete() angegeben werden.')
+        self._aufrufen(name, self.client.delete_object)
+
+    def exists(self, name):
+        try:
+            self._aufrufen(name, self.client.head_object)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def kopfdaten(self, name):
+        """(Größe in Bytes, Änderungszeit in ns) mit einer einzigen Anfrage"""
+        kopf = self._aufrufen(name, self.client.head_object)
+        return kopf['ContentLength'], int(kopf['LastModified'].timestamp() * 1_000_000_000)
+
+    def size(self, name):
+        return self.kopfdaten(name)[0]
+
+    def get_modified_time(self, name):
+        geaendert = self._aufrufen(name, self.client.head_object)['LastModified']
+        return geaendert if settings.USE_TZ else timezone.make_naive(geaendert)
+
+    def listdir(self, path):
+        praefix = self._key(f'{path.strip("/")}/' if path.strip('/') else '')
+        verzeichnisse, dateien = [], []
+        for seite in self._seiten(Prefix=praefix, Delimiter='/'):
+            verzeichnisse += [p['Prefix'][len(praefix):].rstrip('/') for p in seite.get('CommonPrefixes', [])]
+            dateien += [o['Key'][len(praefix):] for o in seite.get('Contents', [])]
+        return verzeichnisse, dateien
+
+    def auflisten(self):
+        """(Name, Größe in Bytes, Änderungszeit in ns) aller Objekte unter dem Präfix, 1000 je Anfrage"""
+        for seite in self._seiten(Prefix=self.praefix, Delimiter='/'):
+            for objekt in seite.get('Contents', []):
+                yield (objekt['Key'][len(self.praefix):], objekt['Size'],
+                       int(objekt['LastModified'].timestamp() * 1_000_000_000))
+
+    def _seiten(self, **kwargs):
+        try:
+            yield from self.client.get_paginator('list_objects_v2').paginate(Bucket=self.bucket, **kwargs)
+        except (BotoCoreError, ClientError) as e:
+            raise OSError(f'Objektspeicher: {e}') from e
+
+    def url(self, name):
+        return self.download_url(name)
+
+    def download_url(self, name, dateiname=None, inline=False):
+        """Vorab signierte URL, gültig für url_gueltigkeit Sekunden"""
+        parameter = {'Bucket': self.bucket, 'Key': self._key(name)}
+        if dateiname:
+            parameter['ResponseContentDisposition'] = content_disposition_header(not inline, dateiname)
+        # Signieren ist eine lokale Rechnung, der Client baut dafür keine Verbindung auf
+        client = self._client(self.oeffentliche_url or self.endpoint_url)
+        return client.generate_presigned_url('get_object', Params=parameter, ExpiresIn=self.url_gueltigkeit)
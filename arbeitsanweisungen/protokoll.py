@@ -0,0 +1,123 @@
+"""
+Logging für den Produktivbetrieb.
+
+- ``JsonFormatter``: eine JSON-Zeile pro Eintrag (für Log-Sammler wie Loki
+  oder journald), zusätzliche Felder aus ``extra={...}`` werden übernommen.
+- ``HintergrundHandler``: der aufrufende Thread legt den Eintrag nur in eine
+  Queue, geschrieben wird von einem Hintergrund-Thread. Ein langsames oder
+  blockiertes stderr (Docker-Logtreiber) hält damit keinen Request auf. Ist
+  die Queue voll, werden Einträge verworfen statt zu warten.
+
+Konfiguriert in settings.LOGGING, Level je Logger über LOG_LEVELS.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Attribute jedes LogRecords, alles andere stammt aus extra={...}
+_STANDARD_FELDER = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+
+    def format(self, record):
+        eintrag = {
+            'zeit': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'nachricht': record.getMessage(),
+            'modul': record.module,
+            'zeile': record.lineno,
+            'prozess': record.process,
+            'thread': record.threadName,
+        }
+        for feld, wert in vars(record).items():
+            if feld not in _STANDARD_FELDER and not feld.startswith('_'):
+                eintrag[feld] = wert
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            eintrag['exception'] = record.exc_text
+        if record.stack_info:
+            eintrag['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(eintrag, ensure_ascii=False, default=str)
+
+
+class HintergrundHandler(QueueHandler):
+    """
+    QueueHandler mit eigenem Listener-Thread, der an einen StreamHandler
+    weitergibt. Der Thread startet mit dem ersten Eintrag und nach einem
+    Fork (gunicorn mit preload_app) im Kindprozess neu.
+    """
+
+    def __init__(self, stream=None, max_eintraege=10000):
+        super().__init__(queue.Queue(max_eintraege))
+        self.ziel = logging.StreamHandler(stream)
+        self.verworfen = 0
+        self._listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def setFormatter(self, fmt):
+        # Formatiert wird erst im Hintergrund-Thread
+        self.ziel.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Nachricht und Traceback jetzt auflösen: die Argumente könnten sich bis
+        # zum Schreiben ändern, exc_info ist nicht zwischen Threads teilbar
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self._starten()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.verworfen += 1
+
+    def _starten(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._start_lock:
+            if self._pid == pid:
+                return
+            if self._listener is not None:
+                # Geerbt vom Elternprozess: dessen Thread existiert hier nicht
+                self.queue = queue.Queue(self.queue.maxsize)
+            self._listener = QueueListener(self.queue, self.ziel)
+            self._listener.start()
+            self._pid = pid
+            atexit.register(self.stoppen)
+
+    def stoppen(self):
+        """Schreibt die verbliebenen Einträge und beendet den Thread"""
+        with self._start_lock:
+            if self._listener is None or self._pid != os.getpid():
+                return
+            self._listener.stop()
+            self._listener = None
+            self._pid = None
+        if self.verworfen:
+            self.ziel.handle(logging.makeLogRecord({
+                'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                'msg': '%s Log-Einträge verworfen (Queue voll)', 'args': (self.verworfen,),
+            }))
+            self.verworfen = 0
+
+    def close(self):
+        self.stoppen()
+        self.ziel.close()
+        super().close()
@@ -0,0 +1,29 @@
+"""
+Eigene Signale der Anwendung.
+
+``arbeitsplaetze_geaendert`` wird nach dem Commit gesendet, wenn sich
+Arbeitsanweisungen geändert haben (Speichern, Löschen, Massenaktionen,
+Import). Argument ``arbeitsplaetze``: Menge der betroffenen Arbeitsplatz-
+Schlüssel (alte und neue Zuordnung), ``None`` steht für alle.
+"""
+from django.db import transaction
+from django.dispatch import Signal
+
+arbeitsplaetze_geaendert = Signal()
+
+
+def melden(*zeilen):
+    """
+    Sendet das Signal nach dem Commit für die Arbeitsplätze der übergebenen
+    Arbeitsanweisungen (Zeilen im Format von statistik.FELDER).
+    """
+    arbeitsplaetze = set()
+    for gruppe in zeilen:
+        for zeile in gruppe:
+            arbeitsplaetze.update(zeile[1] or ())
+    if arbeitsplaetze:
+        transaction.on_commit(lambda: arbeitsplaetze_geaendert.send(sender=None, arbeitsplaetze=arbeitsplaetze))
+
+
+def alle_melden():
+    transaction.on_commit(lambda: arbeitsplaetze_geaendert.send(sender=None, arbeitsplaetze=None))
@@ -0,0 +1,153 @@
+"""
+Stammdaten für Kategorien und Arbeitsplätze (Label, Farbe, Icon, Bit-Position).
+
+Das Verzeichnis wird einmal aus den Standardwerten aufgebaut und ist danach
+unveränderlich: Lookups sind reine Dict-Zugriffe. Die Einträge lassen sich im
+Admin pflegen (KategorieEintrag / ArbeitsplatzEintrag). ``verzeichnis()`` prüft
+höchstens alle STAMMDATEN_PRUEFINTERVALL Sekunden, ob sich die Tabellen geändert
+haben, und ersetzt dann das Verzeichnis als Ganzes.
+"""
+import threading
+import time
+from types import MappingProxyType
+from typing import NamedTuple
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Count, Max
+
+
+class Kategorie(NamedTuple):
+    schluessel: str
+    label: str
+    farbe: str
+    icon: str
+    bit: int
+
+
+class Arbeitsplatz(NamedTuple):
+    schluessel: str
+    label: str
+    bit: int
+
+
+# Standardwerte, werden per Datenmigration in die Datenbank übernommen
+STANDARD_KATEGORIEN = (
+    Kategorie('prozessbeschreibung', 'Prozessbeschreibung', 'info', 'bi-diagram-3', 0),
+    Kategorie('arbeitsanweisung', 'Arbeitsanweisung', 'primary', 'bi-file-text', 1),
+    Kategorie('betriebsanweisung', 'Betriebsanweisung', 'warning', 'bi-shield-check', 2),
+    Kategorie('stellenbeschreibung', 'Stellenbeschreibung', 'success', 'bi-person-badge', 3),
+    Kategorie('formblaetter', 'Formblätter', 'secondary', 'bi-file-earmark-ruled', 4),
+)
+
+STANDARD_ARBEITSPLAETZE = (
+    Arbeitsplatz('kalkulation', 'Kalkulation', 0),
+    Arbeitsplatz('fertigung', 'Fertigung', 1),
+    Arbeitsplatz('lager_versand_wareneingang', 'Lager / Versand / Wareneingang', 2),
+    Arbeitsplatz('lasern_stanzen_entgraten', 'Lasern / Stanzen / Entgraten', 3),
+    Arbeitsplatz('montage_zerspanen', 'Montage / Zerspanen', 4),
+    Arbeitsplatz('qualitaetssicherung', 'Qualitätssicherung', 5),
+    Arbeitsplatz('schweissen', 'Schweißen', 6),
+    Arbeitsplatz('sonst_handarbeitsplaetze', 'Sonst. Handarbeitsplätze', 7),
+    Arbeitsplatz('zerspanen_saegen', 'Zerspanen / Sägen', 8),
+    Arbeitsplatz('programmieren', 'Programmieren', 9),
+    Arbeitsplatz('konstruktion', 'Konstruktion', 10),
+)
+
+# Für unbekannte Schlüssel (z.B. gelöschte Kategorie, die noch verwendet wird)
+UNBEKANNTE_FARBE = 'secondary'
+UNBEKANNTES_ICON = 'bi-file-text'
+
+
+class Verzeichnis:
+    """Unveränderliches Verzeichnis aller Kategorien und Arbeitsplätze"""
+
+    __slots__ = ('kategorien', 'arbeitsplaetze', 'kategorie_choices', 'arbeitsplatz_choices',
+                 '_kategorien', '_arbeitsplaetze')
+
+    def __init__(self, kategorien, arbeitsplaetze):
+        self.kategorien = tuple(kategorien)
+        self.arbeitsplaetze = tuple(arbeitsplaetze)
+        self.kategorie_choices = tuple((k.schluessel, k.label) for k in self.kategorien)
+        self.arbeitsplatz_choices = tuple((a.schluessel, a.label) for a in self.arbeitsplaetze)
+        self._kategorien = MappingProxyType({k.schluessel: k for k in self.kategorien})
+        self._arbeitsplaetze = MappingProxyType({a.schluessel: a for a in self.arbeitsplaetze})
+
+    def kategorie(self, schluessel):
+        kategorie = self._kategorien.get(schluessel)
+        if kategorie is None:
+            return Kategorie(schluessel, schluessel, UNBEKANNTE_FARBE, UNBEKANNTES_ICON, -1)
+        return kategorie
+
+    def arbeitsplatz(self, schluessel):
+        arbeitsplatz = self._arbeitsplaetze.get(schluessel)
+        if arbeitsplatz is None:
+            return Arbeitsplatz(schluessel, schluessel, -1)
+        return arbeitsplatz
+
+    def arbeitsplatz_labels(self, schluessel_liste):
+        arbeitsplaetze = self._arbeitsplaetze
+        return [arbeitsplaetze[s].label if s in arbeitsplaetze else s for s in schluessel_liste]
+
+
+_verzeichnis = Verzeichnis(STANDARD_KATEGORIEN, STANDARD_ARBEITSPLAETZE)
+_version = None
+_naechste_pruefung = 0.0
+_lock = threading.Lock()
+
+
+def verzeichnis():
+    """Aktuelles Verzeichnis, lädt Änderungen aus der Datenbank höchstens alle paar Sekunden nach"""
+    global _naechste_pruefung
+
+    jetzt = time.monotonic()
+    if jetzt >= _naechste_pruefung and apps.ready:
+        with _lock:
+            if jetzt >= _naechste_pruefung:
+                _naechste_pruefung = jetzt + getattr(settings, 'STAMMDATEN_PRUEFINTERVALL', 5)
+                _aktualisieren()
+    return _verzeichnis
+
+
+def ungueltig_machen():
+    """Beim nächsten Zugriff erneut prüfen (nach Änderungen im Admin)"""
+    global _naechste_pruefung
+    _naechste_pruefung = 0.0
+
+
+def _aktualisieren():
+    global _verzeichnis, _version
+
+    from .models import ArbeitsplatzEintrag, KategorieEintrag
+
+    try:
+        version = tuple(
+            tuple(model.objects.aggregate(anzahl=Count('pk'), geaendert=Max('geaendert_am')).values())
+            for model in (KategorieEintrag, ArbeitsplatzEintrag)
+        )
+        if version == _version:
+            return
+
+        kategorien = [
+            Kategorie(e.schluessel, e.label, e.farbe, e.icon, e.bit)
+            for e in KategorieEintrag.objects.all()
+        ]
+        arbeitsplaetze = [
+            Arbeitsplatz(e.schluessel, e.label, e.bit)
+            for e in ArbeitsplatzEintrag.objects.all()
+        ]
+    except DatabaseError:
+        # Tabellen noch nicht migriert: bei den Standardwerten bleiben
+        return
+
+    _verzeichnis = Verzeichnis(kategorien or STANDARD_KATEGORIEN, arbeitsplaetze or STANDARD_ARBEITSPLAETZE)
+    _version = version
+
+
+def kategorie_choices():
+    return verzeichnis().kategorie_choices
+
+
+def arbeitsplatz_choices():
+    return verzeichnis().arbeitsplatz_choices
@@ -0,0 +1,46 @@
+"""
+Static-Dateien für den Produktivbetrieb: Dateinamen mit Inhalts-Hash (damit
+nginx sie als ``immutable`` ausliefern darf) und vorkomprimierte Varianten.
+
+``collectstatic`` schreibt zu jeder gehashten Text-Datei eine ``.gz`` für
+``gzip_static`` in nginx. Varianten, die nicht kleiner als das Original sind,
+entfallen. Brotli-Varianten (``.br``) gibt es nicht: ``brotli_static`` braucht
+das Modul ngx_brotli, das im Image nginx:alpine fehlt.
+
+Im Container läuft ``collectstatic`` beim Start (``startvorbereitung``) und
+schreibt in das Volume, das nginx ausliefert.
+"""
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+KOMPRIMIERBAR = ('.css', '.js', '.svg', '.json', '.map', '.txt', '.xml', '.ico')
+
+
+class KomprimierterManifestStorage(ManifestStaticFilesStorage):
+
+    def post_process(self, paths, dry_run=False, **options):
+        gehasht = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                gehasht.add(hashed_name)
+            yield name, hashed_name, processed
+
+        if dry_run:
+            return
+        for hashed_name in sorted(gehasht):
+            if hashed_name.endswith(KOMPRIMIERBAR):
+                self.komprimieren(hashed_name)
+
+    def komprimieren(self, name):
+        pfad = self.path(name)
+        with open(pfad, 'rb') as f:
+            inhalt = f.read()
+        # mtime=0: gleicher Inhalt ergibt byte-identische Archive (reproduzierbare Builds)
+        komprimiert = gzip.compress(inhalt, compresslevel=9, mtime=0)
+        if len(komprimiert) < len(inhalt):
+            with open(pfad + '.gz', 'wb') as f:
+                f.write(komprimiert)
+        elif os.path.exists(pfad + '.gz'):
+            os.remove(pfad + '.gz')
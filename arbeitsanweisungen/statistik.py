@@ -0,0 +1,164 @@
+"""
+Materialisierte Zähler für das Dashboard und die Kategorie-Reiter der Liste.
+
+Jede Arbeitsanweisung zählt je Kategorie in mehreren Dimensionen:
+
+- gesamt        einmal
+- arbeitsplatz  einmal je zugewiesenem Arbeitsplatz
+- revision      einmal für ihren Revisionsstand
+- ohne_datei    wenn kein Dateipfad hinterlegt ist
+- datei_fehlt   Dateipfad hinterlegt, Datei aber nicht vorhanden (nur beim Neuaufbau)
+
+Änderungen werden als Differenz der Zähler vorher/nachher geschrieben, das
+Lesen ist damit unabhängig von der Anzahl der Arbeitsanweisungen.
+"""
+import os
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import ablage
+
+GESAMT = 'gesamt'
+ARBEITSPLATZ = 'arbeitsplatz'
+REVISION = 'revision'
+OHNE_DATEI = 'ohne_datei'
+DATEI_FEHLT = 'datei_fehlt'
+
+# Felder, von denen die Zähler abhängen
+FELDER = ('kategorie', 'arbeitsplaetze', 'revision', 'datei_pfad')
+FELDER_SET = frozenset(FELDER)
+
+
+def werte(anweisung):
+    """Für die Statistik relevanter Stand einer Arbeitsanweisung (Reihenfolge wie FELDER)"""
+    return (anweisung.kategorie, list(anweisung.arbeitsplaetze or ()), anweisung.revision, anweisung.datei_pfad)
+
+
+def zaehlen(zeilen):
+    """Counter der Schlüssel (kategorie, dimension, wert) für Zeilen im Format von FELDER"""
+    zaehler = Counter()
+    for kategorie, arbeitsplaetze, revision, datei_pfad in zeilen:
+        zaehler[(kategorie, GESAMT, '')] += 1
+        zaehler[(kategorie, REVISION, str(revision))] += 1
+        for arbeitsplatz in set(arbeitsplaetze or ()):
+            zaehler[(kategorie, ARBEITSPLATZ, arbeitsplatz)] += 1
+        if not datei_pfad:
+            zaehler[(kategorie, OHNE_DATEI, '')] += 1
+    return zaehler
+
+
+def anpassen(alt, neu):
+    """Schreibt die Differenz zwischen den Zeilen `alt` und `neu` in die Statistik"""
+    differenz = zaehlen(neu)
+    differenz.subtract(zaehlen(alt))
+    for (kategorie, dimension, wert), anzahl in differenz.items():
+        if anzahl:
+            _addieren(kategorie, dimension, wert, anzahl)
+
+
+def _addieren(kategorie, dimension, wert, anzahl):
+    from .models import Statistik
+
+    zeile = Statistik.objects.filter(kategorie=kategorie, dimension=dimension, wert=wert)
+    if zeile.update(anzahl=F('anzahl') + anzahl, aktualisiert_am=timezone.now()):
+        return
+    try:
+        with transaction.atomic():
+            Statistik.objects.create(kategorie=kategorie, dimension=dimension, wert=wert, anzahl=anzahl)
+    except IntegrityError:
+        # Zeile wurde zwischenzeitlich von einem parallelen Request angelegt
+        zeile.update(anzahl=F('anzahl') + anzahl, aktualisiert_am=timezone.now())
+
+
+@contextmanager
+def nachfuehren(queryset):
+    """
+    Für mengenbasierte update()/delete(): liest die betroffenen Zeilen vor und
+    nach der Änderung und schreibt die Differenz. Meldet außerdem die
+    betroffenen Arbeitsplätze (signale.arbeitsplaetze_geaendert). Muss
+    innerhalb einer Transaktion verwendet werden.
+    """
+    from .models import Arbeitsanweisung
+    from .signale import melden
+
+    zeilen = list(queryset.values_list('pk', *FELDER))
+    pks = [zeile[0] for zeile in zeilen]
+    yield
+    neu = list(Arbeitsanweisung.objects.filter(pk__in=pks).values_list(*FELDER)) if pks else []
+    alt = [zeile[1:] for zeile in zeilen]
+    anpassen(alt, neu)
+    melden(alt, neu)
+
+
+def neu_aufbauen(dateien_pruefen=True):
+    """
+    Berechnet alle Zähler neu. Mit `dateien_pruefen` wird zusätzlich gezählt,
+    welche hinterlegten Dateien fehlen (eine Auflistung des Dokument-Storage).
+    """
+    from .models import Arbeitsanweisung, Statistik
+
+    vorhanden = _dateien_in_data_dir() if dateien_pruefen else None
+
+    fehlend = Counter()
+
+    def zeilen():
+        for zeile in Arbeitsanweisung.objects.order_by().values_list(*FELDER).iterator(chunk_size=2000):
+            if vorhanden is not None and zeile[3] and not _datei_vorhanden(zeile[3], vorhanden):
+                fehlend[zeile[0]] += 1
+            yield zeile
+
+    zaehler = zaehlen(zeilen())
+    if vorhanden is not None:
+        # Auch Nullwerte speichern, damit der Zeitpunkt der Prüfung erhalten bleibt
+        for kategorie, _, _ in list(zaehler):
+            zaehler[(kategorie, DATEI_FEHLT, '')] = fehlend[kategorie]
+
+    with transaction.atomic():
+        alte = Statistik.objects.all()
+        if not dateien_pruefen:
+            # Letzten Stand der Dateiprüfung behalten
+            alte = alte.exclude(dimension=DATEI_FEHLT)
+        alte.delete()
+        Statistik.objects.bulk_create([
+            Statistik(kategorie=kategorie, dimension=dimension, wert=wert, anzahl=anzahl)
+            for (kategorie, dimension, wert), anzahl in zaehler.items()
+        ], batch_size=1000)
+    return zaehler
+
+
+def _dateien_in_data_dir():
+    return set(ablage.dateien())
+
+
+def _datei_vorhanden(pfad, vorhanden):
+    if os.path.normpath(pfad) in vorhanden:
+        return True
+    # Dateien außerhalb von DATA_DIR (Altbestand) einzeln prüfen
+    return ablage.name(pfad) is None and ablage.existiert(pfad)
+
+
+def kategorie_zaehler():
+    """{'alle': n, <kategorie>: n} aus der Statistik"""
+    from .models import Statistik
+
+    zaehler = dict(Statistik.objects.filter(dimension=GESAMT).values_list('kategorie', 'anzahl'))
+    zaehler['alle'] = sum(zaehler.values())
+    return zaehler
+
+
+def dashboard():
+    """Alle Zähler gruppiert: {dimension: {kategorie: {wert: anzahl}}} und Stand der Dateiprüfung"""
+    from .models import Statistik
+
+    daten = defaultdict(lambda: defaultdict(dict))
+    datei_pruefung = None
+    for kategorie, dimension, wert, anzahl, aktualisiert_am in Statistik.objects.values_list(
+            'kategorie', 'dimension', 'wert', 'anzahl', 'aktualisiert_am'):
+        daten[dimension][kategorie][wert] = anzahl
+        if dimension == DATEI_FEHLT and (datei_pruefung is None or aktualisiert_am > datei_pruefung):
+            datei_pruefung = aktualisiert_am
+    return daten, datei_pruefung
@@ -0,0 +1,163 @@
+// Service Worker für den Terminal-Modus (wird von Django gerendert, siehe terminal.py)
+//
+// - Static-Dateien: bei der Installation vorgeladen, danach aus dem Cache
+// - Dokumente des Arbeitsplatzes: aus dem Cache, abgeglichen über das Versionsmanifest
+// - Seiten: zuerst Netzwerk, ohne Verbindung die zuletzt geladene Fassung
+
+const ARBEITSPLATZ = new URL(self.location).searchParams.get('arbeitsplatz') || '';
+const STATIC_CACHE = 'aa-static-{{ static_version|escapejs }}';
+const DOKUMENT_CACHE = 'aa-dokumente';
+const SEITEN_CACHE = 'aa-seiten';
+const VERSIONEN_SCHLUESSEL = '/__terminal_versionen__';
+const MANIFEST_URL = '{% url "terminal_versionsmanifest" %}?arbeitsplatz=' + encodeURIComponent(ARBEITSPLATZ);
+const STATIC_DATEIEN = [{% for url in static_urls %}
+    '{{ url|escapejs }}',{% endfor %}
+];
+// Höchstens so oft beim Server nach Änderungen fragen
+const ABGLEICH_INTERVALL_MS = 5 * 60 * 1000;
+
+let letzterAbgleich = 0;
+let laufenderAbgleich = null;
+
+self.addEventListener('install', (event) => {
+    event.waitUntil(
+        caches.open(STATIC_CACHE)
+            .then((cache) => cache.addAll(STATIC_DATEIEN))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', (event) => {
+    event.waitUntil((async () => {
+        for (const name of await caches.keys()) {
+            if (name.startsWith('aa-static-') && name !== STATIC_CACHE) {
+                await caches.delete(name);
+            }
+        }
+        await self.clients.claim();
+        await abgleichen();
+    })());
+});
+
+self.addEventListener('message', (event) => {
+    if (event.data === 'abgleichen') {
+        letzterAbgleich = 0;
+        event.waitUntil(abgleichen());
+    }
+});
+
+async function versionenLesen(cache) {
+    const antwort = await cache.match(VERSIONEN_SCHLUESSEL);
+    return antwort ? antwort.json() : {manifest: null, dokumente: {}};
+}
+
+function abgleichen() {
+    // Mehrere gleichzeitige Auslöser teilen sich einen Abgleich
+    if (!laufenderAbgleich) {
+        laufenderAbgleich = abgleichAusfuehren().finally(() => { laufenderAbgleich = null; });
+    }
+    return laufenderAbgleich;
+}
+
+async function abgleichAusfuehren() {
+    letzterAbgleich = Date.now();
+    let manifest;
+    try {
+        // no-cache: der Browser fragt mit ETag nach, unverändert kommt nur ein 304
+        const antwort = await fetch(MANIFEST_URL, {cache: 'no-cache'});
+        if (!antwort.ok) {
+            return;
+        }
+        manifest = await antwort.json();
+    } catch (fehler) {
+        return;  // offline: beim nächsten Mal
+    }
+
+    const dokumentCache = await caches.open(DOKUMENT_CACHE);
+    const versionen = await versionenLesen(dokumentCache);
+
+    if (versionen.manifest !== manifest.version) {
+        const seitenCache = await caches.open(SEITEN_CACHE);
+        for (const seite of manifest.seiten) {
+            try {
+                const antwort = await fetch(seite, {cache: 'no-cache'});
+                if (antwort.ok) {
+                    await seitenCache.put(seite, antwort);
+                }
+            } catch (fehler) {
+                return;
+            }
+        }
+    }
+
+    // Nur geänderte Dokumente laden, nicht mehr zugewiesene entfernen
+    const aktuell = {};
+    for (const dokument of manifest.dokumente) {
+        aktuell[dokument.url] = dokument.version;
+        if (versionen.dokumente[dokument.url] === dokument.version) {
+            continue;
+        }
+        try {
+            const antwort = await fetch(dokument.url, {cache: 'no-cache'});
+            // 202: Vorschau wird noch erstellt, beim nächsten Abgleich erneut
+            if (antwort.status === 200) {
+                await dokumentCache.put(dokument.url, antwort);
+                versionen.dokumente[dokument.url] = dokument.version;
+            }
+        } catch (fehler) {
+            break;
+        }
+    }
+    for (const url of Object.keys(versionen.dokumente)) {
+        if (!(url in aktuell)) {
+            await dokumentCache.delete(url);
+            delete versionen.dokumente[url];
+        }
+    }
+
+    versionen.manifest = manifest.version;
+    await dokumentCache.put(VERSIONEN_SCHLUESSEL, new Response(JSON.stringify(versionen), {
+        headers: {'Content-Type': 'application/json'},
+    }));
+}
+
+self.addEventListener('fetch', (event) => {
+    const anfrage = event.request;
+    const url = new URL(anfrage.url);
+    if (anfrage.method !== 'GET' || url.origin !== self.location.origin) {
+        return;
+    }
+
+    if (Date.now() - letzterAbgleich > ABGLEICH_INTERVALL_MS) {
+        event.waitUntil(abgleichen());
+    }
+
+    if (STATIC_DATEIEN.includes(url.pathname)) {
+        event.respondWith(caches.match(anfrage).then((treffer) => treffer || fetch(anfrage)));
+        return;
+    }
+
+    event.respondWith((async () => {
+        // Dokumente des Arbeitsplatzes immer lokal (auch beim Öffnen im neuen Tab)
+        const dokument = await caches.match(anfrage, {cacheName: DOKUMENT_CACHE});
+        if (dokument) {
+            return dokument;
+        }
+        return anfrage.mode === 'navigate' ? seiteLaden(anfrage) : fetch(anfrage);
+    })());
+});
+
+async function seiteLaden(anfrage) {
+    try {
+        return await fetch(anfrage);
+    } catch (fehler) {
+        // Offline: gespeicherte Seite oder die Liste des Arbeitsplatzes
+        const treffer = await caches.match(anfrage, {cacheName: SEITEN_CACHE});
+        if (treffer) {
+            return treffer;
+        }
+        const seiten = await caches.open(SEITEN_CACHE);
+        const liste = (await seiten.keys())[0];
+        return liste ? seiten.match(liste) : Response.error();
+    }
+}
@@ -1,5 +1,5 @@
 from django import template
-from ..models import Arbeitsanweisung
+from ..stammdaten import verzeichnis
 
 register = template.Library()
 
@@ -7,8 +7,7 @@ register = template.Library()
 @register.filter
 def get_kategorie_label(key):
     """Gibt das Label einer Kategorie zurück"""
-    kategorie_dict = dict(Arbeitsanweisung.KATEGORIE_CHOICES)
-    return kategorie_dict.get(key, key)
+    return verzeichnis().kategorie(key).label
 
 
 @register.filter
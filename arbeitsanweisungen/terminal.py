@@ -0,0 +1,96 @@
+"""
+Terminal-Modus für die Werkstatt (installierbare PWA).
+
+Ein Terminal wählt einmal seinen Arbeitsplatz, danach hält der Service
+Worker (``/sw.js``) die statischen Dateien, die gefilterte Liste und die
+Dokumente dieses Arbeitsplatzes lokal vor. Abgeglichen wird über das
+Versionsmanifest: je Dokument eine Version aus Revision, Dateigröße und
+Änderungszeit. Der Service Worker lädt nur Dokumente mit geänderter Version
+nach und entfernt nicht mehr zugewiesene.
+"""
+import hashlib
+import os
+
+from django.templatetags.static import static
+from django.urls import reverse
+
+from . import ablage
+from .forms import ArbeitsanweisungSearchForm
+from .models import Arbeitsanweisung
+
+# Vom Service Worker bei der Installation vorgeladen (Pfade relativ zu STATIC_URL)
+STATIC_DATEIEN = (
+    'css/bootstrap.min.css',
+    'css/app.css',
+    'css/liste.css',
+    'bootstrap-icons/bootstrap-icons.min.css',
+    'bootstrap-icons/fonts/bootstrap-icons.woff2',
+    'js/bootstrap.bundle.min.js',
+    'js/liste.js',
+    'images/mueller_logo.png',
+    'images/favicon.ico',
+)
+
+
+def static_urls():
+    return [static(pfad) for pfad in STATIC_DATEIEN]
+
+
+def static_version():
+    """Ändert sich mit den Static-URLs (mit gehashten Dateinamen also mit dem Inhalt)"""
+    return hashlib.sha256('\n'.join(static_urls()).encode()).hexdigest()[:12]
+
+
+def datei_version(anweisung, status=None):
+    """
+    Version der Datei einer Arbeitsanweisung oder None, wenn keine Datei
+    vorhanden ist. `status` aus ablage.dateistatus() spart die Anfrage je Datei.
+    """
+    if status is None:
+        stat = ablage.stat(anweisung.datei_pfad)
+    else:
+        stat = status.get(os.path.normpath(anweisung.datei_pfad)) if anweisung.datei_pfad else None
+    if stat is None:
+        return None
+    groesse, mtime_ns = stat
+    return f'{anweisung.revision}-{groesse}-{mtime_ns}'
+
+
+def versionsmanifest(arbeitsplatz):
+    """
+    Manifest für den Service Worker: Seiten (immer neu laden, wenn sich die
+    Gesamtversion ändert) und Dokumente mit Einzelversion.
+    """
+    form = ArbeitsanweisungSearchForm({'arbeitsplatz': arbeitsplatz})
+    anweisungen = list(form.filter_queryset(Arbeitsanweisung.objects.all()).only(
+        'nummer', 'name', 'revision', 'datei_pfad', 'arbeitsplaetze', 'kategorie'))
+
+    liste_url = reverse('arbeitsanweisung_liste')
+    seiten = [f'{liste_url}?arbeitsplatz={arbeitsplatz}' if arbeitsplatz else liste_url]
+
+    status = ablage.dateistatus(a.datei_pfad for a in anweisungen)
+    dokumente = []
+    for anweisung in anweisungen:
+        version = datei_version(anweisung, status)
+        if version is None:
+            continue
+        dokumente.append({
+            'nummer': anweisung.nummer,
+            'name': anweisung.name,
+            'url': reverse('arbeitsanweisung_datei_preview', args=[anweisung.nummer]),
+            'version': version,
+        })
+
+    gesamt = hashlib.sha256()
+    gesamt.update(static_version().encode())
+    for anweisung in anweisungen:
+        gesamt.update(f'{anweisung.nummer}:{anweisung.name}:{anweisung.kategorie}:{anweisung.revision}\n'.encode())
+    for dokument in dokumente:
+        gesamt.update(f'{dokument["url"]}:{dokument["version"]}\n'.encode())
+
+    return {
+        'version': gesamt.hexdigest()[:16],
+        'arbeitsplatz': arbeitsplatz,
+        'seiten': seiten,
+        'dokumente': dokumente,
+    }
@@ -19,10 +19,25 @@ urlpatterns = [
     path('export/', views.arbeitsanweisung_export_all, name='arbeitsanweisung_export_all'),
     path('import/', views.arbeitsanweisung_import, name='arbeitsanweisung_import'),
 
+    # Statistik-Dashboard
+    path('statistik/', views.arbeitsanweisung_statistik, name='arbeitsanweisung_statistik'),
+
+    # Massenaktionen (Mehrfachauswahl in der Liste)
+    path('massenaktion/', views.arbeitsanweisung_massenaktion, name='arbeitsanweisung_massenaktion'),
+
     # Login / Logout
     path('login/', auth_views.LoginView.as_view(template_name='login.html'), name='login'),
     path('logout/', auth_views.LogoutView.as_view(next_page='arbeitsanweisung_liste'), name='logout'),
 
+    # Performance-Metriken (Prometheus)
+    path('metriken/', views.performance_metriken, name='performance_metriken'),
+
+    # Terminal-Modus (PWA): Service Worker im Wurzelverzeichnis, Manifeste
+    path('terminal/', views.terminal_einrichten, name='terminal_einrichten'),
+    path('terminal/manifest/', views.terminal_versionsmanifest, name='terminal_versionsmanifest'),
+    path('sw.js', views.terminal_service_worker, name='terminal_service_worker'),
+    path('manifest.webmanifest', views.terminal_web_manifest, name='terminal_web_manifest'),
+
     # Preview / Downloads
     path('arbeitsanweisungen/<int:nummer>/preview/', views.arbeitsanweisung_datei_preview, name='arbeitsanweisung_datei_preview'),
 
@@ -5,18 +5,20 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.core.paginator import Paginator
 from django.contrib.auth.decorators import login_required
-from django.http import FileResponse, Http404, HttpResponse
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, JsonResponse
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare
 import os
-import zipfile
-import json
-import tempfile
-import shutil
-from datetime import datetime
-from pathlib import Path
 
 from .models import Arbeitsanweisung
 from .forms import ArbeitsanweisungCreationForm, ArbeitsanweisungChangeForm, ArbeitsanweisungSearchForm, \
-    ArbeitsanweisungImportForm
+    ArbeitsanweisungImportForm, ArbeitsanweisungMassenaktionForm, ArbeitsanweisungExportForm
+from .dateien import dateien_nach_commit_loeschen
+from . import ablage, metriken, statistik, terminal, vorschau, zugriffe
+from .stammdaten import verzeichnis
 
 
 def arbeitsanweisung_liste(request):
@@ -36,23 +38,27 @@ def arbeitsanweisung_liste(request):
         if filtered is not None:
             queryset = filtered
 
-    # Kategorie-Zähler berechnen
-    kategorie_counts = {
-        'alle': queryset.count(),
-    }
-
-    for key, label in Arbeitsanweisung.KATEGORIE_CHOICES:
-        kategorie_counts[key] = queryset.filter(kategorie=key).count()
+    # Kategorie-Zähler: ungefiltert aus der Statistik, sonst mit einer einzigen Abfrage
+    kategorien = verzeichnis().kategorien
+    if form.is_valid() and form.ist_gefiltert():
+        kategorie_counts = queryset.aggregate(
+            alle=Count('pk'),
+            **{k.schluessel: Count('pk', filter=Q(kategorie=k.schluessel)) for k in kategorien},
+        )
+    else:
+        kategorie_counts = statistik.kategorie_zaehler()
 
     # Zu Liste konvertieren für Template
     arbeitsanweisungen = list(queryset)
+    Arbeitsanweisung.dateien_pruefen(arbeitsanweisungen)
     # ==================================================
 
     context = {
         'arbeitsanweisungen': arbeitsanweisungen,
         'form': form,
-        'kategorie_choices': Arbeitsanweisung.KATEGORIE_CHOICES,
+        'kategorien': kategorien,
         'kategorie_counts': kategorie_counts,
+        'massenaktion_form': ArbeitsanweisungMassenaktionForm(),
     }
 
     return render(request, 'arbeitsanweisungen/arbeitsanweisung_liste.html', context)
@@ -166,12 +172,19 @@ def arbeitsanweisung_datei_download(request, nummer):
     """
     arbeitsanweisung = get_object_or_404(Arbeitsanweisung, nummer=nummer)
 
-    if not arbeitsanweisung.datei_pfad or not os.path.exists(arbeitsanweisung.datei_pfad):
+    stat = ablage.stat(arbeitsanweisung.datei_pfad) if arbeitsanweisung.datei_pfad else None
+    if stat is None:
         raise Http404("Datei nicht gefunden")
 
     try:
-        return FileResponse(
-            open(arbeitsanweisung.datei_pfad, 'rb'),
+        zugriffe.erfassen(request, arbeitsanweisung, 'download')
+        # Objektspeicher: der Browser lädt direkt über eine vorab signierte URL
+        url = ablage.download_url(arbeitsanweisung.datei_pfad, arbeitsanweisung.dateiname)
+        if url:
+            return redirect(url)
+        metriken.datei_io(stat[0])
+        return ablage.datei_antwort(
+            arbeitsanweisung.datei_pfad,
             as_attachment=True,
             filename=arbeitsanweisung.dateiname
         )
@@ -183,115 +196,144 @@ def arbeitsanweisung_datei_preview(request, nummer):
     """Vorschau im Browser (inline)"""
     anweisung = get_object_or_404(Arbeitsanweisung, nummer=nummer)
 
-    if not anweisung.datei_pfad or not anweisung.datei_existiert:
+    if not anweisung.datei_pfad:
         raise Http404("Datei nicht gefunden")
 
+    # Office-Dokumente als PDF aus dem Vorschau-Cache
+    if vorschau.konvertierbar(anweisung.datei_pfad) and vorschau.konverter():
+        try:
+            pdf_pfad = vorschau.vorschau_pfad(anweisung.datei_pfad)
+        except FileNotFoundError:
+            raise Http404("Datei nicht gefunden")
+        if pdf_pfad:
+            metriken.datei_io(os.path.getsize(pdf_pfad))
+            zugriffe.erfassen(request, anweisung, 'vorschau')
+            name = os.path.splitext(anweisung.dateiname)[0]
+            response = FileResponse(open(pdf_pfad, 'rb'), content_type='application/pdf')
+            response['Content-Disposition'] = f'inline; filename="{name}.pdf"'
+            return response
+        # Fehlgeschlagen: Hinweis mit Download statt endlosem Neuladen
+        if vorschau.fehlgeschlagen(anweisung.datei_pfad):
+            return render(request, 'arbeitsanweisungen/arbeitsanweisung_vorschau.html',
+                          {'arbeitsanweisung': anweisung, 'fehlgeschlagen': True})
+        try:
+            versuch = max(0, int(request.GET.get('versuch', 0)))
+        except ValueError:
+            versuch = 0
+        naechster_versuch = None
+        if versuch < vorschau.max_versuche():
+            vorschau.vormerken(anweisung.datei_pfad)
+            naechster_versuch = versuch + 1
+        return render(request, 'arbeitsanweisungen/arbeitsanweisung_vorschau.html', {
+            'arbeitsanweisung': anweisung,
+            'naechster_versuch': naechster_versuch,
+            'neu_laden_ms': vorschau.NEU_LADEN_SEKUNDEN * 1000,
+        }, status=202)
+
     content_type, _ = mimetypes.guess_type(anweisung.datei_pfad)
     if content_type is None:
         content_type = 'application/octet-stream'
 
-    with open(anweisung.datei_pfad, 'rb') as f:
-        response = HttpResponse(f.read(), content_type=content_type)
-        response['Content-Disposition'] = f'inline; filename="{anweisung.dateiname}"'
-        return response
+    # Gestreamt aus dem Storage (kein Redirect: der Service Worker der Terminals cacht diese URL)
+    try:
+        response = ablage.datei_antwort(anweisung.datei_pfad, content_type=content_type)
+    except FileNotFoundError:
+        raise Http404("Datei nicht gefunden")
+    metriken.datei_io(int(response['Content-Length']))
+    zugriffe.erfassen(request, anweisung, 'vorschau')
+    response['Content-Disposition'] = f'inline; filename="{anweisung.dateiname}"'
+    return response
 
 
 @login_required
 def arbeitsanweisung_export_all(request):
     """
-    Exportiert alle Arbeitsanweisungen als ZIP-Archiv
+    Exportiert Arbeitsanweisungen als ZIP-Archiv.
+    Ohne Parameter werden alle exportiert, sonst nur die zum Filter der Liste
+    (Suche, Arbeitsplatz, Sortierung, Kategorie-Reiter) passenden.
     """
-    # Alle Arbeitsanweisungen abrufen
-    arbeitsanweisungen = Arbeitsanweisung.objects.all()
+    form = ArbeitsanweisungExportForm(request.GET)
+    if not form.is_valid():
+        messages.error(request, 'Ungültige Filterangaben für den Export.')
+        return redirect('arbeitsanweisung_liste')
+
+    arbeitsanweisungen = form.filter_queryset(Arbeitsanweisung.objects.all())
 
     if not arbeitsanweisungen.exists():
         messages.warning(request, 'Keine Arbeitsanweisungen zum Exportieren vorhanden.')
         return redirect('arbeitsanweisung_liste')
 
-    # Temporäres Verzeichnis erstellen
-    temp_dir = tempfile.mkdtemp()
+    praefix = 'arbeitsanweisungen_export'
+    kategorie = form.cleaned_data.get('kategorie')
+    if kategorie:
+        praefix = f'{praefix}_{kategorie}'
+    if form.cleaned_data.get('arbeitsplatz'):
+        praefix = f"{praefix}_{form.cleaned_data['arbeitsplatz']}"
 
-    try:
-        # JSON-Datei mit Metadaten erstellen
-        metadata = []
-        dateien_dir = os.path.join(temp_dir, 'dateien')
-        os.makedirs(dateien_dir, exist_ok=True)
-
-        for anweisung in arbeitsanweisungen:
-            # Metadaten sammeln
-            meta = {
-                'nummer': anweisung.nummer,
-                'name': anweisung.name,
-                'arbeitsplaetze': anweisung.arbeitsplaetze,
-                'kategorie': anweisung.kategorie,
-                'revision': anweisung.revision,
-                'erstellt_am': anweisung.erstellt_am.isoformat(),
-                'datei_name': None,
-            }
-
-            # Datei kopieren, wenn vorhanden
-            if anweisung.datei_pfad and os.path.exists(anweisung.datei_pfad):
-                original_dateiname = os.path.basename(anweisung.datei_pfad)
-                ziel_dateiname = f"{original_dateiname}"
-                ziel_pfad = os.path.join(dateien_dir, ziel_dateiname)
-
-                shutil.copy2(anweisung.datei_pfad, ziel_pfad)
-                meta['datei_name'] = ziel_dateiname
-
-            metadata.append(meta)
-
-        # Metadaten als JSON speichern
-        metadata_pfad = os.path.join(temp_dir, 'arbeitsanweisungen.json')
-        with open(metadata_pfad, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, ensure_ascii=False, indent=2)
-
-        # README erstellen
-        readme_pfad = os.path.join(temp_dir, 'README.txt')
-        with open(readme_pfad, 'w', encoding='utf-8') as f:
-            f.write('Arbeitsanweisungen Export\n')
-            f.write('=' * 50 + '\n\n')
-            f.write(f'Export-Datum: {datetime.now().strftime("%d.%m.%Y %H:%M:%S")}\n')
-            f.write(f'Anzahl Arbeitsanweisungen: {len(metadata)}\n\n')
-            f.write('Struktur:\n')
-            f.write('- arbeitsanweisungen.json: Metadaten aller Arbeitsanweisungen\n')
-            f.write('- dateien/: Alle zugehörigen Dateien\n\n')
-            f.write('Import:\n')
-            f.write('Verwenden Sie die Import-Funktion in der Arbeitsanweisungen-Verwaltung.\n')
-
-        # ZIP-Archiv erstellen
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        zip_name = f'arbeitsanweisungen_export_{timestamp}.zip'
-        zip_pfad = os.path.join(temp_dir, zip_name)
-
-        with zipfile.ZipFile(zip_pfad, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            # JSON-Datei hinzufügen
-            zipf.write(metadata_pfad, 'arbeitsanweisungen.json')
-
-            # README hinzufügen
-            zipf.write(readme_pfad, 'README.txt')
-
-            # Alle Dateien hinzufügen
-            if os.path.exists(dateien_dir):
-                for datei in os.listdir(dateien_dir):
-                    datei_pfad = os.path.join(dateien_dir, datei)
-                    zipf.write(datei_pfad, os.path.join('dateien', datei))
-
-        # ZIP-Datei als Response zurückgeben
-        with open(zip_pfad, 'rb') as f:
-            response = HttpResponse(f.read(), content_type='application/zip')
-            response['Content-Disposition'] = f'attachment; filename="{zip_name}"'
-
-        messages.success(request, f'{len(metadata)} Arbeitsanweisung(en) erfolgreich exportiert!')
-        return response
+    # Export-Maschinerie erst bei Bedarf laden (selten genutzt)
+    from .export import export_response
 
+    try:
+        response, anzahl = export_response(arbeitsanweisungen, praefix=praefix)
     except Exception as e:
         messages.error(request, f'Fehler beim Export: {str(e)}')
         return redirect('arbeitsanweisung_liste')
 
-    finally:
-        # Temporäres Verzeichnis aufräumen
-        if os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
+    messages.success(request, f'{anzahl} Arbeitsanweisung(en) erfolgreich exportiert!')
+    return response
+
+
+@login_required
+def arbeitsanweisung_massenaktion(request):
+    """
+    Führt eine Aktion für mehrere ausgewählte Arbeitsanweisungen aus.
+    Jede Aktion läuft als mengenbasiertes UPDATE/DELETE in einer Transaktion,
+    Dateien werden erst nach erfolgreichem Commit gesammelt gelöscht.
+    """
+    if request.method != 'POST':
+        return redirect('arbeitsanweisung_liste')
+
+    form = ArbeitsanweisungMassenaktionForm(request.POST)
+    if not form.is_valid():
+        for fehler in form.errors.values():
+            messages.error(request, ' '.join(fehler))
+        return redirect('arbeitsanweisung_liste')
+
+    aktion = form.cleaned_data['aktion']
+    auswahl = Arbeitsanweisung.objects.filter(nummer__in=form.cleaned_data['auswahl'])
+
+    if aktion == 'export':
+        from .export import export_response
+
+        if not auswahl.exists():
+            messages.warning(request, 'Keine Arbeitsanweisungen zum Exportieren vorhanden.')
+            return redirect('arbeitsanweisung_liste')
+        try:
+            response, anzahl = export_response(auswahl, praefix='arbeitsanweisungen_auswahl')
+        except Exception as e:
+            messages.error(request, f'Fehler beim Export: {str(e)}')
+            return redirect('arbeitsanweisung_liste')
+        messages.success(request, f'{anzahl} Arbeitsanweisung(en) erfolgreich exportiert!')
+        return response
+
+    with transaction.atomic(), statistik.nachfuehren(auswahl):
+        if aktion == 'kategorie':
+            anzahl = auswahl.update(kategorie=form.cleaned_data['neue_kategorie'])
+            meldung = f'Kategorie von {anzahl} Arbeitsanweisung(en) geändert.'
+        elif aktion == 'arbeitsplaetze':
+            anzahl = auswahl.update(arbeitsplaetze=form.cleaned_data['neue_arbeitsplaetze'])
+            meldung = f'Arbeitsplätze von {anzahl} Arbeitsanweisung(en) ersetzt.'
+        elif aktion == 'revision':
+            anzahl = auswahl.update(revision=F('revision') + 1)
+            meldung = f'Revision von {anzahl} Arbeitsanweisung(en) erhöht.'
+        else:
+            # Dateipfade vor dem Löschen einsammeln, Dateien erst nach Commit entfernen
+            dateien_nach_commit_loeschen(auswahl.values_list('datei_pfad', flat=True))
+            anzahl, _ = auswahl.delete()
+            meldung = f'{anzahl} Arbeitsanweisung(en) gelöscht.'
+
+    messages.success(request, meldung)
+    return redirect('arbeitsanweisung_liste')
 
 
 @login_required
@@ -303,126 +345,22 @@ def arbeitsanweisung_import(request):
         form = ArbeitsanweisungImportForm(request.POST, request.FILES)
 
         if form.is_valid():
-            zip_datei = form.cleaned_data['zip_datei']
-            ueberschreiben = form.cleaned_data['ueberschreiben']
-
-            # Temporäres Verzeichnis erstellen
-            temp_dir = tempfile.mkdtemp()
+            # Import-Maschinerie erst bei Bedarf laden (selten genutzt)
+            from .importieren import archiv_importieren, UngueltigesArchiv
 
             try:
-                # ZIP-Datei entpacken
-                zip_pfad = os.path.join(temp_dir, 'upload.zip')
-                with open(zip_pfad, 'wb+') as destination:
-                    for chunk in zip_datei.chunks():
-                        destination.write(chunk)
-
-                # ZIP entpacken
-                extract_dir = os.path.join(temp_dir, 'extracted')
-                with zipfile.ZipFile(zip_pfad, 'r') as zip_ref:
-                    zip_ref.extractall(extract_dir)
-
-                # JSON-Datei lesen
-                json_pfad = os.path.join(extract_dir, 'arbeitsanweisungen.json')
-                if not os.path.exists(json_pfad):
-                    messages.error(request, 'Ungültiges Export-Archiv: arbeitsanweisungen.json fehlt.')
-                    return redirect('arbeitsanweisung_import')
-
-                with open(json_pfad, 'r', encoding='utf-8') as f:
-                    metadata = json.load(f)
-
-                # Statistiken
-                erstellt = 0
-                aktualisiert = 0
-                uebersprungen = 0
-                fehler = 0
-
-                # Arbeitsanweisungen importieren
-                dateien_dir = os.path.join(extract_dir, 'dateien')
-                data_dir = os.path.join(settings.BASE_DIR, 'data')
-                os.makedirs(data_dir, exist_ok=True)
-
-                for meta in metadata:
-                    try:
-                        # Prüfe ob Arbeitsanweisung existiert
-                        existiert = Arbeitsanweisung.objects.filter(nummer=meta['nummer']).exists()
-
-                        if existiert and not ueberschreiben:
-                            uebersprungen += 1
-                            continue
-
-                        # Datei kopieren, wenn vorhanden
-                        neuer_datei_pfad = None
-                        if meta.get('datei_name'):
-                            quell_datei = os.path.join(dateien_dir, meta['datei_name'])
-                            if os.path.exists(quell_datei):
-                                # Eindeutigen Dateinamen erstellen
-                                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                                dateiname = f"{meta['datei_name']}"
-                                neuer_datei_pfad = os.path.join(data_dir, dateiname)
-                                shutil.copy2(quell_datei, neuer_datei_pfad)
-
-                        # Arbeitsanweisung erstellen oder aktualisieren
-                        if existiert:
-                            anweisung = Arbeitsanweisung.objects.get(nummer=meta['nummer'])
-
-                            # Alte Datei löschen
-                            if anweisung.datei_pfad and os.path.exists(anweisung.datei_pfad):
-                                try:
-                                    os.remove(anweisung.datei_pfad)
-                                except:
-                                    pass
-
-                            anweisung.name = meta['name']
-                            anweisung.arbeitsplaetze = meta.get('arbeitsplaetze', [])
-                            anweisung.kategorie = meta['kategorie']
-                            anweisung.revision = meta['revision']
-                            anweisung.datei_pfad = neuer_datei_pfad
-                            anweisung.save()
-                            aktualisiert += 1
-                        else:
-                            anweisung = Arbeitsanweisung.objects.create(
-                                nummer=meta['nummer'],
-                                name=meta['name'],
-                                revision=meta['revision'],
-                                arbeitsplaetze=meta.get('arbeitsplaetze', []),
-                                kategorie=meta['kategorie'],
-                                datei_pfad=neuer_datei_pfad
-                            )
-                            erstellt += 1
-
-                    except Exception as e:
-                        fehler += 1
-                        print(f"Fehler beim Import von AA {meta['nummer']}: {str(e)}")
-
-                # Erfolgsmeldung
-                meldung_teile = []
-                if erstellt > 0:
-                    meldung_teile.append(f'{erstellt} neu erstellt')
-                if aktualisiert > 0:
-                    meldung_teile.append(f'{aktualisiert} aktualisiert')
-                if uebersprungen > 0:
-                    meldung_teile.append(f'{uebersprungen} übersprungen')
-                if fehler > 0:
-                    meldung_teile.append(f'{fehler} Fehler')
-
-                if erstellt > 0 or aktualisiert > 0:
-                    messages.success(request, f'Import abgeschlossen: {", ".join(meldung_teile)}')
-                else:
-                    messages.warning(request, f'Import abgeschlossen: {", ".join(meldung_teile)}')
-
-                return redirect('arbeitsanweisung_liste')
-
-            except json.JSONDecodeError:
-                messages.error(request, 'Ungültiges Export-Archiv: JSON-Datei ist beschädigt.')
-            except zipfile.BadZipFile:
-                messages.error(request, 'Ungültige ZIP-Datei.')
+                ergebnis = archiv_importieren(form.cleaned_data['zip_datei'], form.cleaned_data['ueberschreiben'],
+                                              pruefen=form.cleaned_data['pruefen'])
+            except UngueltigesArchiv as e:
+                messages.error(request, str(e))
             except Exception as e:
                 messages.error(request, f'Fehler beim Import: {str(e)}')
-
-            finally:
-                # Temporäres Verzeichnis aufräumen
-                if os.path.exists(temp_dir):
-                    shutil.rmtree(temp_dir)
+            else:
+                if ergebnis.erstellt > 0 or ergebnis.aktualisiert > 0:
+                    messages.success(request, ergebnis.meldung())
+                else:
+                    messages.warning(request, ergebnis.meldung())
+                return redirect('arbeitsanweisung_liste')
 
             return redirect('arbeitsanweisung_import')
     else:
@@ -432,4 +370,118 @@ def arbeitsanweisung_import(request):
         'form': form,
         'title': 'Arbeitsanweisungen importieren',
     }
-    return render(request, 'arbeitsanweisungen/arbeitsanweisung_import.html', context)
\ No newline at end of file
+    return render(request, 'arbeitsanweisungen/arbeitsanweisung_import.html', context)
+
+
+@login_required
+def arbeitsanweisung_statistik(request):
+    """
+    Dashboard: Arbeitsanweisungen je Kategorie × Arbeitsplatz, je Revisionsstand
+    und ohne bzw. mit fehlender Datei. Liest nur die vorberechnete Statistik.
+    """
+    daten, datei_pruefung = statistik.dashboard()
+    stammdaten = verzeichnis()
+
+    # Registrierte Kategorien zuerst, danach evtl. nicht mehr registrierte mit Bestand
+    schluessel = [k.schluessel for k in stammdaten.kategorien]
+    schluessel += sorted(set(daten[statistik.GESAMT]) - set(schluessel))
+    kategorien = [stammdaten.kategorie(k) for k in schluessel]
+
+    def zeile(label, dimension, wert):
+        werte = [daten[dimension].get(k, {}).get(wert, 0) for k in schluessel]
+        return {'label': label, 'werte': werte, 'summe': sum(werte)}
+
+    arbeitsplatz_werte = {wert for werte in daten[statistik.ARBEITSPLATZ].values() for wert in werte}
+    arbeitsplatz_zeilen = [zeile(a.label, statistik.ARBEITSPLATZ, a.schluessel) for a in stammdaten.arbeitsplaetze]
+    arbeitsplatz_zeilen += [zeile(stammdaten.arbeitsplatz(w).label, statistik.ARBEITSPLATZ, w)
+                            for w in sorted(arbeitsplatz_werte - {a.schluessel for a in stammdaten.arbeitsplaetze})]
+
+    revisionen = sorted({wert for werte in daten[statistik.REVISION].values() for wert in werte}, key=int)
+
+    context = {
+        'title': 'Statistik',
+        'kategorien': kategorien,
+        'gesamt': zeile('Gesamt', statistik.GESAMT, ''),
+        'arbeitsplatz_zeilen': arbeitsplatz_zeilen,
+        'revision_zeilen': [zeile(f'Revision {r}', statistik.REVISION, r) for r in revisionen],
+        'ohne_datei': zeile('Ohne Datei', statistik.OHNE_DATEI, ''),
+        'datei_fehlt': zeile('Datei fehlt', statistik.DATEI_FEHLT, ''),
+        'datei_pruefung': datei_pruefung,
+    }
+    return render(request, 'arbeitsanweisungen/arbeitsanweisung_statistik.html', context)
+
+
+def performance_metriken(request):
+    """
+    Performance-Metriken im Prometheus-Textformat.
+    Zugriff mit 'Authorization: Bearer <PERFORMANCE_METRICS_TOKEN>' oder als Staff-Benutzer.
+    """
+    token = settings.PERFORMANCE_METRICS_TOKEN
+    authorization = request.headers.get('Authorization', '')
+    token_gueltig = bool(token) and constant_time_compare(authorization, f'Bearer {token}')
+
+    if not token_gueltig and not request.user.is_staff:
+        return HttpResponse('Nicht berechtigt\n', status=403, content_type='text/plain')
+
+    return HttpResponse(metriken.prometheus_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# ========== Terminal-Modus (PWA) ==========
+
+def terminal_einrichten(request):
+    """
+    Einrichtung eines Werkstatt-Terminals: Arbeitsplatz wählen, der Service
+    Worker hält danach dessen Dokumente offline vor.
+    """
+    context = {
+        'title': 'Terminal-Modus',
+        'arbeitsplaetze': verzeichnis().arbeitsplaetze,
+    }
+    return render(request, 'arbeitsanweisungen/arbeitsanweisung_terminal.html', context)
+
+
+def terminal_service_worker(request):
+    """Service Worker unter /sw.js, damit sein Geltungsbereich die ganze Anwendung umfasst"""
+    context = {
+        'static_urls': terminal.static_urls(),
+        'static_version': terminal.static_version(),
+    }
+    response = render(request, 'arbeitsanweisungen/sw.js', context, content_type='application/javascript')
+    response['Cache-Control'] = 'no-cache'
+    response['Service-Worker-Allowed'] = '/'
+    return response
+
+
+def terminal_web_manifest(request):
+    """Web App Manifest, macht die Anwendung auf den Terminals installierbar"""
+    manifest = {
+        'name': 'Arbeitsanweisungen',
+        'short_name': 'Anweisungen',
+        'start_url': reverse('arbeitsanweisung_liste'),
+        'scope': '/',
+        'display': 'standalone',
+        'background_color': '#ffffff',
+        'theme_color': '#212529',
+        'icons': [{'src': static('images/mueller_logo.png'), 'type': 'image/png', 'sizes': 'any'}],
+    }
+    return JsonResponse(manifest, content_type='application/manifest+json', json_dumps_params={'ensure_ascii': False})
+
+
+def terminal_versionsmanifest(request):
+    """
+    Versionen der Seiten und Dokumente eines Arbeitsplatzes für den Service
+    Worker. Mit ETag: unverändert antwortet 304 ohne Inhalt.
+    """
+    arbeitsplatz = request.GET.get('arbeitsplatz', '')
+    if arbeitsplatz and arbeitsplatz not in {a.schluessel for a in verzeichnis().arbeitsplaetze}:
+        return JsonResponse({'fehler': 'Unbekannter Arbeitsplatz'}, status=400)
+
+    manifest = terminal.versionsmanifest(arbeitsplatz)
+    etag = f'"{manifest["version"]}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = JsonResponse(manifest, json_dumps_params={'ensure_ascii': False})
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
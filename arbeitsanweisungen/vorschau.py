@@ -0,0 +1,256 @@
+"""
+PDF-Vorschau für Office-Dokumente (DOC/DOCX/XLS/XLSX/...).
+
+Browser können Office-Dateien nicht inline anzeigen. Die Dateien werden daher
+mit einem lokalen Konverter (LibreOffice headless) nach PDF gerendert. Jede
+Fassung wird nur einmal je Inhalts-Hash konvertiert und in VORSCHAU_CACHE_DIR
+abgelegt (außerhalb von DATA_DIR). Der Cache ist auf VORSCHAU_CACHE_MAX_MB
+begrenzt, bei Überschreitung werden die am längsten nicht genutzten
+Vorschauen gelöscht (LRU über die Änderungszeit, die bei jedem Treffer neu
+gesetzt wird).
+
+Konvertiert wird außerhalb des Requests: nach dem Speichern einer Arbeits-
+anweisung in einem Hintergrund-Thread, für den Bestand mit
+``manage.py vorschau_erzeugen``. Schlägt die Konvertierung fehl, merkt sich
+eine Marke ``<hash>.fehler`` neben dem Cache-Eintrag das für
+VORSCHAU_FEHLER_SEKUNDEN, damit eine defekte Datei nicht bei jedem Aufruf
+erneut LibreOffice startet.
+"""
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+
+from . import ablage
+
+logger = logging.getLogger(__name__)
+
+KONVERTIERBAR = frozenset({'.doc', '.docx', '.odt', '.rtf', '.xls', '.xlsx', '.ods', '.ppt', '.pptx', '.odp'})
+
+# Sperrdateien älter als das gelten als verwaist (Prozess abgestürzt)
+SPERRE_MAX_ALTER = 600
+
+# Die Warteseite lädt in diesem Abstand neu, höchstens max_versuche() mal
+NEU_LADEN_SEKUNDEN = 3
+
+_executor = None
+_executor_lock = threading.Lock()
+_vorgemerkt = set()
+
+
+def konvertierbar(pfad):
+    return bool(pfad) and os.path.splitext(pfad)[1].lower() in KONVERTIERBAR
+
+
+def konverter():
+    """Pfad zum Konverter oder None, wenn keiner installiert ist"""
+    return settings.VORSCHAU_KONVERTER or shutil.which('soffice') or shutil.which('libreoffice')
+
+
+def inhalt_hash(pfad):
+    """SHA-256 des Dateiinhalts, je Pfad/Größe/Änderungszeit nur einmal berechnet"""
+    stat = ablage.stat(pfad)
+    if stat is None:
+        raise FileNotFoundError(pfad)
+    return _hash(pfad, *stat)
+
+
+@lru_cache(maxsize=4096)
+def _hash(pfad, groesse, mtime_ns):
+    hash_wert = hashlib.sha256()
+    with ablage.oeffnen(pfad) as f:
+        while block := f.read(1024 * 1024):
+            hash_wert.update(block)
+    return hash_wert.hexdigest()
+
+
+def cache_pfad(hash_wert):
+    return os.path.join(settings.VORSCHAU_CACHE_DIR, hash_wert[:2], f'{hash_wert}.pdf')
+
+
+def fehler_pfad(hash_wert):
+    return os.path.join(settings.VORSCHAU_CACHE_DIR, hash_wert[:2], f'{hash_wert}.fehler')
+
+
+def fehlgeschlagen(pfad):
+    """True, wenn die Konvertierung dieser Fassung vor kurzem fehlgeschlagen ist"""
+    return _fehler_aktuell(fehler_pfad(inhalt_hash(pfad)))
+
+
+def _fehler_aktuell(marke):
+    try:
+        return time.time() - os.path.getmtime(marke) < settings.VORSCHAU_FEHLER_SEKUNDEN
+    except FileNotFoundError:
+        return False
+
+
+def _fehler_merken(marke, pfad, grund):
+    logger.warning('Fehler bei der Vorschau von %s: %s', pfad, grund)
+    with open(marke, 'w') as f:
+        f.write(f'{grund}\n')
+
+
+def max_versuche():
+    """Neuladen der Warteseite, bis eine Konvertierung spätestens beendet ist"""
+    return settings.VORSCHAU_TIMEOUT // NEU_LADEN_SEKUNDEN + 2
+
+
+def vorschau_pfad(pfad):
+    """
+    Pfad der fertigen PDF-Vorschau für die Datei `pfad` oder None.
+    Ein Treffer zählt als Zugriff für die LRU-Verdrängung.
+    """
+    ziel = cache_pfad(inhalt_hash(pfad))
+    try:
+        os.utime(ziel)
+    except FileNotFoundError:
+        return None
+    return ziel
+
+
+def erzeugen(pfad):
+    """
+    Konvertiert `pfad` nach PDF in den Cache (synchron), sofern noch nicht
+    vorhanden. Gibt den Pfad der Vorschau zurück oder None, wenn die
+    Konvertierung nicht möglich war (oder vor kurzem fehlgeschlagen ist).
+    """
+    programm = konverter()
+    if not programm or not konvertierbar(pfad) or not ablage.existiert(pfad):
+        return None
+
+    hash_wert = inhalt_hash(pfad)
+    ziel = cache_pfad(hash_wert)
+    if os.path.exists(ziel):
+        return ziel
+    marke = fehler_pfad(hash_wert)
+    if _fehler_aktuell(marke):
+        return None
+    os.makedirs(os.path.dirname(ziel), exist_ok=True)
+
+    # Sperre über Prozessgrenzen hinweg (mehrere gunicorn-Worker)
+    sperre = f'{ziel}.lock'
+    if not _sperren(sperre):
+        return None
+    try:
+        # Der Konverter braucht eine Datei im Dateisystem (aus einem Objektspeicher als Kopie)
+        with tempfile.TemporaryDirectory(prefix='vorschau_') as arbeitsverzeichnis, \
+                ablage.lokale_datei(pfad) as quelle:
+            # Eigenes Profil je Aufruf, sonst blockieren sich parallele LibreOffice-Instanzen
+            profil = f'-env:UserInstallation=file://{os.path.join(arbeitsverzeichnis, "profil")}'
+            try:
+                subprocess.run(
+                    [programm, profil, '--headless', '--convert-to', 'pdf', '--outdir', arbeitsverzeichnis, quelle],
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                    timeout=settings.VORSCHAU_TIMEOUT, check=True,
+                )
+            except (OSError, subprocess.SubprocessError) as e:
+                _fehler_merken(marke, pfad, e)
+                return None
+
+            ergebnis = os.path.join(arbeitsverzeichnis, os.path.splitext(os.path.basename(pfad))[0] + '.pdf')
+            if not os.path.exists(ergebnis):
+                _fehler_merken(marke, pfad, 'Konverter hat kein PDF erzeugt')
+                return None
+            shutil.move(ergebnis, f'{ziel}.tmp')
+            os.replace(f'{ziel}.tmp', ziel)
+    finally:
+        os.remove(sperre)
+
+    # Abgelaufene Marke eines früheren Fehlschlags
+    try:
+        os.remove(marke)
+    except FileNotFoundError:
+        pass
+
+    aufraeumen()
+    return ziel
+
+
+def _sperren(sperre):
+    try:
+        os.close(os.open(sperre, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        try:
+            if time.time() - os.path.getmtime(sperre) < SPERRE_MAX_ALTER:
+                return False
+            os.remove(sperre)
+        except FileNotFoundError:
+            pass
+        return _sperren(sperre)
+
+
+def vormerken(pfad):
+    """Konvertiert `pfad` im Hintergrund (ein Thread je Prozess, Doppelte werden ignoriert)"""
+    global _executor
+
+    if not konvertierbar(pfad) or not konverter():
+        return
+    with _executor_lock:
+        if pfad in _vorgemerkt:
+            return
+        _vorgemerkt.add(pfad)
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='vorschau')
+    _executor.submit(_hintergrund, pfad)
+
+
+def _hintergrund(pfad):
+    try:
+        erzeugen(pfad)
+    except Exception:
+        logger.exception('Fehler bei der Vorschau von %s', pfad)
+    finally:
+        with _executor_lock:
+            _vorgemerkt.discard(pfad)
+
+
+def aufraeumen(max_bytes=None):
+    """
+    Löscht die am längsten nicht genutzten Vorschauen, bis der Cache unter
+    90 % von VORSCHAU_CACHE_MAX_MB liegt, und abgelaufene Fehler-Marken. Gibt
+    die Anzahl gelöschter Vorschauen zurück.
+    """
+    if max_bytes is None:
+        max_bytes = settings.VORSCHAU_CACHE_MAX_MB * 1024 * 1024
+    cache_dir = settings.VORSCHAU_CACHE_DIR
+    if not os.path.isdir(cache_dir):
+        return 0
+
+    eintraege = []
+    for unterverzeichnis in os.scandir(cache_dir):
+        if not unterverzeichnis.is_dir():
+            continue
+        for eintrag in os.scandir(unterverzeichnis.path):
+            if eintrag.name.endswith('.pdf') and eintrag.is_file():
+                stat = eintrag.stat()
+                eintraege.append((stat.st_mtime, stat.st_size, eintrag.path))
+            elif eintrag.name.endswith('.fehler') and not _fehler_aktuell(eintrag.path):
+                try:
+                    os.remove(eintrag.path)
+                except FileNotFoundError:
+                    pass
+
+    belegt = sum(groesse for _, groesse, _ in eintraege)
+    if belegt <= max_bytes:
+        return 0
+
+    geloescht = 0
+    for _, groesse, pfad in sorted(eintraege):
+        if belegt <= max_bytes * 0.9:
+            break
+        try:
+            os.remove(pfad)
+        except FileNotFoundError:
+            pass
+        belegt -= groesse
+        geloescht += 1
+    return geloescht
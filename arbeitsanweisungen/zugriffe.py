@@ -0,0 +1,181 @@
+"""
+Gepuffertes Zugriffsprotokoll für Downloads und Vorschauen (Audit-Nachweis).
+
+Ein INSERT je Aufruf würde die Schreiblast der meistgenutzten Endpunkte
+verdoppeln. ``erfassen()`` legt den Aufruf daher nur in einen Puffer im
+Prozess. Ein Hintergrund-Thread schreibt ihn per ``bulk_create``, sobald
+ZUGRIFF_PUFFER_GROESSE Einträge vorliegen oder spätestens alle
+ZUGRIFF_PUFFER_SEKUNDEN. Mit ZUGRIFF_PUFFER_SEKUNDEN = 0 gibt es keinen
+Thread, der aufrufende Request schreibt bei vollem Puffer selbst. In beiden
+Fällen wird der Rest beim Beenden des Prozesses geschrieben (auch wenn
+gunicorn den Worker nach max_requests ersetzt).
+
+Bei einem Absturz des Prozesses gehen höchstens die Einträge der letzten
+Sekunden verloren. ``manage.py zugriffe_verdichten`` fasst die Rohdaten zu
+Tageszahlen zusammen.
+"""
+import atexit
+import logging
+import os
+import threading
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+
+from .models import Dokumentzugriff, ZugriffeProTag
+
+logger = logging.getLogger(__name__)
+
+_puffer = []
+_lock = threading.Lock()
+_signal = threading.Event()
+_thread = None
+# Prozess, für den Puffer und atexit eingerichtet sind bzw. der Thread läuft
+_pid = None
+_thread_pid = None
+
+
+def _client_ip(request):
+    # Hinter nginx steht die Adresse des Clients in X-Real-IP
+    return request.META.get('HTTP_X_REAL_IP') or request.META.get('REMOTE_ADDR') or None
+
+
+def erfassen(request, anweisung, art):
+    """Merkt einen Aufruf vor, geschrieben wird gesammelt"""
+    user = getattr(request, 'user', None)
+    angemeldet = user is not None and user.is_authenticated
+    zugriff = Dokumentzugriff(
+        zeitpunkt=timezone.now(),
+        nummer=anweisung.nummer,
+        revision=anweisung.revision,
+        art=art,
+        benutzer_id=user.pk if angemeldet else None,
+        benutzername=user.get_username() if angemeldet else '',
+        ip=_client_ip(request),
+    )
+
+    _prozess_vorbereiten()
+    with _lock:
+        _puffer.append(zugriff)
+        voll = len(_puffer) >= settings.ZUGRIFF_PUFFER_GROESSE
+
+    if settings.ZUGRIFF_PUFFER_SEKUNDEN <= 0:
+        if voll:
+            leeren()
+        return
+    _thread_starten()
+    if voll:
+        _signal.set()
+
+
+def leeren():
+    """Schreibt alle gepufferten Aufrufe, gibt ihre Anzahl zurück"""
+    global _puffer
+    with _lock:
+        zugriffe, _puffer = _puffer, []
+    if not zugriffe:
+        return 0
+    try:
+        Dokumentzugriff.objects.bulk_create(zugriffe, batch_size=500)
+    except Exception:
+        logger.exception('%s Dokumentzugriffe konnten nicht gespeichert werden', len(zugriffe))
+        return 0
+    return len(zugriffe)
+
+
+def _schreiben():
+    while True:
+        _signal.wait(settings.ZUGRIFF_PUFFER_SEKUNDEN)
+        _signal.clear()
+        leeren()
+        # Eigene Verbindung des Threads nicht über die Lebensdauer hinaus offen halten
+        connections.close_all()
+
+
+def _prozess_vorbereiten():
+    """Einmal je Prozess, in beiden Modi: Rest des Puffers beim Beenden schreiben"""
+    global _pid, _puffer
+    pid = os.getpid()
+    if _pid == pid:
+        return
+    with _lock:
+        if _pid == pid:
+            return
+        if _pid is not None:
+            # Nach dem Fork (gunicorn preload_app): Puffer gehört dem Elternprozess
+            _puffer = []
+        _pid = pid
+    atexit.register(leeren)
+
+
+def _thread_starten():
+    global _thread, _thread_pid
+    pid = os.getpid()
+    if _thread_pid == pid:
+        return
+    with _lock:
+        if _thread_pid == pid:
+            return
+        _thread = threading.Thread(target=_schreiben, name='zugriffe', daemon=True)
+        _thread.start()
+        _thread_pid = pid
+
+
+def verdichten(von=None, bis=None):
+    """
+    Berechnet die Tageszahlen für die Tage von ``von`` bis ``bis`` (jeweils
+    einschließlich) neu. Ohne ``von`` ab dem letzten bereits verdichteten
+    Tag (der beim letzten Lauf evtl. noch nicht vollständig war), ohne ``bis``
+    bis heute. Gibt die Anzahl geschriebener Tageszeilen zurück.
+    """
+    if von is None:
+        von = ZugriffeProTag.objects.aggregate(Max('tag'))['tag__max']
+    if von is None:
+        erster = Dokumentzugriff.objects.aggregate(Min('zeitpunkt'))['zeitpunkt__min']
+        if erster is None:
+            return 0
+        von = timezone.localdate(erster)
+    if bis is None:
+        bis = timezone.localdate()
+
+    geschrieben = 0
+    tag = von
+    while tag <= bis:
+        # Tag für Tag: jede Abfrage liest nur einen Bereich von zeitpunkt
+        beginn = timezone.make_aware(datetime.combine(tag, time.min))
+        zeilen = (
+            Dokumentzugriff.objects
+            .filter(zeitpunkt__gte=beginn, zeitpunkt__lt=beginn + timedelta(days=1))
+            .order_by()
+            .values('nummer', 'revision', 'art')
+            .annotate(anzahl=Count('id'), benutzer=Count('benutzer_id', distinct=True))
+        )
+        with transaction.atomic():
+            ZugriffeProTag.objects.filter(tag=tag).delete()
+            geschrieben += len(ZugriffeProTag.objects.bulk_create(
+                [ZugriffeProTag(tag=tag, **zeile) for zeile in zeilen], batch_size=1000))
+        tag += timedelta(days=1)
+    return geschrieben
+
+
+def rohdaten_loeschen(aelter_als_tage, batch_groesse=5000):
+    """
+    Löscht Rohdaten vor dem Stichtag in Batches. Nur bereits verdichtete Tage,
+    gibt die Anzahl gelöschter Zeilen zurück.
+    """
+    letzter = ZugriffeProTag.objects.aggregate(Max('tag'))['tag__max']
+    if letzter is None:
+        return 0
+    stichtag = min(timezone.localdate() - timedelta(days=aelter_als_tage), letzter)
+    grenze = timezone.make_aware(datetime.combine(stichtag, time.min))
+
+    geloescht = 0
+    while True:
+        pks = list(Dokumentzugriff.objects.filter(zeitpunkt__lt=grenze)
+                   .order_by().values_list('pk', flat=True)[:batch_groesse])
+        if not pks:
+            return geloescht
+        geloescht += Dokumentzugriff.objects.filter(pk__in=pks).delete()[0]
@@ -0,0 +1,189 @@
+    // Counter für ausgewählte Arbeitsplätze aktualisieren
+    function updateArbeitsplaetzeCounter() {
+        const checkboxes = document.querySelectorAll('input[name="arbeitsplaetze"]:checked');
+        const counter = document.getElementById('arbeitsplaetzeCounter');
+        const count = checkboxes.length;
+
+        if (count > 0) {
+            counter.textContent = count;
+            counter.style.display = 'inline-block';
+        } else {
+            counter.style.display = 'none';
+        }
+    }
+
+    // Alle Arbeitsplätze abwählen
+    function clearArbeitsplaetze() {
+        const checkboxes = document.querySelectorAll('input[name="arbeitsplaetze"]');
+        checkboxes.forEach(cb => cb.checked = false);
+        updateArbeitsplaetzeCounter();
+    }
+
+    // Event Listener für Checkboxen
+    document.addEventListener('DOMContentLoaded', function() {
+        const checkboxes = document.querySelectorAll('input[name="arbeitsplaetze"]');
+        checkboxes.forEach(cb => {
+            cb.addEventListener('change', updateArbeitsplaetzeCounter);
+        });
+
+        // Initial Counter aktualisieren
+        updateArbeitsplaetzeCounter();
+    });
+
+
+    function showFilePreview(url, filename) {
+    const modal = new bootstrap.Modal(document.getElementById('filePreviewModal'));
+    const content = document.getElementById('modalFileContent');
+    const downloadBtn = document.getElementById('modalDownloadBtn');
+
+    downloadBtn.href = url;
+
+    const ext = filename.toLowerCase().split('.').pop();
+
+    if (ext === 'pdf') {
+        content.innerHTML = `<iframe src="${url}" width="100%" height="700px" style="border: none;"></iframe>`;
+    } else if (['jpg', 'jpeg', 'png'].includes(ext)) {
+        content.innerHTML = `<div class="text-center"><img src="${url}" class="img-fluid" style="max-height: 700px;"></div>`;
+    } else if (ext === 'txt') {
+        content.innerHTML = `<iframe src="${url}" width="100%" height="700px" style="border: 1px solid #ddd;"></iframe>`;
+    } else {
+        content.innerHTML = `
+            <div class="alert alert-info text-center">
+                <i class="bi bi-info-circle display-4 mb-3"></i>
+                <p>Diese Datei kann nicht direkt im Browser angezeigt werden.</p>
+                <p><strong>${filename}</strong></p>
+                <a href="${url}" class="btn btn-primary" download>
+                    <i class="bi bi-download"></i> Datei herunterladen
+                </a>
+            </div>`;
+    }
+
+    modal.show();
+}
+
+// ========== NEU: JavaScript für Kategorie-Filterung ==========
+function filterByCategory(category) {
+    // Alle Tabs inaktiv machen
+    document.querySelectorAll('.category-tabs .nav-link').forEach(tab => {
+        tab.classList.remove('active');
+    });
+
+    // Aktiven Tab markieren
+    const activeTab = document.querySelector(`.category-tabs .nav-link[data-kategorie="${category}"]`);
+    if (activeTab) {
+        activeTab.classList.add('active');
+    }
+
+    // Zeilen filtern
+    const rows = document.querySelectorAll('tr[data-kategorie]');
+    let visibleCount = 0;
+
+    rows.forEach(row => {
+        const rowCategory = row.getAttribute('data-kategorie');
+
+        if (category === 'alle' || rowCategory === category) {
+            row.classList.remove('hidden');
+            visibleCount++;
+        } else {
+            row.classList.add('hidden');
+            // Ausgeblendete Zeilen nicht versehentlich mit verarbeiten
+            const checkbox = row.querySelector('.auswahl-checkbox');
+            if (checkbox) {
+                checkbox.checked = false;
+            }
+        }
+    });
+    if (typeof auswahlAktualisieren === 'function') {
+        auswahlAktualisieren();
+    }
+
+    // Export-Link an den aktiven Reiter anpassen
+    const exportLink = document.getElementById('export-gefiltert');
+    if (exportLink) {
+        const url = new URL(exportLink.getAttribute('data-basis-url'), window.location.origin);
+        if (category === 'alle') {
+            url.searchParams.delete('kategorie');
+        } else {
+            url.searchParams.set('kategorie', category);
+        }
+        exportLink.href = url.pathname + url.search;
+    }
+
+    // Zähler aktualisieren
+    document.getElementById('visible-count').textContent = visibleCount;
+
+    // Wenn nichts sichtbar, Meldung anzeigen
+    const table = document.querySelector('.table');
+    const noResults = document.getElementById('no-results-message');
+
+    if (visibleCount === 0) {
+        if (!noResults) {
+            const alert = document.createElement('div');
+            alert.id = 'no-results-message';
+            alert.className = 'alert alert-warning mt-3';
+            alert.innerHTML = '<i class="bi bi-exclamation-triangle"></i> Keine Arbeitsanweisungen in dieser Kategorie gefunden.';
+            table.parentElement.appendChild(alert);
+        }
+    } else {
+        if (noResults) {
+            noResults.remove();
+        }
+    }
+}
+
+// Bei Seitenload: Zeige alle
+document.addEventListener('DOMContentLoaded', function() {
+    filterByCategory('alle');
+});
+
+// ========== Massenaktionen ==========
+function alleAuswaehlen(checked) {
+    // Nur Zeilen der aktuell sichtbaren Kategorie auswählen
+    document.querySelectorAll('tr[data-kategorie]').forEach(row => {
+        const checkbox = row.querySelector('.auswahl-checkbox');
+        if (checkbox) {
+            checkbox.checked = checked && !row.classList.contains('hidden');
+        }
+    });
+    auswahlAktualisieren();
+}
+
+function auswahlAktualisieren() {
+    const anzahl = document.querySelectorAll('.auswahl-checkbox:checked').length;
+    const anzeige = document.getElementById('auswahl-anzahl');
+    if (anzeige) {
+        anzeige.textContent = anzahl;
+    }
+    const button = document.getElementById('massenaktion-ausfuehren');
+    const aktion = document.getElementById('id_aktion');
+    if (button && aktion) {
+        button.disabled = anzahl === 0 || !aktion.value;
+    }
+}
+
+function massenaktionOptionenAnzeigen() {
+    const aktion = document.getElementById('id_aktion').value;
+    document.querySelectorAll('.massenaktion-option').forEach(option => {
+        option.classList.toggle('aktiv', option.getAttribute('data-aktion') === aktion);
+    });
+    auswahlAktualisieren();
+}
+
+function massenaktionBestaetigen() {
+    const aktion = document.getElementById('id_aktion').value;
+    const anzahl = document.querySelectorAll('.auswahl-checkbox:checked').length;
+    if (aktion === 'loeschen') {
+        return confirm(`${anzahl} Arbeitsanweisung(en) inklusive Dateien endgültig löschen?`);
+    }
+    return true;
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    const aktion = document.getElementById('id_aktion');
+    if (aktion) {
+        aktion.addEventListener('change', massenaktionOptionenAnzeigen);
+        massenaktionOptionenAnzeigen();
+    }
+});
+// ============================================================
+// ============================================================